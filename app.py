@@ -1,64 +1,53 @@
-from flask import Flask, render_template, jsonify, request
+# Boot path: light the panel with the last frame (or a splash) before the slower imports below.
+# boot.py only uses the standard library; keep this block first.
+import boot
+from boot import boot_timer, last_frame_writer
+
+# Matrix dimensions
+MATRIX_WIDTH = 64
+MATRIX_HEIGHT = 64
+
+hardware_matrix = boot.init_hardware_matrix(MATRIX_WIDTH, MATRIX_HEIGHT)
+boot_timer.mark('hardware_init')
+boot_frame = boot.show_boot_frame(hardware_matrix, MATRIX_WIDTH, MATRIX_HEIGHT)
+
+from flask import Flask, render_template, jsonify, request, Response
 import json
 import subprocess 
 import re 
 from display import Display # Import the Display class
 import datetime # For getting current time and date
 import os
-import importlib
-import inspect
 import time
 import threading # For background updates
 import logging # Added for custom log filter
 
 # Import performance optimization modules
 from performance_optimizer import optimizer
+from span_tracer import tracer
+from span_histograms import span_histograms, WINDOWS
 from performance_utils import RaspberryPiOptimizer, optimize_flask_app, get_app_optimizations
-
-# Import rpi-rgb-led-matrix library
-try:
-    from rgbmatrix import RGBMatrix, RGBMatrixOptions
-    RGB_MATRIX_AVAILABLE = True
-except ImportError:
-    RGB_MATRIX_AVAILABLE = False
-    print("WARNING: RGBMatrix library not found. Hardware display will not be available.")
+from system_sampler import system_sampler, METRICS
+from widget_registry import widget_registry
+from frame_publisher import frame_publisher, pack_rgb, MULTIPART_BOUNDARY
+from frame_history import frame_history, EXPORT_FORMATS, EXPORT_TIMEOUT_S
+from layout_store import layout_writer, layout_watcher, validate_widget_config, validate_screen_config, VERSION_KEY
 
 # Import BaseWidget to check instance types, though specific widgets are loaded dynamically
 from widgets.base_widget import BaseWidget 
+boot_timer.mark('imports')
 
 app = Flask(__name__)
 
-# Matrix dimensions
-MATRIX_WIDTH = 64
-MATRIX_HEIGHT = 64
-
 # Create a single Display instance that will be used throughout the application
 matrix_display = Display(width=MATRIX_WIDTH, height=MATRIX_HEIGHT)
+matrix_display.pixel_buffer = [list(row) for row in boot_frame] # Start from the frame boot.py put on the panel
 
-# --- RGB Matrix Hardware Initialization ---
-hardware_matrix = None
-if RGB_MATRIX_AVAILABLE:
-    try:
-        print("INFO: Initializing RGB LED Matrix hardware...")
-        options = RGBMatrixOptions()
-        options.rows = MATRIX_HEIGHT
-        options.cols = MATRIX_WIDTH
-        options.chain_length = 1
-        options.parallel = 1
-        options.hardware_mapping = 'adafruit-hat' # Or 'adafruit-hat-pwm' if quality mode was used
-        options.gpio_slowdown = 2 # Adjust as needed (1-4 typically)
-        options.disable_hardware_pulsing = False # Usually False for Adafruit HAT/Bonnet
-        # options.brightness = 50 # Optional: Set brightness (0-100)
-        hardware_matrix = RGBMatrix(options=options)
-        print("SUCCESS: RGB LED Matrix hardware initialized.")
-    except Exception as e:
-        print(f"ERROR: Failed to initialize RGB LED Matrix hardware: {e}")
-        hardware_matrix = None # Ensure it's None if initialization fails
-# --- End RGB Matrix Hardware Initialization ---
 
 # Current display mode
 current_display_mode = 'default' 
-SCREEN_LAYOUTS_FILE_PATH = 'screen_layouts.json'
+frame_publisher.publish_buffer(matrix_display.get_buffer(), current_display_mode, []) # Served to web clients until the first render
+SCREEN_LAYOUTS_FILE_PATH = layout_writer.path
 
 # Add these global variables near the top of the file with other globals
 AUTO_SCREEN_ROTATION_ENABLED = False
@@ -66,7 +55,6 @@ last_screen_change_time = time.monotonic()
 last_debug_log_time = time.monotonic()
 
 # --- Widget Management ---
-AVAILABLE_WIDGETS = {} # Stores loaded widget classes, e.g., {"time": TimeWidget, "text": TextWidget}
 active_widget_instances = {} # Stores active widget instances: widget_id -> instance
 
 # Lock for synchronizing access to shared resources like screen_layouts, current_display_mode, and matrix_display
@@ -74,6 +62,7 @@ data_lock = threading.Lock()
 
 # Initialize Raspberry Pi optimizer
 pi_optimizer = RaspberryPiOptimizer()
+boot_timer.mark('pi_optimizer')
 
 # Performance settings
 app_optimizations = get_app_optimizations()
@@ -83,6 +72,22 @@ SKIP_FRAME_THRESHOLD = app_optimizations["skip_frame_threshold"]  # ms
 MATRIX_DATA_LOGGING_ENABLED = True # Global flag for matrix_data route logging
 current_frame_widget_dimensions = [] # Stores dimensions of widgets in the current frame
 
+# Render loop spans, registered once (span_tracer.py). Per-widget spans are tagged with the widget id.
+SPAN_AUTO_SCREEN_ROTATION = tracer.register('pdu_auto_screen_rotation')
+SPAN_DISPLAY_UPDATE_CYCLE = tracer.register('display_update_cycle', frame_root=True)
+SPAN_UPDATE_DISPLAY_CONTENT = tracer.register('update_display_content', parent='display_update_cycle')
+SPAN_MATRIX_CLEAR = tracer.register('matrix_clear', parent='update_display_content')
+SPAN_WIDGET_INSTANCE_MANAGEMENT = tracer.register('widget_instance_management', parent='update_display_content')
+SPAN_PREPARE_GLOBAL_CONTEXT = tracer.register('prepare_global_context', parent='update_display_content')
+SPAN_WIDGET_PROCESSING_LOOP = tracer.register('widget_processing_loop_overall', parent='update_display_content')
+SPAN_WIDGET_SETUP = tracer.register('widget_setup', parent='widget_processing_loop_overall')
+SPAN_WIDGET_GET_CONTENT = tracer.register('widget_get_content', parent='widget_processing_loop_overall')
+SPAN_WIDGET_DRAW_PIXEL_MAP = tracer.register('widget_draw_pixel_map', parent='widget_processing_loop_overall')
+SPAN_WIDGET_DRAW_BITMAP_WINDOW = tracer.register('widget_draw_bitmap_window', parent='widget_processing_loop_overall')
+SPAN_WIDGET_DRAW_TEXT = tracer.register('widget_draw_text', parent='widget_processing_loop_overall')
+SPAN_HARDWARE_MATRIX_UPDATE = tracer.register('hardware_matrix_update', parent='display_update_cycle')
+SPAN_PERIODIC_STATS_LOG = tracer.register('pdu_periodic_stats_log', parent='display_update_cycle')
+
 # Custom Log Filter for /api/matrix_data
 class MatrixDataLogFilter(logging.Filter):
     def filter(self, record):
@@ -93,7 +98,7 @@ class MatrixDataLogFilter(logging.Filter):
         is_matrix_data_req = False
         if isinstance(record.args, tuple) and len(record.args) > 0:
             request_line = str(record.args[0]) # e.g. "GET /api/matrix_data HTTP/1.1"
-            if "/api/matrix_data" in request_line:
+            if "/api/matrix_data" in request_line or "/api/matrix_frame" in request_line or "/api/matrix_stream" in request_line or "/api/matrix_live" in request_line:
                 is_matrix_data_req = True
 
         if is_matrix_data_req and not MATRIX_DATA_LOGGING_ENABLED:
@@ -101,55 +106,11 @@ class MatrixDataLogFilter(logging.Filter):
         return 1  # Allow log record
 
 def load_widget_classes():
-    """Dynamically loads widget classes from the 'widgets' directory."""
-    global AVAILABLE_WIDGETS
-    widgets_path = os.path.join(os.path.dirname(__file__), 'widgets')
-    if not os.path.isdir(widgets_path):
-        print(f"DEBUG: Widgets directory not found at {widgets_path}")
-        return
-
-    print("DEBUG: Starting widget class loading...")
-    for filename in os.listdir(widgets_path):
-        if filename.endswith('_widget.py'): # Convention: widget_type_widget.py
-            module_name_full = f"widgets.{filename[:-3]}"
-            widget_type_key = filename[:-10] # Extracts 'time' from 'time_widget.py'
-            print(f"DEBUG: Attempting to load module: {module_name_full} for key: {widget_type_key}")
-            try:
-                module = importlib.import_module(module_name_full)
-                print(f"DEBUG: Successfully imported module: {module_name_full}")
-                for name, cls in inspect.getmembers(module, inspect.isclass):
-                    print(f"DEBUG: Checking class '{name}' in module '{module_name_full}'")
-                    # Check if it's a subclass of BaseWidget and actually defined in this module (not imported)
-                    if issubclass(cls, BaseWidget) and cls is not BaseWidget and cls.__module__ == module_name_full:
-                        print(f"DEBUG: Found valid widget class '{name}' for key '{widget_type_key}'")
-                        if widget_type_key in AVAILABLE_WIDGETS:
-                            print(f"Warning: Duplicate widget type key '{widget_type_key}' found. Overwriting.")
-                        AVAILABLE_WIDGETS[widget_type_key] = cls
-                        print(f"Successfully loaded widget: {name} as type '{widget_type_key}'")
-                        if widget_type_key == "news": # Specifically for news widget
-                            print(f"DEBUG: NEWS WIDGET '{name}' SUCCESSFULLY REGISTERED AS '{widget_type_key}'")
-            except ImportError as e:
-                print(f"Error importing widget module {module_name_full}: {e}")
-            except Exception as e:
-                print(f"An unexpected error occurred while loading widget {module_name_full}: {e}")
-    print(f"Available widgets: {list(AVAILABLE_WIDGETS.keys())}")
+    """Loads the widget manifest. Widget modules themselves are imported on first use (see widget_registry.py)."""
+    widget_registry.load_manifest()
 
 # --- Screen Layouts and Widget Instance Configuration System ---
 
-def _get_all_widget_type_data():
-    """Helper function to build the list of available widget types and their configurations."""
-    widget_type_data = []
-    for type_key, widget_class in AVAILABLE_WIDGETS.items():
-        display_name = widget_class.__name__.replace("Widget", "")
-        display_name = re.sub(r'(?<=[a-z])(?=[A-Z])|(?<=[A-Z])(?=[A-Z][a-z])', ' ', display_name).strip()
-        
-        widget_type_data.append({
-            "type": type_key,
-            "displayName": display_name,
-            "configOptions": widget_class.get_config_options()
-        })
-    return widget_type_data
-
 # Helper function to convert hex color string to RGB tuple
 def hex_to_rgb(hex_color_string):
     """Converts a hex color string (e.g., '#FF0000') to an (R, G, B) tuple."""
@@ -201,16 +162,17 @@ def load_screen_layouts():
 
             MATRIX_DATA_LOGGING_ENABLED = raw_loaded_data.get('matrix_data_logging_enabled', True)
             print(f"Matrix data logging state loaded/defaulted to: {MATRIX_DATA_LOGGING_ENABLED}")
+            layout_writer.loaded(raw_loaded_data.get(VERSION_KEY))
 
             current_file_screen_layouts = {
-                k: v for k, v in raw_loaded_data.items() if k != 'matrix_data_logging_enabled'
+                k: v for k, v in raw_loaded_data.items() if k not in ('matrix_data_logging_enabled', VERSION_KEY)
             }
             
             if not isinstance(current_file_screen_layouts, dict) or \
                ('default' not in current_file_screen_layouts and bool(current_file_screen_layouts)):
                 print("Warning: Invalid screen_layouts structure or default screen missing. Reverting to defaults for screens.")
                 screen_layouts = default_screen_layouts.copy()
-                _save_layouts_to_file()
+                layout_writer.mark_dirty()
                 return
 
             migrated_layouts = {}
@@ -234,68 +196,93 @@ def load_screen_layouts():
             if not screen_layouts: 
                  print("No screen configurations found after loading. Initializing with default screen(s).")
                  screen_layouts = default_screen_layouts.copy()
-                 _save_layouts_to_file()
+                 layout_writer.mark_dirty()
             elif 'default' not in screen_layouts: 
                  print("Critical: Default screen was lost or not found. Re-initializing default screen.")
                  screen_layouts['default'] = default_screen_layouts['default'].copy()
-                 _save_layouts_to_file()
+                 layout_writer.mark_dirty()
 
         except json.JSONDecodeError:
             print(f"Error decoding {SCREEN_LAYOUTS_FILE_PATH}. Using default layouts. Matrix logging defaults to True.")
             MATRIX_DATA_LOGGING_ENABLED = True
             screen_layouts = default_screen_layouts.copy()
-            _save_layouts_to_file()
+            layout_writer.mark_dirty()
         except Exception as e:
             print(f"Error loading {SCREEN_LAYOUTS_FILE_PATH}: {e}. Using default layouts. Matrix logging defaults to True.")
             MATRIX_DATA_LOGGING_ENABLED = True
             screen_layouts = default_screen_layouts.copy()
-            _save_layouts_to_file()
+            layout_writer.mark_dirty()
     else:
         print(f"{SCREEN_LAYOUTS_FILE_PATH} not found. Using default layouts and creating file. Matrix logging defaults to True.")
         MATRIX_DATA_LOGGING_ENABLED = True
         screen_layouts = default_screen_layouts.copy()
-        _save_layouts_to_file()
-
-def _save_layouts_to_file_threaded(): # Renamed for clarity
-    global screen_layouts, MATRIX_DATA_LOGGING_ENABLED, data_lock 
+        layout_writer.mark_dirty()
 
-    layouts_copy = {}
-    logging_enabled_copy = False
-    with data_lock: 
-        # Make deep copies if screen_layouts contains mutable objects (like lists/dicts)
-        # that could be modified elsewhere while the save is in progress.
-        # json.loads(json.dumps(obj)) is a common way for deepish copy of JSON-serializable data.
+def _layouts_snapshot():
+    """The layouts and settings to save, for the layout writer. Copied under data_lock as one compact JSON round trip."""
+    with data_lock:
+        layouts_json = json.dumps(screen_layouts)
+        logging_enabled = MATRIX_DATA_LOGGING_ENABLED
+    data_to_save = {'matrix_data_logging_enabled': logging_enabled}
+    data_to_save.update(json.loads(layouts_json))
+    return data_to_save
+
+def _apply_external_layouts(new_layouts, settings):
+    """
+    Applies a screen_layouts.json changed outside the app, already validated by the layout watcher
+    (runs on its thread). Only what differs is applied: screens are added, replaced or removed one
+    by one and widget instances are kept, so the render loop just reconfigures changed widgets and
+    drops removed ones. Holds data_lock only for the comparison and the swaps.
+    """
+    global current_display_mode, MATRIX_DATA_LOGGING_ENABLED
+    summary = {'added': [], 'changed': [], 'removed': [], 'settings': False}
+    with data_lock:
+        for screen_id in [s for s in screen_layouts if s not in new_layouts]:
+            del screen_layouts[screen_id]
+            layout_writer.mark_dirty('remove_screen', screen_id, on_disk=True)
+            summary['removed'].append(screen_id)
+        for screen_id, screen_config in new_layouts.items():
+            if screen_id not in screen_layouts:
+                screen_layouts[screen_id] = screen_config
+                layout_writer.mark_dirty('add_screen', screen_id, data=screen_config, on_disk=True)
+                summary['added'].append(screen_id)
+            elif screen_layouts[screen_id] != screen_config:
+                screen_layouts[screen_id] = screen_config
+                layout_writer.mark_dirty('screen', screen_id, data=screen_config, on_disk=True)
+                summary['changed'].append(screen_id)
+        if current_display_mode not in screen_layouts:
+            current_display_mode = 'default'
+        logging_enabled = settings.get('matrix_data_logging_enabled', True)
+        if logging_enabled != MATRIX_DATA_LOGGING_ENABLED:
+            MATRIX_DATA_LOGGING_ENABLED = logging_enabled
+            layout_writer.mark_dirty('settings', data={'matrix_data_logging_enabled': logging_enabled}, on_disk=True)
+            summary['settings'] = True
+    return summary
+
+def _discard_widget_instance(widget_id):
+    """Removes a widget instance and lets it release its provider subscriptions."""
+    instance = active_widget_instances.pop(widget_id, None)
+    if instance is not None:
         try:
-            layouts_copy = json.loads(json.dumps(screen_layouts))
+            instance.close()
         except Exception as e:
-            print(f"Error deep copying screen_layouts for threaded save: {e}. Falling back to shallow copy.")
-            layouts_copy = screen_layouts.copy() # Fallback, might not be safe if nested dicts are modified
-        logging_enabled_copy = MATRIX_DATA_LOGGING_ENABLED
+            print(f"Error closing widget instance {widget_id}: {e}")
 
-    data_to_save = {'matrix_data_logging_enabled': logging_enabled_copy}
-    data_to_save.update(layouts_copy)
-
-    try:
-        with open(SCREEN_LAYOUTS_FILE_PATH, 'w') as f:
-            json.dump(data_to_save, f, indent=4)
-        print(f"Successfully saved screen layouts and settings to {SCREEN_LAYOUTS_FILE_PATH} in background thread.")
-    except Exception as e:
-        print(f"Error saving screen layouts to {SCREEN_LAYOUTS_FILE_PATH} in background thread: {e}")
+def _clear_widget_instances():
+    """Discards every active widget instance. Caller must hold data_lock where the render loop may be running."""
+    for widget_id in list(active_widget_instances.keys()):
+        _discard_widget_instance(widget_id)
 
 def _update_and_save_screen_layouts(new_layouts_data):
-    """Updates the global screen_layouts, clears active instances, and saves to file in a background thread."""
+    """Updates the global screen_layouts, clears active instances, and queues a save with the layout writer."""
     global screen_layouts, active_widget_instances
     # The main route save_screen_layouts_route already holds data_lock for updating screen_layouts
     
     screen_layouts = new_layouts_data
-    active_widget_instances.clear() 
+    _clear_widget_instances() 
     print("Cleared active_widget_instances due to layout save (triggered by _update_and_save_screen_layouts).")
     
-    # Run the save operation in a new thread
-    save_thread = threading.Thread(target=_save_layouts_to_file_threaded)
-    save_thread.daemon = True # Ensure thread doesn't prevent app exit
-    save_thread.start()
-    
+    layout_writer.mark_dirty() # Saved by the layout writer once the changes settle
     return True # Return immediately (optimistic success)
 
 def _add_new_screen(screen_id, screen_name):
@@ -308,13 +295,10 @@ def _add_new_screen(screen_id, screen_name):
         "widgets": [],
         "display_time_seconds": DEFAULT_SCREEN_DISPLAY_TIME_S
     }
-    active_widget_instances.clear()
+    _clear_widget_instances()
     print(f"Cleared active_widget_instances due to adding screen: {screen_id}")
     
-    # Run the save operation in a new thread
-    save_thread = threading.Thread(target=_save_layouts_to_file_threaded)
-    save_thread.daemon = True
-    save_thread.start()
+    layout_writer.mark_dirty('add_screen', screen_id, data=dict(screen_layouts[screen_id]))
     return True # Optimistic success
 
 def _remove_screen(screen_id_to_remove):
@@ -331,13 +315,10 @@ def _remove_screen(screen_id_to_remove):
         display_mode_was_changed = True
         print(f"Current display mode was {screen_id_to_remove}, switched to default following removal.")
         
-    active_widget_instances.clear()
+    _clear_widget_instances()
     print(f"Cleared active_widget_instances due to removing screen: {screen_id_to_remove}")
     
-    # Run the save operation in a new thread
-    save_thread = threading.Thread(target=_save_layouts_to_file_threaded)
-    save_thread.daemon = True
-    save_thread.start()
+    layout_writer.mark_dirty('remove_screen', screen_id_to_remove)
     return True, removed_screen_name, display_mode_was_changed # Optimistic success for save
 
 def _set_active_display_mode(mode_name):
@@ -354,10 +335,7 @@ def _set_matrix_logging_enabled_and_save(status: bool):
     MATRIX_DATA_LOGGING_ENABLED = status
     print(f"Matrix data route logging globally set to: {MATRIX_DATA_LOGGING_ENABLED}")
     
-    # Run the save operation in a new thread
-    save_thread = threading.Thread(target=_save_layouts_to_file_threaded)
-    save_thread.daemon = True
-    save_thread.start()
+    layout_writer.mark_dirty('settings', data={'matrix_data_logging_enabled': status})
     return True # Optimistic success
 
 def _prepare_global_widget_context(current_time, current_screen_widget_configs):
@@ -365,6 +343,7 @@ def _prepare_global_widget_context(current_time, current_screen_widget_configs):
     return {
         'now': current_time,
         'get_text_dimensions': matrix_display.get_text_dimensions, # Pass the method itself
+        'render_text_mask': matrix_display.render_text_mask, # For widgets that pre-render scroll tapes
         'matrix_width': MATRIX_WIDTH
     }
 
@@ -387,12 +366,118 @@ def performance_page():
 @app.route('/api/get_widget_types', methods=['GET'])
 def get_widget_types_route():
     """Returns a list of available widget types and their configurations."""
-    widget_data = _get_all_widget_type_data()
-    return jsonify(widget_data)
+    return jsonify(widget_registry.get_widget_types())
+
+_layouts_json_cache = (None, None) # (ETag, serialized layouts) of the last layouts served
 
 @app.route('/api/get_screen_layouts', methods=['GET'])
 def get_screen_layouts_route():
-    return jsonify(screen_layouts)
+    """
+    Every screen's layout. The ETag is the layout version: a matching If-None-Match is answered
+    with 304 without touching data_lock, and the layouts are serialized once per version.
+    """
+    global _layouts_json_cache
+    etag = layout_writer.etag()
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        cached_etag, body = _layouts_json_cache
+        if cached_etag != etag:
+            with data_lock:
+                etag = layout_writer.etag()
+                body = json.dumps(screen_layouts, sort_keys=True)
+            _layouts_json_cache = (etag, body)
+        response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def _merge_patch(target, patch):
+    """JSON Merge Patch (RFC 7386): a copy of target with patch's keys set, nested objects merged and null values removed."""
+    if not isinstance(patch, dict):
+        return patch
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = _merge_patch(result.get(key), value)
+    return result
+
+def _patch_response(version, **fields):
+    response = jsonify(success=True, version=version, **fields)
+    response.set_etag(layout_writer.etag())
+    return response
+
+@app.route('/api/layouts/screens/<string:screen_id>', methods=['PATCH'])
+def patch_screen_route(screen_id):
+    """
+    Merge-patches one screen ({"name": ..., "display_time_seconds": ..., "widgets": [...]}).
+    Widget instances are kept: the render loop reconfigures them, and drops or recreates only
+    widgets that were removed or changed type.
+    """
+    patch = request.get_json(silent=True)
+    if not isinstance(patch, dict):
+        return jsonify(success=False, message="Patch must be a JSON object."), 400
+    if 'widgets' in patch and patch['widgets'] is None:
+        # A merge patch null would delete the list and empty the screen; clear it with [] instead
+        return jsonify(success=False, message="widgets can't be null; send [] to remove every widget."), 400
+    with data_lock:
+        if screen_id not in screen_layouts:
+            return jsonify(success=False, message=f"Screen ID '{screen_id}' not found."), 404
+        screen_config = _merge_patch(screen_layouts[screen_id], patch)
+        error = validate_screen_config(screen_config)
+        if error:
+            return jsonify(success=False, message=error), 400
+        screen_config.setdefault('widgets', [])
+        screen_layouts[screen_id] = screen_config
+        version = layout_writer.mark_dirty('screen', screen_id, data=screen_config)
+    return _patch_response(version, screen=screen_config)
+
+@app.route('/api/layouts/screens/<string:screen_id>/widgets/<string:widget_id>', methods=['PATCH'])
+def patch_widget_route(screen_id, widget_id):
+    """
+    Merge-patches one widget, e.g. {"x": 3, "y": 10} after a drag. Only that widget changes: its
+    instance is reconfigured with the new config on the next frame, nothing else is reset.
+    """
+    patch = request.get_json(silent=True)
+    if not isinstance(patch, dict):
+        return jsonify(success=False, message="Patch must be a JSON object."), 400
+    if patch.get('id', widget_id) != widget_id:
+        return jsonify(success=False, message="A widget's id can't be changed."), 400
+    with data_lock:
+        screen_config = screen_layouts.get(screen_id)
+        if screen_config is None:
+            return jsonify(success=False, message=f"Screen ID '{screen_id}' not found."), 404
+        widgets = screen_config.get('widgets', [])
+        index = next((i for i, w in enumerate(widgets) if isinstance(w, dict) and w.get('id') == widget_id), None)
+        if index is None:
+            return jsonify(success=False, message=f"Widget '{widget_id}' not found on screen '{screen_id}'."), 404
+        widget_config = _merge_patch(widgets[index], patch)
+        error = validate_widget_config(widget_config)
+        if error:
+            return jsonify(success=False, message=error), 400
+        # Copy-on-write: configs already handed to the change feed are never mutated
+        widgets = widgets[:index] + [widget_config] + widgets[index + 1:]
+        screen_layouts[screen_id] = dict(screen_config, widgets=widgets)
+        version = layout_writer.mark_dirty('widget', screen_id, widget_id, data=widget_config)
+    return _patch_response(version, widget=widget_config)
+
+@app.route('/api/layouts/changes', methods=['GET'])
+def get_layout_changes_route():
+    """
+    The layout change feed: the changes after ?since=<version>, each with its version, op, screen
+    and widget ids and new config. ?wait=N holds the request up to N seconds (max 25) until there
+    is a change. ?instance= is the "instance" the version came from; a version from another run
+    gets "reset" straight away. If "reset" is true the changes since that version are unknown;
+    refetch the layouts.
+    """
+    try:
+        since = int(request.args.get('since', 0))
+        wait = float(request.args.get('wait', 0))
+    except ValueError:
+        return jsonify(success=False, message="since and wait must be numbers"), 400
+    return jsonify(layout_writer.changes_since(since, wait, request.args.get('instance')))
 
 @app.route('/api/save_screen_layouts', methods=['POST'])
 def save_screen_layouts_route():
@@ -402,7 +487,7 @@ def save_screen_layouts_route():
             return jsonify(success=False, message="Invalid layout format: must be a dictionary."), 400
         
         with data_lock: 
-            # _update_and_save_screen_layouts will be called, which now uses a thread for file I/O.
+            # _update_and_save_screen_layouts only queues the save; the layout writer does the file I/O.
             # The modification of global screen_layouts and active_widget_instances happens under this lock.
             saved = _update_and_save_screen_layouts(new_layouts)
         
@@ -430,7 +515,7 @@ def add_screen_route():
             if new_screen_id in screen_layouts: 
                 return jsonify(success=False, message=f"Screen ID '{new_screen_id}' already exists."), 400
             
-            # _add_new_screen now uses a thread for file I/O.
+            # _add_new_screen only queues the save; the layout writer does the file I/O.
             # screen_layouts and active_widget_instances are modified under this lock.
             saved = _add_new_screen(new_screen_id, new_screen_name)
 
@@ -463,7 +548,7 @@ def remove_screen_route(screen_id_to_remove):
             original_screen_config = screen_layouts.get(screen_id_to_remove).copy()
             original_current_display_mode_snapshot = current_display_mode # Snapshot global before change by helper
 
-            # _remove_screen now uses a thread for file I/O.
+            # _remove_screen only queues the save; the layout writer does the file I/O.
             # screen_layouts, active_widget_instances, and current_display_mode are modified under this lock.
             save_initiated, removed_name, mode_changed = _remove_screen(screen_id_to_remove)
 
@@ -508,9 +593,8 @@ def set_display_mode_route(mode_name):
 def update_display_content(): 
     global active_widget_instances, current_frame_widget_dimensions
     with data_lock:
-        optimizer.start_timer("matrix_clear")
-        matrix_display.clear() 
-        optimizer.end_timer("matrix_clear")
+        with tracer.span(SPAN_MATRIX_CLEAR):
+            matrix_display.clear() 
         now = datetime.datetime.now()
         
         new_dimensions_this_frame = []
@@ -523,153 +607,282 @@ def update_display_content():
         widgets_on_current_screen_config = current_screen_config.get('widgets', [])
         current_widget_ids_on_screen = {wc['id'] for wc in widgets_on_current_screen_config if wc.get('enabled')}
 
-        optimizer.start_timer("widget_instance_management")
-        ids_to_remove = set(active_widget_instances.keys()) - current_widget_ids_on_screen
-        for widget_id in ids_to_remove:
-            print(f"Removing instance for widget ID: {widget_id} (no longer on screen or disabled)")
-            del active_widget_instances[widget_id]
-        optimizer.end_timer("widget_instance_management")
+        with tracer.span(SPAN_WIDGET_INSTANCE_MANAGEMENT):
+            ids_to_remove = set(active_widget_instances.keys()) - current_widget_ids_on_screen
+            for widget_id in ids_to_remove:
+                print(f"Removing instance for widget ID: {widget_id} (no longer on screen or disabled)")
+                _discard_widget_instance(widget_id)
 
         # Prepare global context using the new helper
-        optimizer.start_timer("prepare_global_context")
-        global_widget_context = _prepare_global_widget_context(now, widgets_on_current_screen_config)
-        optimizer.end_timer("prepare_global_context")
+        with tracer.span(SPAN_PREPARE_GLOBAL_CONTEXT):
+            global_widget_context = _prepare_global_widget_context(now, widgets_on_current_screen_config)
 
         if not widgets_on_current_screen_config:
             current_frame_widget_dimensions = new_dimensions_this_frame # Ensure it's updated even if no widgets
-            # Ensure overall widget processing timer is ended if we return early
-            optimizer.end_timer("widget_processing_loop_overall") 
             return
 
-        optimizer.start_timer("widget_processing_loop_overall") # Renamed from widget_processing_loop to be more specific
-        for widget_config in widgets_on_current_screen_config:
-            if not widget_config.get('enabled', False):
-                continue
-
-            widget_type = widget_config.get('type')
-            widget_id = widget_config.get('id')
-            WidgetClass = AVAILABLE_WIDGETS.get(widget_type)
-
-            if WidgetClass:
-                instance = None
-                optimizer.start_timer(f"widget_{widget_id}_setup") # New Timer
-                try:
-                    if widget_id in active_widget_instances:
-                        if isinstance(active_widget_instances[widget_id], WidgetClass):
-                            instance = active_widget_instances[widget_id]
-                            instance.config = widget_config 
-                            instance.global_context = global_widget_context
-                            instance.reconfigure() 
-                        else:
-                            print(f"Type mismatch for {widget_id}. Expected {WidgetClass.__name__}, found {type(active_widget_instances[widget_id]).__name__}. Recreating.")
-                            del active_widget_instances[widget_id] # remove bad instance
+        with tracer.span(SPAN_WIDGET_PROCESSING_LOOP):
+            for widget_config in widgets_on_current_screen_config:
+                if not widget_config.get('enabled', False):
+                    continue
+
+                widget_type = widget_config.get('type')
+                widget_id = widget_config.get('id')
+                WidgetClass = widget_registry.get_class(widget_type) # Imports the widget module on first use
+
+                if WidgetClass:
+                    instance = None
+                    with tracer.span(SPAN_WIDGET_SETUP, widget_id):
+                        if widget_id in active_widget_instances:
+                            if isinstance(active_widget_instances[widget_id], WidgetClass):
+                                instance = active_widget_instances[widget_id]
+                                instance.config = widget_config 
+                                instance.global_context = global_widget_context
+                                instance.reconfigure() 
+                            else:
+                                print(f"Type mismatch for {widget_id}. Expected {WidgetClass.__name__}, found {type(active_widget_instances[widget_id]).__name__}. Recreating.")
+                                _discard_widget_instance(widget_id) # remove bad instance
                     
-                    if instance is None: 
-                        instance = WidgetClass(config=widget_config, global_context=global_widget_context)
-                        active_widget_instances[widget_id] = instance
-                        print(f"Created new instance for widget ID: {widget_id} of type {widget_type}")
-                finally:
-                    optimizer.end_timer(f"widget_{widget_id}_setup") # New Timer
+                        if instance is None: 
+                            instance = WidgetClass(config=widget_config, global_context=global_widget_context)
+                            active_widget_instances[widget_id] = instance
+                            print(f"Created new instance for widget ID: {widget_id} of type {widget_type}")
                     
-                if instance: # Ensure instance was successfully created/retrieved
-                    try:
-                        optimizer.start_timer(f"widget_{widget_id}_get_content")
-                        # content can be a string (for text) or a dict (for pixel_map)
-                        content = instance.get_content()
-                        optimizer.end_timer(f"widget_{widget_id}_get_content")
-
-                        final_draw_x = instance.x
-                        final_draw_y = instance.y # y-coordinate of the widget
-
-                        # Check if content is a dictionary and of type 'pixel_map'
-                        if isinstance(content, dict) and content.get('type') == 'pixel_map':
-                            pixel_data = content.get('data', [])
-                            map_width = content.get('width', 0)
-                            map_height = content.get('height', 0)
+                    if instance: # Ensure instance was successfully created/retrieved
+                        try:
+                            # content can be a string (for text) or a dict (for pixel_map / bitmap_window)
+                            with tracer.span(SPAN_WIDGET_GET_CONTENT, widget_id):
+                                content = instance.get_content()
+
+                            final_draw_x = instance.x
+                            final_draw_y = instance.y # y-coordinate of the widget
+
+                            # Check if content is a dictionary and of type 'pixel_map'
+                            if isinstance(content, dict) and content.get('type') == 'pixel_map':
+                                pixel_data = content.get('data', [])
+                                map_width = content.get('width', 0)
+                                map_height = content.get('height', 0)
                             
-                            # Add dimensions for this pixel_map widget
-                            new_dimensions_this_frame.append({
-                                'id': widget_id,
-                                'width_cells': map_width,
-                                'height_cells': map_height
-                            })
-
-                            optimizer.start_timer(f"widget_{widget_id}_draw_pixel_map")
-                            if pixel_data and map_width > 0 and map_height > 0:
-                                # OLD METHOD - Loop and set_pixel:
-                                # for r_idx, row in enumerate(pixel_data):
-                                #     if r_idx >= map_height: break # Respect map_height
-                                #     for c_idx, color_tuple in enumerate(row):
-                                #         if c_idx >= map_width: break # Respect map_width
-                                #         if isinstance(color_tuple, tuple) and len(color_tuple) == 3 and all(isinstance(c, int) and 0 <= c <= 255 for c in color_tuple):
-                                #             abs_x = final_draw_x + c_idx
-                                #             abs_y = final_draw_y + r_idx
-                                #             if 0 <= abs_x < MATRIX_WIDTH and 0 <= abs_y < MATRIX_HEIGHT:
-                                #                  matrix_display.set_pixel(abs_x, abs_y, color_tuple)
-                                
-                                # NEW METHOD - Use draw_pixel_map
-                                matrix_display.draw_pixel_map(final_draw_x, final_draw_y, pixel_data)
-                                         
-                            optimizer.end_timer(f"widget_{widget_id}_draw_pixel_map")
-
-                        # Else, assume it's text content (string)
-                        elif isinstance(content, str) and content: 
-                            text_to_draw = content
-                            rgb_color_tuple = hex_to_rgb(instance.color)
-                            font_name_to_pass = None
-                            if hasattr(instance, 'font_size'):
-                                # Re-map font_size string to actual font file name/key
-                                if instance.font_size == 'small': font_name_to_pass = '3x5'
-                                elif instance.font_size == 'medium': font_name_to_pass = '5x7'
-                                elif instance.font_size == 'large': font_name_to_pass = '7x9'
-                                elif instance.font_size == 'xl': font_name_to_pass = 'xl' 
-                            
-                            try:
-                                # Calculate dimensions for text
-                                width_cells, height_cells = matrix_display.get_text_dimensions(text_to_draw, font_name_to_pass)
+                                # Add dimensions for this pixel_map widget
                                 new_dimensions_this_frame.append({
                                     'id': widget_id,
-                                    'width_cells': width_cells,
-                                    'height_cells': height_cells
+                                    'width_cells': map_width,
+                                    'height_cells': map_height
                                 })
-                            except Exception as dim_error:
-                                print(f"Error calculating dimensions for widget {widget_id} (text): {dim_error}")
-                                # Provide default dimensions on error
+
+                                with tracer.span(SPAN_WIDGET_DRAW_PIXEL_MAP, widget_id):
+                                    if pixel_data and map_width > 0 and map_height > 0:
+                                        # OLD METHOD - Loop and set_pixel:
+                                        # for r_idx, row in enumerate(pixel_data):
+                                        #     if r_idx >= map_height: break # Respect map_height
+                                        #     for c_idx, color_tuple in enumerate(row):
+                                        #         if c_idx >= map_width: break # Respect map_width
+                                        #         if isinstance(color_tuple, tuple) and len(color_tuple) == 3 and all(isinstance(c, int) and 0 <= c <= 255 for c in color_tuple):
+                                        #             abs_x = final_draw_x + c_idx
+                                        #             abs_y = final_draw_y + r_idx
+                                        #             if 0 <= abs_x < MATRIX_WIDTH and 0 <= abs_y < MATRIX_HEIGHT:
+                                        #                  matrix_display.set_pixel(abs_x, abs_y, color_tuple)
+                                
+                                        # NEW METHOD - Use draw_pixel_map
+                                        matrix_display.draw_pixel_map(final_draw_x, final_draw_y, pixel_data)
+
+                            # A window onto a pre-rendered 1-bit tape (e.g. the news ticker), drawn in the widget's colour
+                            elif isinstance(content, dict) and content.get('type') == 'bitmap_window':
+                                window_width = content.get('width', 0)
+                                window_height = content.get('height', 0)
                                 new_dimensions_this_frame.append({
                                     'id': widget_id,
-                                    'width_cells': 5, # Default width
-                                    'height_cells': 7  # Default height (e.g. for medium font)
+                                    'width_cells': window_width,
+                                    'height_cells': window_height
                                 })
+
+                                with tracer.span(SPAN_WIDGET_DRAW_BITMAP_WINDOW, widget_id):
+                                    if window_width > 0 and window_height > 0:
+                                        matrix_display.draw_bitmap_window(final_draw_x, final_draw_y, content.get('rows', []),
+                                                                          content.get('offset', 0), window_width, hex_to_rgb(instance.color))
+
+                            # Else, assume it's text content (string)
+                            elif isinstance(content, str) and content: 
+                                text_to_draw = content
+                                rgb_color_tuple = hex_to_rgb(instance.color)
+                                font_name_to_pass = None
+                                if hasattr(instance, 'font_size'):
+                                    # Re-map font_size string to actual font file name/key
+                                    if instance.font_size == 'small': font_name_to_pass = '3x5'
+                                    elif instance.font_size == 'medium': font_name_to_pass = '5x7'
+                                    elif instance.font_size == 'large': font_name_to_pass = '7x9'
+                                    elif instance.font_size == 'xl': font_name_to_pass = 'xl' 
                             
-                            optimizer.start_timer(f"widget_{widget_id}_draw_text")
-                            matrix_display.draw_text(text_to_draw, final_draw_x, final_draw_y, rgb_color_tuple, font_name_to_pass)
-                            optimizer.end_timer(f"widget_{widget_id}_draw_text")
-                        # elif content: # If content is not None/empty string but not a handled type
-                        #    instance._log("WARNING", f"Received unhandled content type from get_content(): {type(content)}")
-
-                    except Exception as e:
-                        print(f"Error processing widget '{widget_config.get('id', widget_type)}': {e}")
-                        # Ensure individual widget processing timer is stopped in case of error within the loop
-                        optimizer.end_timer(f"widget_{widget_id}_processing")
-            else:
-                print(f"Warning: Widget type '{widget_type}' not found in AVAILABLE_WIDGETS.")
-        optimizer.end_timer("widget_processing_loop_overall") # Renamed
+                                try:
+                                    # Calculate dimensions for text
+                                    width_cells, height_cells = matrix_display.get_text_dimensions(text_to_draw, font_name_to_pass)
+                                    new_dimensions_this_frame.append({
+                                        'id': widget_id,
+                                        'width_cells': width_cells,
+                                        'height_cells': height_cells
+                                    })
+                                except Exception as dim_error:
+                                    print(f"Error calculating dimensions for widget {widget_id} (text): {dim_error}")
+                                    # Provide default dimensions on error
+                                    new_dimensions_this_frame.append({
+                                        'id': widget_id,
+                                        'width_cells': 5, # Default width
+                                        'height_cells': 7  # Default height (e.g. for medium font)
+                                    })
+                            
+                                with tracer.span(SPAN_WIDGET_DRAW_TEXT, widget_id):
+                                    matrix_display.draw_text(text_to_draw, final_draw_x, final_draw_y, rgb_color_tuple, font_name_to_pass)
+                            # elif content: # If content is not None/empty string but not a handled type
+                            #    instance._log("WARNING", f"Received unhandled content type from get_content(): {type(content)}")
+
+                        except Exception as e:
+                            print(f"Error processing widget '{widget_config.get('id', widget_type)}': {e}")
+                else:
+                    print(f"Warning: Widget type '{widget_type}' not found in the widget registry.")
         
         current_frame_widget_dimensions = new_dimensions_this_frame
 
+def _frame_response(frame, encoding, mimetype, headers=None):
+    """
+    Serves one encoding of a published frame; the encoded bytes are shared by every client.
+    Answers 304 without encoding anything if the client already has this frame, either by
+    ETag (If-None-Match) or by sequence number (?since=<seq>).
+    """
+    frame_publisher.note_poll_client(request.remote_addr)
+    etag = frame.etag(encoding)
+    if request.if_none_match.contains(etag) or request.args.get('since') == str(frame.seq):
+        response = Response(status=304)
+    else:
+        response = Response(frame.encoded(encoding), mimetype=mimetype)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache' # Browsers may keep it but must revalidate
+    response.headers['X-Frame-Seq'] = str(frame.seq)
+    response.headers['X-Display-Mode'] = frame.mode
+    response.headers['X-Dimensions-Version'] = str(frame.dims_version)
+    if headers and response.status_code == 200:
+        response.headers.update(headers)
+    return response
+
 @app.route('/api/matrix_data')
 def get_matrix_data_route(): 
-    global current_frame_widget_dimensions # Access the global list
-    with data_lock: # Ensure we read a consistent buffer and dimensions list
-        pixels = matrix_display.get_buffer()
-        mode = current_display_mode
-        # Make a copy of the dimensions to avoid issues if it's modified during jsonify
-        dimensions_to_send = list(current_frame_widget_dimensions) 
-    return jsonify({
-        "pixels": pixels,
-        "current_display_mode": mode,
-        "widgets_dimensions": dimensions_to_send
-    })
+    """
+    The latest frame as JSON (nested [R, G, B] lists). Kept for compatibility; prefer /api/matrix_frame.
+    Supports If-None-Match and ?since=<seq> like /api/matrix_frame.
+    """
+    frame = frame_publisher.latest()
+    if frame is None:
+        return jsonify(success=False, message="No frame rendered yet"), 503
+    return _frame_response(frame, 'json', 'application/json')
+
+@app.route('/api/matrix_frame')
+def get_matrix_frame_route():
+    """
+    The latest frame in the compact binary format described in frame_publisher.py, deflated when
+    the client accepts it. ?format=png returns it as a PNG image instead. 304 if unchanged, see _frame_response.
+    """
+    frame = frame_publisher.latest()
+    if frame is None:
+        return jsonify(success=False, message="No frame rendered yet"), 503
+    if request.args.get('format') == 'png':
+        return _frame_response(frame, 'png', 'image/png')
+    if 'deflate' in request.accept_encodings:
+        return _frame_response(frame, 'deflate', 'application/octet-stream', {'Content-Encoding': 'deflate'})
+    return _frame_response(frame, 'binary', 'application/octet-stream')
+
+@app.route('/api/matrix_stream')
+def get_matrix_stream_route():
+    """
+    Server-Sent Events push of the display: a keyframe on connect, then deltas of the changed pixels
+    (formats in frame_publisher.py). ?fps=N caps the event rate for this client.
+    """
+    try:
+        max_fps = _stream_fps_arg()
+    except ValueError:
+        return jsonify(success=False, message="fps must be a number"), 400
+    response = Response(frame_publisher.stream(max_fps), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no' # Don't let a reverse proxy buffer the stream
+    return response
+
+def _stream_fps_arg():
+    """The optional ?fps=N of the streaming endpoints: a positive float, None if absent; raises ValueError."""
+    if 'fps' not in request.args:
+        return None
+    max_fps = float(request.args['fps'])
+    return max_fps if max_fps > 0 else None
+
+@app.route('/api/matrix_live')
+def get_matrix_live_route():
+    """
+    Live view of the display as a multipart/x-mixed-replace stream of PNG frames (plays like MJPEG
+    in browsers, VLC and ffmpeg). ?fps=N caps the frame rate for this client.
+    """
+    try:
+        max_fps = _stream_fps_arg()
+    except ValueError:
+        return jsonify(success=False, message="fps must be a number"), 400
+    response = Response(frame_publisher.multipart_stream(max_fps),
+                        mimetype=f'multipart/x-mixed-replace; boundary={MULTIPART_BOUNDARY}')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/api/frame_history', methods=['GET', 'POST'])
+def frame_history_route():
+    """GET: what the frame history holds. POST {"seconds": N, "megabytes": M}: resizes it."""
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        try:
+            seconds = float(data['seconds']) if data.get('seconds') is not None else None
+            megabytes = float(data['megabytes']) if data.get('megabytes') is not None else None
+        except (TypeError, ValueError):
+            return jsonify(success=False, message="seconds and megabytes must be numbers"), 400
+        if (seconds is not None and seconds <= 0) or (megabytes is not None and megabytes <= 0):
+            return jsonify(success=False, message="seconds and megabytes must be positive"), 400
+        frame_history.configure(seconds, megabytes)
+        return jsonify(success=True, stats=frame_history.get_stats())
+    return jsonify(frame_history.get_stats())
+
+@app.route('/api/frame_history/export')
+def export_frame_history_route():
+    """
+    What the panel showed over a time range as an animated image. ?format=gif|apng (default gif);
+    ?seconds=N for the last N seconds, or ?start=&end= as Unix times (default: all of the history);
+    ?scale=N enlarges each LED to NxN pixels.
+    """
+    fmt = request.args.get('format', 'gif')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify(success=False, message=f"format must be one of {sorted(EXPORT_FORMATS)}"), 400
+    try:
+        start = request.args.get('start', type=float)
+        end = request.args.get('end', type=float)
+        if 'seconds' in request.args:
+            end = time.time()
+            start = end - float(request.args['seconds'])
+        scale = int(request.args.get('scale', 1))
+    except ValueError:
+        return jsonify(success=False, message="seconds, start, end and scale must be numbers"), 400
+    try:
+        data, frame_count = frame_history.export(fmt, start, end, scale).result(timeout=EXPORT_TIMEOUT_S)
+    except Exception as e:
+        return jsonify(success=False, message=f"Error exporting frame history: {e}"), 500
+    if not data:
+        return jsonify(success=False, message="No frames recorded in that range"), 404
+    response = Response(data, mimetype=EXPORT_FORMATS[fmt])
+    response.headers['Content-Disposition'] = (f'inline; filename="matrix-{time.strftime("%Y%m%d-%H%M%S")}.'
+                                               f'{"png" if fmt == "apng" else fmt}"')
+    response.headers['X-Frame-Count'] = str(frame_count)
+    return response
+
+@app.route('/api/frame_stats')
+def get_frame_stats_route():
+    """Frame hub stats: sequence number, connected stream/polling clients and per-encoding encode time and cache hits"""
+    return jsonify(frame_publisher.get_stats())
+
+@app.route('/api/widget_dimensions')
+def get_widget_dimensions_route():
+    """Rendered size of each widget on the current screen; 'version' matches the frame header's dims_ver."""
+    return jsonify(frame_publisher.get_widget_dimensions())
 
 @app.route('/api/get_matrix_logging_status', methods=['GET'])
 def get_matrix_logging_status():
@@ -682,7 +895,7 @@ def set_matrix_logging_status():
         data = request.get_json()
         status = data.get('enabled', False)
         with data_lock:
-            # _set_matrix_logging_enabled_and_save now uses a thread for file I/O.
+            # _set_matrix_logging_enabled_and_save only queues the save; the layout writer does the file I/O.
             # MATRIX_DATA_LOGGING_ENABLED is modified under this lock.
             if _set_matrix_logging_enabled_and_save(status):
                 return jsonify(success=True, message=f"Matrix data logging status update initiated, saving in background.")
@@ -712,6 +925,7 @@ def periodic_display_updater():
     skip_count = 0
     last_stats_time = time.monotonic()
     log_save_counter = 0 # New counter for saving logs
+    hardware_frame_seq = None # Sequence number of the frame last pushed to the hardware matrix
     LOG_SAVE_INTERVAL = 6 # Save log every 6*10 = 60 seconds
     
     while True:
@@ -723,153 +937,163 @@ def periodic_display_updater():
         # Decide if we should skip this frame based on performance
         should_skip = optimizer.should_skip_frame()
         
-        optimizer.start_timer("pdu_auto_screen_rotation") # New Timer Start
-        # Auto Screen Rotation - Check if it's time to change screens
-        current_time = time.monotonic()
+        with tracer.span(SPAN_AUTO_SCREEN_ROTATION):
+            # Auto Screen Rotation - Check if it's time to change screens
+            current_time = time.monotonic()
         
-        with data_lock:
-            if AUTO_SCREEN_ROTATION_ENABLED and len(screen_layouts) > 1:
-                current_screen = screen_layouts.get(current_display_mode)
-                display_time = current_screen.get('display_time_seconds', DEFAULT_SCREEN_DISPLAY_TIME_S) if current_screen else DEFAULT_SCREEN_DISPLAY_TIME_S
+            with data_lock:
+                if AUTO_SCREEN_ROTATION_ENABLED and len(screen_layouts) > 1:
+                    current_screen = screen_layouts.get(current_display_mode)
+                    display_time = current_screen.get('display_time_seconds', DEFAULT_SCREEN_DISPLAY_TIME_S) if current_screen else DEFAULT_SCREEN_DISPLAY_TIME_S
                 
-                # Debug print to track time - only print once every 30 seconds to reduce noise
-                elapsed_time = current_time - last_screen_change_time
-                if current_time - last_debug_log_time > 30:  # Limit to every 30 seconds
-                    print(f"[AUTO_ROTATE_DEBUG] Enabled: {AUTO_SCREEN_ROTATION_ENABLED}, Current: '{current_display_mode}', "
-                          f"Time elapsed: {elapsed_time:.1f}s, Display time: {display_time}s, "
-                          f"Available screens: {list(screen_layouts.keys())}")
-                    last_debug_log_time = current_time
+                    # Debug print to track time - only print once every 30 seconds to reduce noise
+                    elapsed_time = current_time - last_screen_change_time
+                    if current_time - last_debug_log_time > 30:  # Limit to every 30 seconds
+                        print(f"[AUTO_ROTATE_DEBUG] Enabled: {AUTO_SCREEN_ROTATION_ENABLED}, Current: '{current_display_mode}', "
+                              f"Time elapsed: {elapsed_time:.1f}s, Display time: {display_time}s, "
+                              f"Available screens: {list(screen_layouts.keys())}")
+                        last_debug_log_time = current_time
                 
-                if current_time - last_screen_change_time >= display_time:
-                    # Get the list of screen IDs
-                    screen_ids = list(screen_layouts.keys())
-                    current_index = screen_ids.index(current_display_mode) if current_display_mode in screen_ids else 0
-                    next_index = (current_index + 1) % len(screen_ids)
-                    next_screen_id = screen_ids[next_index]
+                    if current_time - last_screen_change_time >= display_time:
+                        # Get the list of screen IDs
+                        screen_ids = list(screen_layouts.keys())
+                        current_index = screen_ids.index(current_display_mode) if current_display_mode in screen_ids else 0
+                        next_index = (current_index + 1) % len(screen_ids)
+                        next_screen_id = screen_ids[next_index]
                     
-                    # Change to the next screen
-                    current_display_mode = next_screen_id
-                    last_screen_change_time = current_time
-                    print(f"[AUTO_ROTATE] Changing screen to '{next_screen_id}' (from '{screen_ids[current_index]}')")
-            elif AUTO_SCREEN_ROTATION_ENABLED:
-                # Only log this message once per minute to reduce noise
-                if current_time - last_debug_log_time > 60:
-                    print(f"[AUTO_ROTATE_DEBUG] Auto-rotation enabled but need at least 2 screens. "
-                          f"Currently have {len(screen_layouts)} screens available.")
-                    last_debug_log_time = current_time
-        optimizer.end_timer("pdu_auto_screen_rotation") # New Timer End
+                        # Change to the next screen
+                        current_display_mode = next_screen_id
+                        last_screen_change_time = current_time
+                        print(f"[AUTO_ROTATE] Changing screen to '{next_screen_id}' (from '{screen_ids[current_index]}')")
+                elif AUTO_SCREEN_ROTATION_ENABLED:
+                    # Only log this message once per minute to reduce noise
+                    if current_time - last_debug_log_time > 60:
+                        print(f"[AUTO_ROTATE_DEBUG] Auto-rotation enabled but need at least 2 screens. "
+                              f"Currently have {len(screen_layouts)} screens available.")
+                        last_debug_log_time = current_time
         
         # Track frame stats
         frame_count += 1
         actual_cycle_time_ms = (loop_start_time - last_loop_finish_time) * 1000
         
         # Performance tracking
-        optimizer.start_timer("display_update_cycle")
-
-        try:
-            # Only update display if we're not skipping this frame
-            if not should_skip:
-                # Time the actual display update
-                optimizer.start_timer("update_display_content")
-                update_display_content() 
-                update_time_ms = optimizer.end_timer("update_display_content")
-
-                # --- BEGIN NEW MATRIX HARDWARE UPDATE CODE ---
-                if hardware_matrix and thread_local_offscreen_canvas: # Check if matrix and its canvas were initialized successfully
-                    optimizer.start_timer("hardware_matrix_update")
-                    try:
-                        # Get the app's pixel buffer. 
-                        with data_lock:
-                            current_app_buffer = matrix_display.get_buffer()
+        with tracer.span(SPAN_DISPLAY_UPDATE_CYCLE):
+            try:
+                # Only update display if we're not skipping this frame
+                if not should_skip:
+                    # Time the actual display update
+                    with tracer.span(SPAN_UPDATE_DISPLAY_CONTENT):
+                        update_display_content() 
+                    update_time_ms = tracer.last_ms(SPAN_UPDATE_DISPLAY_CONTENT) or 0
+
+                    # Snapshot the finished frame; everything below and every web client reads the snapshot, not the buffer
+                    with data_lock:
+                        frame_rgb = pack_rgb(matrix_display.get_buffer())
+                        frame_mode = current_display_mode
+                        frame_dimensions = current_frame_widget_dimensions # Replaced, never mutated, by the next render
+                    frame = frame_publisher.publish(frame_rgb, MATRIX_WIDTH, MATRIX_HEIGHT, frame_mode, frame_dimensions)
+                    frame_history.record(frame) # Queued; compressed on the history thread
+
+                    # --- BEGIN NEW MATRIX HARDWARE UPDATE CODE ---
+                    # Check if matrix and its canvas were initialized successfully; an unchanged frame is already on the panel
+                    if hardware_matrix and thread_local_offscreen_canvas and frame.seq != hardware_frame_seq:
+                        with tracer.span(SPAN_HARDWARE_MATRIX_UPDATE):
+                            try:
+                                # REUSE thread_local_offscreen_canvas. 
+                                # Pixels are set directly, effectively clearing/overwriting previous frame content.
+                                # The snapshot's RGB bytes need no lock, and pack_rgb already turned invalid pixels black.
+                                rgb = frame.rgb
+                                set_pixel = thread_local_offscreen_canvas.SetPixel
+                                for y in range(min(frame.height, MATRIX_HEIGHT)):
+                                    i = y * frame.width * 3
+                                    for x in range(min(frame.width, MATRIX_WIDTH)):
+                                        set_pixel(x, y, rgb[i], rgb[i + 1], rgb[i + 2])
+                                        i += 3
                         
-                        if current_app_buffer: # Ensure buffer is not None
-                            # REUSE thread_local_offscreen_canvas. 
-                            # Pixels are set directly, effectively clearing/overwriting previous frame content.
-                            for y, row in enumerate(current_app_buffer):
-                                if y >= MATRIX_HEIGHT: break # Boundary check
-                                for x, color_tuple in enumerate(row):
-                                    if x >= MATRIX_WIDTH: break # Boundary check
-                                    if color_tuple and len(color_tuple) == 3:
-                                        thread_local_offscreen_canvas.SetPixel(x, y, color_tuple[0], color_tuple[1], color_tuple[2])
-                                    else:
-                                        # Default to black if color_tuple is invalid or None
-                                        thread_local_offscreen_canvas.SetPixel(x, y, 0, 0, 0)
-                                        if color_tuple is not None:
-                                            print(f"DEBUG: Invalid color_tuple {color_tuple} at ({x},{y}). Defaulted to black.")
-                            
-                            # Swap the canvas to the physical display
-                            hardware_matrix.SwapOnVSync(thread_local_offscreen_canvas)
-                            # print(f"DEBUG: Hardware matrix updated at {time.monotonic():.2f}") # Optional: for frequent debug
-                    except Exception as e:
-                        print(f"ERROR: Failed to update hardware matrix: {e}")
-                        # import traceback
-                        # traceback.print_exc() # For more detailed error logging if needed
-                    finally:
-                        optimizer.end_timer("hardware_matrix_update")
-                # --- END NEW MATRIX HARDWARE UPDATE CODE ---
+                                # Swap the canvas to the physical display
+                                hardware_matrix.SwapOnVSync(thread_local_offscreen_canvas)
+                                hardware_frame_seq = frame.seq
+                                    # print(f"DEBUG: Hardware matrix updated at {time.monotonic():.2f}") # Optional: for frequent debug
+                            except Exception as e:
+                                print(f"ERROR: Failed to update hardware matrix: {e}")
+                                # import traceback
+                                # traceback.print_exc() # For more detailed error logging if needed
+                    # --- END NEW MATRIX HARDWARE UPDATE CODE ---
+
+                    if not boot_timer.finished:
+                        boot_timer.finish() # First rendered frame is live; records this boot's phase timings
+
+                    # Persist the displayed frame now and then so the next boot can show it immediately
+                    if last_frame_writer.due():
+                        last_frame_writer.save(last_frame_writer.serialize(frame.width, frame.height, frame.rgb))
                 
-                # Decide if we should skip the next frame if this one was slow
-                if SKIP_FRAMES_ON_SLOW and update_time_ms > SKIP_FRAME_THRESHOLD:
-                    optimizer.update_settings({"skip_frame_rendering": True})
-                    skip_count += 1
+                    # Decide if we should skip the next frame if this one was slow
+                    if SKIP_FRAMES_ON_SLOW and update_time_ms > SKIP_FRAME_THRESHOLD:
+                        optimizer.update_settings({"skip_frame_rendering": True})
+                        skip_count += 1
+                    else:
+                        optimizer.update_settings({"skip_frame_rendering": False})
                 else:
+                    skip_count += 1
+                    # Reset skip flag after skipping one frame
                     optimizer.update_settings({"skip_frame_rendering": False})
-            else:
-                skip_count += 1
-                # Reset skip flag after skipping one frame
-                optimizer.update_settings({"skip_frame_rendering": False})
             
-            # Calculate sleep time (adaptive based on performance)
-            processing_time = time.monotonic() - loop_start_time
-            sleep_duration = max(0, current_interval - processing_time)
+                # Calculate sleep time (adaptive based on performance)
+                processing_time = time.monotonic() - loop_start_time
+                sleep_duration = max(0, current_interval - processing_time)
             
-            if processing_time > current_interval:
-                print(f"[{datetime.datetime.now().strftime('%H:%M:%S.%f')[:-3]}] [PERF_WARNING] Display update took {processing_time*1000:.2f}ms, exceeding interval of {current_interval*1000:.2f}ms.")
+                if processing_time > current_interval:
+                    print(f"[{datetime.datetime.now().strftime('%H:%M:%S.%f')[:-3]}] [PERF_WARNING] Display update took {processing_time*1000:.2f}ms, exceeding interval of {current_interval*1000:.2f}ms.")
             
-            time.sleep(sleep_duration) 
+                time.sleep(sleep_duration) 
             
-            # Record loop finish time
-            last_loop_finish_time = time.monotonic()
+                # Record loop finish time
+                last_loop_finish_time = time.monotonic()
             
-            optimizer.start_timer("pdu_periodic_stats_log") # New Timer Start
-            # Log performance stats periodically
-            if time.monotonic() - last_stats_time > 10:  # Every 10 seconds
-                total_time = time.monotonic() - last_stats_time
-                fps = frame_count / total_time
-                skip_percent = (skip_count / frame_count) * 100 if frame_count > 0 else 0
-                print(f"[PERF_STATS] FPS: {fps:.1f}, Frames: {frame_count}, Skipped: {skip_count} ({skip_percent:.1f}%)")
+                with tracer.span(SPAN_PERIODIC_STATS_LOG):
+                    # Log performance stats periodically
+                    if time.monotonic() - last_stats_time > 10:  # Every 10 seconds
+                        total_time = time.monotonic() - last_stats_time
+                        fps = frame_count / total_time
+                        skip_percent = (skip_count / frame_count) * 100 if frame_count > 0 else 0
+                        print(f"[PERF_STATS] FPS: {fps:.1f}, Frames: {frame_count}, Skipped: {skip_count} ({skip_percent:.1f}%)")
                 
-                # Get and log system stats if on Raspberry Pi
-                if pi_optimizer.is_raspberry_pi:
-                    sys_stats = pi_optimizer.get_system_stats()
-                    print(f"[SYS_STATS] CPU: {sys_stats['cpu_percent']}%, Memory: {sys_stats['memory_percent']}%, Temp: {sys_stats['temperature']}")
+                        # Get and log system stats if on Raspberry Pi
+                        if pi_optimizer.is_raspberry_pi:
+                            sys_stats = pi_optimizer.get_system_stats()
+                            cpu = f"{sys_stats['cpu_percent']}%" if sys_stats['cpu_percent'] is not None else "N/A"
+                            print(f"[SYS_STATS] CPU: {cpu}, Memory: {sys_stats['memory_percent']}%, Temp: {sys_stats['temperature']}")
                 
-                # Reset counters
-                frame_count = 0
-                skip_count = 0
-                last_stats_time = time.monotonic()
+                        # Reset counters
+                        frame_count = 0
+                        skip_count = 0
+                        last_stats_time = time.monotonic()
                 
-                log_save_counter += 1
-                if log_save_counter >= LOG_SAVE_INTERVAL:
-                    optimizer.save_log()
-                    log_save_counter = 0 # Reset counter
-                    print("[PERF_STATS] Performance log saved.")
+                        log_save_counter += 1
+                        if log_save_counter >= LOG_SAVE_INTERVAL:
+                            optimizer.save_log()
+                            log_save_counter = 0 # Reset counter
+                            print("[PERF_STATS] Performance log saved.")
 
-            optimizer.end_timer("pdu_periodic_stats_log") # New Timer End
                 
-        except Exception as e:
-            print(f"Error in periodic_display_updater: {e}")
-            time.sleep(5) 
-            last_loop_finish_time = time.monotonic()
-        
-        # Complete performance timing for this cycle
-        optimizer.end_timer("display_update_cycle")
+            except Exception as e:
+                print(f"Error in periodic_display_updater: {e}")
+                time.sleep(5) 
+                last_loop_finish_time = time.monotonic()
 
 # Add route to get performance data
 @app.route('/api/performance_stats', methods=['GET'])
 def get_performance_stats():
-    """Return performance statistics"""
-    return jsonify(optimizer.get_performance_summary())
+    """Return performance statistics; ?window=10s|1m|15m picks the window of the top-level fields (default 1m)"""
+    window = request.args.get('window', '1m')
+    if window not in [name for name, _, _ in WINDOWS]:
+        return jsonify(success=False, message=f"Unknown window '{window}'"), 400
+    return jsonify(optimizer.get_performance_summary(window))
+
+@app.route('/api/performance_trace', methods=['GET'])
+def get_performance_trace():
+    """Span tree of the last rendered frame, with each span's time and self time"""
+    return jsonify(tracer.last_frame())
 
 # Add route to update performance settings
 @app.route('/api/performance_settings', methods=['POST'])
@@ -885,8 +1109,52 @@ def update_performance_settings():
 # Add route to get system stats
 @app.route('/api/system_stats', methods=['GET'])
 def get_system_stats():
-    """Get system statistics (CPU, memory, temperature)"""
-    return jsonify(pi_optimizer.get_system_stats())
+    """Get system statistics (CPU, memory, temperature). ?history=N adds the last N samples of each metric."""
+    stats = pi_optimizer.get_system_stats()
+    history_count = request.args.get('history', type=int)
+    if history_count:
+        stats['history'] = {metric: system_sampler.get_history(metric, history_count) for metric in METRICS}
+        stats['sampler'] = system_sampler.get_stats()
+    return jsonify(stats)
+
+# Add route to get per-feed news ingestion stats
+@app.route('/api/news_feed_stats', methods=['GET'])
+def get_news_feed_stats():
+    """Get bytes read, parse time and truncation counts for each fetched RSS feed"""
+    from feed_ingest import feed_reader # Imported here so startup doesn't pay for it unless a news widget is used
+    return jsonify(feed_reader.get_stats())
+
+@app.route('/api/clock_status', methods=['GET'])
+def get_clock_status():
+    """Get NTP sync state, offset and drift estimate of the shared clock service"""
+    from clock_service import clock_service # Imported here so startup doesn't pay for ntplib
+    return jsonify(clock_service.get_stats())
+
+@app.route('/api/providers', methods=['GET'])
+def get_providers():
+    """Get subscriber counts, freshness and fetch counts of the shared data providers"""
+    from providers import provider_registry # Imported here so startup doesn't pay for requests
+    return jsonify(provider_registry.get_stats())
+
+@app.route('/api/widget_registry', methods=['GET'])
+def get_widget_registry_stats():
+    """Get known widget types, which have been imported and how long each import took"""
+    return jsonify(widget_registry.get_stats())
+
+@app.route('/api/layout_writer', methods=['GET'])
+def get_layout_writer_stats():
+    """Layout persistence stats: current and saved version, changes, writes, coalesced changes and save latency"""
+    return jsonify(layout_writer.get_stats())
+
+@app.route('/api/layout_watcher', methods=['GET'])
+def get_layout_watcher_stats():
+    """Hot reload stats: watch mode, reloads, ignored own saves, validation failures and reload latency"""
+    return jsonify(layout_watcher.get_stats())
+
+@app.route('/api/boot_timings', methods=['GET'])
+def get_boot_timings():
+    """Get this boot's phase timings (ms since process start) and those of previous boots"""
+    return jsonify(boot_timer.get_stats())
 
 # Add route to get auto rotation status
 @app.route('/api/get_auto_rotation_status', methods=['GET'])
@@ -933,9 +1201,13 @@ if __name__ == '__main__':
         })
     
     load_widget_classes()
+    boot_timer.mark('widget_manifest')
     load_screen_layouts() # Initial load
-    active_widget_instances.clear() # Ensure instances are fresh after initial load
+    layout_writer.start(_layouts_snapshot)
+    layout_watcher.start(_apply_external_layouts, DEFAULT_SCREEN_DISPLAY_TIME_S) # Hot reload of external edits
+    _clear_widget_instances() # Ensure instances are fresh after initial load
     print("Cleared active_widget_instances after initial load_screen_layouts.")
+    boot_timer.mark('layouts')
     
     # Add custom log filter to Werkzeug logger to control /api/matrix_data logs
     werkzeug_logger = logging.getLogger('werkzeug')
@@ -955,10 +1227,15 @@ if __name__ == '__main__':
     else:
         print("Warning: Could not get Werkzeug logger to add MatrixDataLogFilter.")
 
+    frame_history.start()
+    span_histograms.start()
+
     # Start the background thread for display updates
     update_thread = threading.Thread(target=periodic_display_updater, daemon=True)
     update_thread.start()
+    boot_timer.mark('render_thread_started')
     
+    boot_timer.mark('web_server_starting')
     # Start Flask app with optimized settings
     app.run(
         debug=flask_options["debug"], 
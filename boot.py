@@ -0,0 +1,242 @@
+import os
+import json
+import time
+import struct
+import threading
+
+# Boot path for the panel. app.py imports this module first, before Flask, the optimizers and
+# the widgets, so it only uses the standard library. It brings up the matrix hardware and shows
+# the last persisted frame (or a splash) while the rest of the application is still importing,
+# and it records how long each boot phase took.
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__)) # Not the working directory, which a service manager may set anywhere
+BOOT_TIMINGS_FILE_PATH = os.path.join(APP_DIR, 'boot_timings.json')
+LAST_FRAME_FILE_PATH = os.path.join(APP_DIR, 'last_frame.rgb')
+BOOT_HISTORY = 50                 # Boot records kept in boot_timings.json
+FRAME_SAVE_INTERVAL_S = 60        # How often the render loop may persist the current frame
+FRAME_MAGIC = b'SMF1'             # last_frame.rgb: magic, <HH width/height, then width*height RGB bytes
+SPLASH_RGB = (0x61, 0xDA, 0xFB)
+
+
+def _process_age_ms() -> float:
+    """Milliseconds since this process was started, so interpreter startup is counted too. 0 if unknown."""
+    try:
+        with open('/proc/self/stat', 'r') as f:
+            # Field 22 (starttime, in clock ticks after system boot); split after the ')' of the command name
+            start_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime', 'r') as f:
+            uptime_s = float(f.read().split()[0])
+        return max(0.0, (uptime_s - start_ticks / os.sysconf('SC_CLK_TCK')) * 1000)
+    except Exception:
+        return 0.0
+
+
+def _read_release() -> str:
+    """The checked-out git commit, read from .git without running git. 'unknown' outside a checkout."""
+    git_dir = os.path.join(APP_DIR, '.git')
+    try:
+        with open(os.path.join(git_dir, 'HEAD'), 'r') as f:
+            head = f.read().strip()
+        if not head.startswith('ref: '):
+            return head[:12]
+        ref = head[5:]
+        ref_path = os.path.join(git_dir, ref)
+        if os.path.exists(ref_path):
+            with open(ref_path, 'r') as f:
+                return f.read().strip()[:12]
+        with open(os.path.join(git_dir, 'packed-refs'), 'r') as f:
+            for line in f:
+                if line.rstrip().endswith(' ' + ref):
+                    return line.split()[0][:12]
+    except Exception:
+        pass
+    return 'unknown'
+
+
+class BootTimer:
+    """Records the time of each boot phase, measured from process start, and keeps a history across boots."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.process_age_ms = _process_age_ms() # Interpreter startup before this module ran
+        self.phases = []                        # [(phase, ms since process start)]
+        self.finished = False
+        self.lock = threading.Lock()
+
+    def elapsed_ms(self) -> float:
+        return self.process_age_ms + (time.perf_counter() - self.start) * 1000
+
+    def mark(self, phase: str):
+        """Records that a phase has completed."""
+        elapsed = self.elapsed_ms()
+        with self.lock:
+            if self.finished:
+                return
+            self.phases.append((phase, round(elapsed, 1)))
+        print(f"[BOOT] {phase}: {elapsed:.0f}ms")
+
+    def finish(self, phase: str = 'first_live_frame'):
+        """Marks the last phase and appends this boot to the history file in the background."""
+        self.mark(phase)
+        with self.lock:
+            if self.finished:
+                return
+            self.finished = True
+            record = {'timestamp': time.strftime("%Y-%m-%d %H:%M:%S"), 'phases': dict(self.phases)}
+        threading.Thread(target=self._save, args=(record,), name="boot_timings_save", daemon=True).start()
+
+    def _save(self, record):
+        record['release'] = _read_release()
+        history = self._load_history()
+        history.append(record)
+        try:
+            with open(BOOT_TIMINGS_FILE_PATH, 'w') as f:
+                json.dump(history[-BOOT_HISTORY:], f, indent=2)
+        except Exception as e:
+            print(f"[BOOT] Error saving boot timings: {e}")
+
+    @staticmethod
+    def _load_history() -> list:
+        try:
+            with open(BOOT_TIMINGS_FILE_PATH, 'r') as f:
+                history = json.load(f)
+            return history if isinstance(history, list) else []
+        except FileNotFoundError:
+            return []
+        except Exception as e:
+            print(f"[BOOT] Ignoring unreadable boot timings file: {e}")
+            return []
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            phases = dict(self.phases)
+        return {'current': phases, 'history': self._load_history()}
+
+
+# Started as early as possible; app.py imports this module before anything else
+boot_timer = BootTimer()
+boot_timer.mark('boot_module')
+
+
+def init_hardware_matrix(width: int, height: int):
+    """Initializes the RGB LED matrix. Returns the RGBMatrix, or None if the library or hardware isn't available."""
+    try:
+        from rgbmatrix import RGBMatrix, RGBMatrixOptions
+    except ImportError:
+        print("WARNING: RGBMatrix library not found. Hardware display will not be available.")
+        return None
+    try:
+        print("INFO: Initializing RGB LED Matrix hardware...")
+        options = RGBMatrixOptions()
+        options.rows = height
+        options.cols = width
+        options.chain_length = 1
+        options.parallel = 1
+        options.hardware_mapping = 'adafruit-hat' # Or 'adafruit-hat-pwm' if quality mode was used
+        options.gpio_slowdown = 2 # Adjust as needed (1-4 typically)
+        options.disable_hardware_pulsing = False # Usually False for Adafruit HAT/Bonnet
+        # options.brightness = 50 # Optional: Set brightness (0-100)
+        hardware_matrix = RGBMatrix(options=options)
+        print("SUCCESS: RGB LED Matrix hardware initialized.")
+        return hardware_matrix
+    except Exception as e:
+        print(f"ERROR: Failed to initialize RGB LED Matrix hardware: {e}")
+        return None
+
+
+def load_last_frame(width: int, height: int):
+    """The persisted frame as rows of (R, G, B) tuples, or None if missing or for a different panel size."""
+    try:
+        with open(LAST_FRAME_FILE_PATH, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"[BOOT] Could not read last frame: {e}")
+        return None
+    header_size = len(FRAME_MAGIC) + 4
+    if len(data) != header_size + width * height * 3 or not data.startswith(FRAME_MAGIC):
+        return None
+    if struct.unpack('<HH', data[len(FRAME_MAGIC):header_size]) != (width, height):
+        return None
+    pixels = data[header_size:]
+    return [[tuple(pixels[(y * width + x) * 3:(y * width + x) * 3 + 3]) for x in range(width)] for y in range(height)]
+
+
+def splash_frame(width: int, height: int) -> list:
+    """A minimal splash: a thin bar across the middle of the panel, fading in from the left."""
+    rows = [[(0, 0, 0)] * width for _ in range(height)]
+    for x in range(width):
+        fraction = (x + 1) / width
+        color = tuple(int(c * fraction) for c in SPLASH_RGB)
+        for y in (height // 2 - 1, height // 2):
+            if 0 <= y < height:
+                rows[y][x] = color
+    return rows
+
+
+def show_boot_frame(hardware_matrix, width: int, height: int) -> list:
+    """
+    Shows the last persisted frame, or the splash if there is none, on the hardware matrix.
+    Returns the frame so the caller can seed its own framebuffer with it.
+    """
+    frame = load_last_frame(width, height)
+    source = 'last_frame' if frame is not None else 'splash'
+    if frame is None:
+        frame = splash_frame(width, height)
+    if hardware_matrix is not None:
+        try:
+            canvas = hardware_matrix.CreateFrameCanvas()
+            for y, row in enumerate(frame):
+                for x, (r, g, b) in enumerate(row):
+                    canvas.SetPixel(x, y, r, g, b)
+            hardware_matrix.SwapOnVSync(canvas)
+        except Exception as e:
+            print(f"[BOOT] Could not show boot frame: {e}")
+    boot_timer.mark(f'first_frame ({source})')
+    return frame
+
+
+class LastFrameWriter:
+    """Persists the displayed frame at most every FRAME_SAVE_INTERVAL_S, and only when it changed, for the next boot."""
+
+    def __init__(self, path: str = LAST_FRAME_FILE_PATH, interval: float = FRAME_SAVE_INTERVAL_S):
+        self.path = path
+        self.interval = interval
+        self.last_save_time = time.monotonic()
+        self.last_data = None
+        self.saving = False
+
+    def due(self) -> bool:
+        return not self.saving and time.monotonic() - self.last_save_time >= self.interval
+
+    @staticmethod
+    def serialize(width: int, height: int, rgb: bytes) -> bytes:
+        """The last_frame.rgb contents for a frame's raw RGB bytes."""
+        return FRAME_MAGIC + struct.pack('<HH', width, height) + rgb
+
+    def save(self, data: bytes):
+        """Writes a serialized frame in the background (atomically, so a power cut can't leave a torn file)."""
+        self.last_save_time = time.monotonic()
+        if data == self.last_data:
+            return
+        self.last_data = data
+        self.saving = True
+        threading.Thread(target=self._write, args=(data,), name="last_frame_save", daemon=True).start()
+
+    def _write(self, data: bytes):
+        try:
+            temp_path = self.path + '.tmp'
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno()) # Data on disk before the rename, or a power cut can leave an empty file
+            os.replace(temp_path, self.path)
+        except Exception as e:
+            print(f"[BOOT] Error saving last frame: {e}")
+        finally:
+            self.saving = False
+
+
+# Global instance
+last_frame_writer = LastFrameWriter()
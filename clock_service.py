@@ -0,0 +1,201 @@
+import time
+import socket
+import datetime
+import threading
+from collections import deque
+
+import ntplib
+
+DEFAULT_NTP_TIMEOUT_S = 5
+DEFAULT_RESYNC_INTERVAL_S = 4 * 3600
+MIN_RESYNC_INTERVAL_S = 60           # Never poll an NTP server more often than this
+RETRY_BACKOFF_START_S = 30           # First retry after a failed sync; doubles up to the resync interval
+MAX_DRIFT_PPM = 500                  # Clamp for the drift estimate; anything larger is a bad sample
+MIN_DRIFT_SPAN_S = 600               # Samples must be this far apart before drift is estimated
+DRIFT_SAMPLES = 8
+REQUEST_LINGER_S = 600               # A requester (e.g. a removed widget) not heard from for this long no longer counts
+
+
+class NTPClockService:
+    """
+    Process-wide NTP clock discipline. A single background thread queries NTP, so widgets never
+    do network I/O on the render thread. Each successful query records the NTP time against
+    time.monotonic(). now() then extrapolates from the latest sample, corrected by a drift
+    estimate of the local clock frequency taken from earlier samples. It never blocks.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._requests = {}              # requester -> [server, timeout, resync interval, last seen (monotonic)]
+        self._servers = []               # Servers of the current requests, tried in the order they were requested
+        self._timeout = DEFAULT_NTP_TIMEOUT_S            # Longest timeout asked for
+        self._resync_interval = DEFAULT_RESYNC_INTERVAL_S # Shortest interval asked for
+        self._last_sync_monotonic = None
+        self._samples = deque(maxlen=DRIFT_SAMPLES) # (monotonic, ntp epoch seconds)
+        self._drift = 0.0                # Fractional rate error of the monotonic clock vs NTP
+        self._offset = None              # NTP time minus system time at the last sync, in seconds
+        self._next_sync_monotonic = 0.0
+        self._generation = 0             # Bumped when a new server is requested, so a stale sync can't reschedule
+        self._backoff = RETRY_BACKOFF_START_S
+        self._thread = None
+        self._wake_event = threading.Event()
+        self.last_server = None
+        self.last_error = None
+        self.sync_count = 0
+        self.failure_count = 0
+
+    def request(self, server: str, timeout: float = DEFAULT_NTP_TIMEOUT_S,
+                resync_interval: float = DEFAULT_RESYNC_INTERVAL_S, requester=None):
+        """
+        Registers `requester`'s (e.g. a widget id's) interest in NTP time from a server and starts
+        the service if needed. A requester's latest call replaces its earlier one, and requesters
+        that stop calling are forgotten after REQUEST_LINGER_S. Cheap enough to call every frame:
+        it only wakes the sync thread when the servers or the interval changed.
+        """
+        server = (server or '').strip()
+        if not server:
+            return
+        resync_interval = max(MIN_RESYNC_INTERVAL_S, resync_interval)
+        requester = server if requester is None else requester
+        now = time.monotonic()
+        changed = False
+        with self.lock:
+            entry = self._requests.get(requester)
+            if entry is not None and entry[:3] == [server, timeout, resync_interval]:
+                entry[3] = now
+            else:
+                self._requests.pop(requester, None) # Re-added at the end: its server now counts as requested last
+                self._requests[requester] = [server, timeout, resync_interval, now]
+                changed = self._update_requests(now)
+            if not self._thread or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="ntp_clock", daemon=True)
+                self._thread.start()
+                print(f"[CLOCK] NTP clock service started (server: {server})")
+        if changed:
+            self._wake_event.set()
+
+    def _update_requests(self, now: float) -> bool:
+        """
+        Drops requesters gone for REQUEST_LINGER_S and recomputes the servers, timeout and interval.
+        Syncs at once if there is a new server, or reschedules for a new interval. Caller holds the
+        lock. True if the sync thread should wake up.
+        """
+        for requester, entry in list(self._requests.items()):
+            if now - entry[3] > REQUEST_LINGER_S:
+                del self._requests[requester]
+        servers = list(dict.fromkeys(entry[0] for entry in self._requests.values()))
+        new_server = any(server not in self._servers for server in servers)
+        self._servers = servers
+        self._timeout = max((entry[1] for entry in self._requests.values()), default=DEFAULT_NTP_TIMEOUT_S)
+        resync_interval = min((entry[2] for entry in self._requests.values()), default=DEFAULT_RESYNC_INTERVAL_S)
+        interval_changed = resync_interval != self._resync_interval
+        self._resync_interval = resync_interval
+        if new_server:
+            # A server no longer requested is simply not tried again; only a new one needs a sync now
+            self._next_sync_monotonic = 0.0
+            self._generation += 1
+        elif interval_changed and self._last_sync_monotonic is not None and self.last_error is None:
+            self._next_sync_monotonic = self._last_sync_monotonic + resync_interval
+        return new_server or interval_changed
+
+    def now(self) -> datetime.datetime | None:
+        """Current NTP-disciplined local time, or None if no sync has succeeded yet."""
+        with self.lock:
+            if not self._samples:
+                return None
+            sync_monotonic, sync_epoch = self._samples[-1]
+            drift = self._drift
+        elapsed = time.monotonic() - sync_monotonic
+        epoch = sync_epoch + elapsed * (1.0 + drift)
+        return datetime.datetime.fromtimestamp(epoch, tz=datetime.timezone.utc).astimezone()
+
+    def is_synced(self) -> bool:
+        with self.lock:
+            return bool(self._samples)
+
+    def _run(self):
+        while True:
+            with self.lock:
+                delay = self._next_sync_monotonic - time.monotonic()
+            if delay > 0:
+                self._wake_event.wait(delay)
+                self._wake_event.clear()
+                continue
+            self._sync_once()
+
+    def _sync_once(self):
+        with self.lock:
+            self._update_requests(time.monotonic())
+            servers = list(self._servers)
+            timeout = self._timeout
+            generation = self._generation
+            if not servers:
+                # Every requester has gone; wait for the next request
+                self._next_sync_monotonic = time.monotonic() + self._resync_interval
+                return
+
+        client = ntplib.NTPClient()
+        for server in servers:
+            try:
+                response = client.request(server, version=3, timeout=timeout)
+            except (ntplib.NTPException, socket.gaierror, socket.timeout, OSError) as e:
+                self.last_error = f"{server}: {e}"
+                print(f"[CLOCK] NTP sync with '{server}' failed: {e}")
+                continue
+            # response.offset is corrected for network delay; pair it with the monotonic clock now
+            sync_monotonic = time.monotonic()
+            ntp_epoch = time.time() + response.offset
+            self._record_sample(sync_monotonic, ntp_epoch, response.offset)
+            with self.lock:
+                self.last_server = server
+                self.last_error = None
+                self.sync_count += 1
+                self._backoff = RETRY_BACKOFF_START_S
+                self._last_sync_monotonic = sync_monotonic
+                if generation == self._generation:
+                    self._next_sync_monotonic = sync_monotonic + self._resync_interval
+            print(f"[CLOCK] NTP sync with '{server}': offset {response.offset * 1000:.1f}ms, "
+                  f"delay {response.delay * 1000:.1f}ms, drift {self._drift * 1e6:.1f}ppm")
+            return
+
+        with self.lock:
+            self.failure_count += 1
+            if generation == self._generation:
+                self._next_sync_monotonic = time.monotonic() + self._backoff
+                self._backoff = min(self._backoff * 2, self._resync_interval)
+
+    def _record_sample(self, sync_monotonic, ntp_epoch, offset):
+        with self.lock:
+            self._offset = offset
+            self._samples.append((sync_monotonic, ntp_epoch))
+            oldest_monotonic, oldest_epoch = self._samples[0]
+            span = sync_monotonic - oldest_monotonic
+            if span >= MIN_DRIFT_SPAN_S:
+                drift = ((ntp_epoch - oldest_epoch) - span) / span
+                if abs(drift) * 1e6 <= MAX_DRIFT_PPM:
+                    self._drift = drift
+                else:
+                    # Most likely a step of the NTP source or a bad reply; start estimating afresh
+                    self._samples.clear()
+                    self._samples.append((sync_monotonic, ntp_epoch))
+                    self._drift = 0.0
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return {
+                'synced': bool(self._samples),
+                'servers': list(self._servers),
+                'requesters': len(self._requests),
+                'resync_interval_s': self._resync_interval,
+                'last_server': self.last_server,
+                'offset_ms': round(self._offset * 1000, 2) if self._offset is not None else None,
+                'drift_ppm': round(self._drift * 1e6, 2),
+                'sync_count': self.sync_count,
+                'failure_count': self.failure_count,
+                'last_error': self.last_error,
+                'next_sync_in_s': round(max(0.0, self._next_sync_monotonic - time.monotonic()), 1) if self._servers else None
+            }
+
+
+# Global instance
+clock_service = NTPClockService()
@@ -1,5 +1,9 @@
 # display.py
 
+from itertools import compress
+
+import primitives # Vector drawing primitives shared with widget pixel maps
+
 # Basic 5x7 pixel font (5 wide, 7 high)
 FONT_5X7 = {
     ' ': [0, 0, 0, 0, 0, 0, 0],
@@ -306,6 +310,83 @@ class Display:
 
         return (calculated_width, font_char_height)
 
+    def render_text_mask(self, text_string, font_name=None):
+        """
+        Rasterizes a single line of text into a 1-bit mask, without wrapping or clipping.
+        Used to pre-render wide scroll tapes once so each frame only has to copy a window of it.
+
+        Args:
+            text_string (str): The string to render.
+            font_name (str, optional): The name of the font to use. Defaults to self.default_font_name.
+
+        Returns:
+            tuple: (width, height, rows) where rows is a list of `height` bytearrays of length `width`,
+                   1 for a lit pixel and 0 for background. Width matches get_text_dimensions().
+        """
+        selected_font_name = font_name if font_name in self.fonts else self.default_font_name
+        font_info = self.fonts[selected_font_name]
+        font_data = font_info["data"]
+        font_width = font_info["char_width"]
+        font_height = font_info["char_height"]
+        default_char_bitmap = font_info["default_bitmap"]
+        char_spacing = 1 # Same spacing as draw_text
+
+        text = text_string.upper() # Fonts defined with uppercase keys
+        width, height = self.get_text_dimensions(text, selected_font_name)
+        rows = [bytearray(width) for _ in range(height)]
+
+        glyph_cache = {} # char -> list of per-row byte strings, built once per distinct char
+        current_x = 0
+        for char_code in text:
+            glyph_rows = glyph_cache.get(char_code)
+            if glyph_rows is None:
+                char_bitmap = font_data.get(char_code, default_char_bitmap)
+                glyph_rows = [
+                    bytes((row_pixels >> (font_width - 1 - x_offset)) & 1 for x_offset in range(font_width))
+                    if isinstance(row_pixels, int) else bytes(font_width)
+                    for row_pixels in char_bitmap[:font_height]
+                ]
+                glyph_cache[char_code] = glyph_rows
+            for y_offset, glyph_row in enumerate(glyph_rows):
+                rows[y_offset][current_x:current_x + font_width] = glyph_row
+            current_x += font_width + char_spacing
+
+        return (width, height, rows)
+
+    def draw_bitmap_window(self, x_offset, y_offset, mask_rows, src_x, window_width, color_tuple=DEFAULT_FG_COLOR):
+        """
+        Draws a window of a pre-rendered 1-bit mask (see render_text_mask) onto the display buffer.
+        Only columns src_x .. src_x + window_width of the mask are copied, so the cost is
+        O(window_width * rows) regardless of how wide the mask is.
+
+        x_offset, y_offset: Top-left coordinates on the display where the window is placed.
+        mask_rows: List of bytearrays (1 = lit pixel).
+        src_x: First mask column to show.
+        window_width: Number of mask columns to show.
+        color_tuple: The (R, G, B) tuple for lit pixels.
+        """
+        if not (isinstance(color_tuple, tuple) and len(color_tuple) == 3 and all(isinstance(c, int) and 0 <= c <= 255 for c in color_tuple)):
+            color_tuple = DEFAULT_FG_COLOR
+
+        # Clip the window horizontally against the display once, rather than per pixel
+        dest_start = max(0, x_offset)
+        dest_end = min(self.width, x_offset + window_width)
+        if dest_start >= dest_end:
+            return
+        mask_start = src_x + (dest_start - x_offset)
+        mask_end = mask_start + (dest_end - dest_start)
+
+        for r_idx, mask_row in enumerate(mask_rows):
+            dest_y = y_offset + r_idx
+            if dest_y < 0:
+                continue
+            if dest_y >= self.height:
+                break
+            dest_row = self.pixel_buffer[dest_y]
+            # compress() picks the lit columns in C, so there's no per-pixel Python test
+            for dest_x in compress(range(dest_start, dest_end), mask_row[mask_start:mask_end]):
+                dest_row[dest_x] = color_tuple
+
     def draw_pixel_map(self, x_offset, y_offset, pixel_map_data):
         """
         Draws a pre-rendered pixel_map onto the main display buffer.
@@ -341,6 +422,36 @@ class Display:
                 # Direct buffer update without individual set_pixel call overhead
                 self.pixel_buffer[y_offset + r_idx][x_offset + c_idx] = color_tuple
 
+    # --- Vector primitives (see primitives.py); all operate directly on pixel_buffer ---
+
+    def draw_line(self, x0, y0, x1, y1, color_tuple=DEFAULT_FG_COLOR, antialias=False):
+        """Draws a line; antialias=True uses Xiaolin Wu's algorithm and blends into the existing pixels."""
+        primitives.draw_line(self.pixel_buffer, x0, y0, x1, y1, color_tuple, antialias)
+
+    def draw_circle(self, cx, cy, radius, color_tuple=DEFAULT_FG_COLOR, fill=False):
+        primitives.draw_circle(self.pixel_buffer, cx, cy, radius, color_tuple, fill)
+
+    def draw_arc(self, cx, cy, radius, start_deg, end_deg, color_tuple=DEFAULT_FG_COLOR):
+        """Draws a circle arc clockwise from start_deg to end_deg (degrees, 0 = 12 o'clock)."""
+        primitives.draw_arc(self.pixel_buffer, cx, cy, radius, start_deg, end_deg, color_tuple)
+
+    def draw_rect(self, x, y, w, h, color_tuple=DEFAULT_FG_COLOR, fill=False):
+        if fill:
+            primitives.fill_rect(self.pixel_buffer, x, y, w, h, color_tuple)
+        else:
+            primitives.draw_rect(self.pixel_buffer, x, y, w, h, color_tuple)
+
+    def draw_polygon(self, points, color_tuple=DEFAULT_FG_COLOR, fill=False, antialias=False):
+        """Draws a closed polygon from a list of (x, y) points, as an outline or filled (even-odd)."""
+        if fill:
+            primitives.fill_polygon(self.pixel_buffer, points, color_tuple)
+        else:
+            primitives.draw_polygon(self.pixel_buffer, points, color_tuple, antialias)
+
+    def fill_gradient(self, x, y, w, h, start_color, end_color, vertical=False):
+        """Fills a rectangle with a linear gradient, left to right (or top to bottom if vertical)."""
+        primitives.fill_gradient(self.pixel_buffer, x, y, w, h, start_color, end_color, vertical)
+
     def get_buffer(self):
         """
         Returns the current pixel buffer.
@@ -0,0 +1,419 @@
+import re
+import time
+import threading
+import datetime
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from email.utils import parsedate_to_datetime
+
+import requests
+from urllib3.exceptions import DecodeError, ProtocolError, ReadTimeoutError
+
+# Hard limits for a single feed fetch. A slow or huge feed is cut off rather than
+# allowed to pin a fetch thread indefinitely.
+DEFAULT_CONNECT_TIMEOUT_S = 3.0
+DEFAULT_READ_TIMEOUT_S = 5.0    # Max wait for any single socket read
+DEFAULT_TOTAL_TIMEOUT_S = 10.0  # Wall-clock budget for the whole fetch (catches slow-drip servers)
+DEFAULT_MAX_BYTES = 256 * 1024  # Byte budget; most feeds have their first items well within this
+CHUNK_SIZE = 4096
+MAX_TRACKED_FEEDS = 32          # Bound on the per-feed stats table
+
+# Multi-feed aggregation limits. These keep the aggregator's memory bounded however many
+# feeds are configured.
+MAX_FEEDS = 16                  # Feeds beyond this in a spec are ignored
+MAX_ITEMS_PER_FEED = 20
+FETCH_POOL_WORKERS = 4          # Concurrent feed downloads shared by all news widgets
+DUPLICATE_SIMILARITY = 0.75     # Token-set Jaccard similarity at which two headlines are "the same story"
+# Words ignored when comparing headlines, so "Storm hits coast" matches "Storm hits the coast"
+HEADLINE_STOPWORDS = frozenset(('a', 'an', 'the', 'of', 'to', 'in', 'on', 'at', 'for', 'and', 'as', 'is', 'by', 'with'))
+
+USER_AGENT = "Smegtrix/2.0 (+RSS ticker)"
+
+# Element local names (namespace stripped) that delimit an item in RSS 2.0 / RSS 1.0 and Atom
+ITEM_TAGS = ('item', 'entry')
+# Element local names that may carry a publish time, in order of preference
+DATE_TAGS = ('pubDate', 'published', 'updated', 'date')
+
+
+def _local_name(tag):
+    """Strips an ElementTree '{namespace}' prefix from a tag name."""
+    return tag.rsplit('}', 1)[-1] if '}' in tag else tag
+
+
+def _iter_body(response):
+    """
+    Yields the decoded body of a streamed requests response as data arrives.
+
+    iter_content() blocks until it has a whole chunk, so a server dripping a few bytes at a
+    time would hold it well past the fetch deadline. read1() returns whatever is already
+    buffered, letting the caller check the deadline between reads. Falls back to
+    iter_content() where urllib3 has no read1(). urllib3 errors are re-raised as the
+    requests exceptions iter_content() would give.
+    """
+    read1 = getattr(response.raw, 'read1', None)
+    if read1 is None:
+        yield from response.iter_content(CHUNK_SIZE)
+        return
+    while True:
+        try:
+            chunk = read1(CHUNK_SIZE, decode_content=True)
+        except ReadTimeoutError as e:
+            raise requests.exceptions.ReadTimeout(e)
+        except ProtocolError as e:
+            raise requests.exceptions.ChunkedEncodingError(e)
+        except DecodeError as e:
+            raise requests.exceptions.ContentDecodingError(e)
+        if not chunk:
+            return
+        yield chunk
+
+
+def _parse_published(text):
+    """Parses an RFC 822 (RSS) or ISO 8601 (Atom) date into a UTC epoch float, or None."""
+    if not text:
+        return None
+    text = text.strip()
+    try:
+        dt = parsedate_to_datetime(text)
+    except (TypeError, ValueError, IndexError):
+        try:
+            dt = datetime.datetime.fromisoformat(text.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=datetime.timezone.utc)
+    return dt.timestamp()
+
+
+class StreamingFeedReader:
+    """
+    Fetches RSS/Atom feeds as a stream and parses items incrementally.
+
+    Unlike feedparser.parse(), which downloads and parses the whole document with no
+    timeout, this reader enforces connect/read timeouts, a total wall-clock deadline
+    and a byte budget, and stops reading as soon as it has the requested number of items.
+    Per-feed statistics (bytes read, parse time, truncations, errors) are kept for reporting.
+    """
+
+    def __init__(self, connect_timeout=DEFAULT_CONNECT_TIMEOUT_S, read_timeout=DEFAULT_READ_TIMEOUT_S,
+                 total_timeout=DEFAULT_TOTAL_TIMEOUT_S, max_bytes=DEFAULT_MAX_BYTES):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.total_timeout = total_timeout
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.feed_stats = OrderedDict()  # url -> stats dict, least recently fetched first
+
+    def fetch(self, url, max_items, total_timeout=None, max_bytes=None):
+        """
+        Fetches up to max_items items from the feed at url.
+
+        Returns a result dict:
+            {'url', 'items': [{'title': str, 'published': float | None}], 'bytes_read',
+             'fetch_ms', 'parse_ms', 'truncated', 'truncation_reason', 'error'}
+        'truncation_reason' is one of 'item_limit', 'byte_budget', 'deadline' or None.
+        'error' is None on success. Items parsed before an error are still returned.
+        """
+        total_timeout = total_timeout if total_timeout else self.total_timeout
+        max_bytes = max_bytes if max_bytes else self.max_bytes
+
+        result = {
+            'url': url,
+            'items': [],
+            'bytes_read': 0,
+            'fetch_ms': 0.0,
+            'parse_ms': 0.0,
+            'truncated': False,
+            'truncation_reason': None,
+            'error': None
+        }
+        start_time = time.monotonic()
+        deadline = start_time + total_timeout
+        parse_seconds = 0.0
+        response = None
+
+        try:
+            # Both timeouts are capped by the total budget, so neither the connect nor the wait
+            # for headers can run far past the deadline; no single read blocks longer than the
+            # read timeout, and the deadline is checked between reads.
+            response = requests.get(url, stream=True,
+                                    timeout=(min(self.connect_timeout, total_timeout), min(self.read_timeout, total_timeout)),
+                                    headers={'User-Agent': USER_AGENT})
+            response.raise_for_status()
+
+            parser = ET.XMLPullParser(events=('start', 'end'))
+            items = result['items']
+            current_item = None
+
+            for chunk in _iter_body(response):
+                if time.monotonic() >= deadline:
+                    result['truncation_reason'] = 'deadline'
+                    break
+                if not chunk:
+                    continue
+                if result['bytes_read'] + len(chunk) > max_bytes:
+                    chunk = chunk[:max_bytes - result['bytes_read']]
+                    result['truncation_reason'] = 'byte_budget'
+                result['bytes_read'] += len(chunk)
+
+                parse_start = time.monotonic()
+                parser.feed(chunk)
+                for event, elem in parser.read_events():
+                    name = _local_name(elem.tag)
+                    if event == 'start':
+                        if name in ITEM_TAGS:
+                            current_item = {'title': None, 'published': None}
+                        continue
+                    # 'end' event: element text is complete
+                    if current_item is None:
+                        continue
+                    if name == 'title' and current_item['title'] is None:
+                        current_item['title'] = (elem.text or '').strip()
+                    elif name in DATE_TAGS and current_item['published'] is None:
+                        current_item['published'] = _parse_published(elem.text)
+                    elif name in ITEM_TAGS:
+                        if current_item['title']:
+                            items.append(current_item)
+                        current_item = None
+                        elem.clear()  # Drop the finished item's subtree to keep memory flat
+                        if len(items) >= max_items:
+                            result['truncation_reason'] = 'item_limit'
+                            break
+                parse_seconds += time.monotonic() - parse_start
+
+                if result['truncation_reason']:
+                    break
+                if time.monotonic() >= deadline:
+                    result['truncation_reason'] = 'deadline'
+                    break
+            else:
+                # Stream ended naturally; make sure the document was well-formed
+                parse_start = time.monotonic()
+                parser.close()
+                parse_seconds += time.monotonic() - parse_start
+
+            # Any early stop (item limit, byte budget or deadline) means the rest of the
+            # document was never read.
+            result['truncated'] = result['truncation_reason'] is not None
+        except requests.exceptions.Timeout as e:
+            if result['bytes_read'] and time.monotonic() >= deadline:
+                # A read timed out after the deadline; what was parsed so far stands
+                result['truncated'] = True
+                result['truncation_reason'] = 'deadline'
+            else:
+                result['error'] = f"Timeout: {e}"
+        except requests.exceptions.HTTPError as e:
+            result['error'] = f"HTTP Error: {e}"
+        except requests.exceptions.RequestException as e:
+            result['error'] = f"RequestException: {e}"
+        except ET.ParseError as e:
+            result['error'] = f"Error parsing feed: {e}"
+        except Exception as e:
+            result['error'] = f"Unexpected error during feed fetch: {e}"
+        finally:
+            if response is not None:
+                response.close()  # Abandon the rest of the body instead of draining it
+
+        result['parse_ms'] = parse_seconds * 1000
+        result['fetch_ms'] = (time.monotonic() - start_time) * 1000
+        self._record_stats(result)
+        return result
+
+    def _record_stats(self, result):
+        """Updates the per-feed stats table with the outcome of a fetch."""
+        url = result['url']
+        with self.lock:
+            stats = self.feed_stats.pop(url, None)
+            if stats is None:
+                stats = {'fetch_count': 0, 'error_count': 0, 'truncation_count': 0}
+            stats['fetch_count'] += 1
+            if result['error']:
+                stats['error_count'] += 1
+            if result['truncated']:
+                stats['truncation_count'] += 1
+            stats.update({
+                'last_fetch_time': time.time(),
+                'last_item_count': len(result['items']),
+                'last_bytes_read': result['bytes_read'],
+                'last_fetch_ms': round(result['fetch_ms'], 2),
+                'last_parse_ms': round(result['parse_ms'], 2),
+                'last_truncation_reason': result['truncation_reason'],
+                'last_error': result['error']
+            })
+            self.feed_stats[url] = stats
+            while len(self.feed_stats) > MAX_TRACKED_FEEDS:
+                self.feed_stats.popitem(last=False)
+
+    def get_stats(self):
+        """Returns a copy of the per-feed stats, keyed by feed URL."""
+        with self.lock:
+            return {url: dict(stats) for url, stats in self.feed_stats.items()}
+
+# Global instance
+feed_reader = StreamingFeedReader()
+
+# Shared pool so feeds are fetched concurrently without each widget spawning a thread per feed
+_fetch_pool = ThreadPoolExecutor(max_workers=FETCH_POOL_WORKERS, thread_name_prefix="feed_fetch")
+
+
+def single_feed(url, default_limit):
+    """A one-entry feed list for a plain URL, which is used as is (commas and '|' included). [] if it's blank."""
+    url = (url or '').strip()
+    return [{'url': url, 'weight': 1.0, 'limit': max(1, min(default_limit, MAX_ITEMS_PER_FEED))}] if url else []
+
+
+def parse_feed_spec(spec, default_limit):
+    """
+    Parses a multi-feed spec string into a list of feed dicts.
+
+    The spec is a comma- or newline-separated list of 'url|weight|limit' entries, where
+    weight (default 1) and limit (default default_limit) are optional, e.g.
+        "http://a/rss.xml|2|5, http://b/rss.xml"
+    Returns [{'url': str, 'weight': float, 'limit': int}], capped at MAX_FEEDS entries.
+    """
+    feeds = []
+    seen_urls = set()
+    for entry in re.split(r'[,\n]', spec or ''):
+        parts = [p.strip() for p in entry.split('|')]
+        url = parts[0]
+        if not url or url in seen_urls:
+            continue
+        weight = 1.0
+        limit = default_limit
+        try:
+            if len(parts) > 1 and parts[1]:
+                weight = max(0.0, float(parts[1]))
+            if len(parts) > 2 and parts[2]:
+                limit = int(parts[2])
+        except ValueError:
+            pass  # Keep defaults for malformed weight/limit
+        feeds.append({'url': url, 'weight': weight, 'limit': max(1, min(limit, MAX_ITEMS_PER_FEED))})
+        seen_urls.add(url)
+        if len(feeds) >= MAX_FEEDS:
+            break
+    return feeds
+
+
+def _headline_tokens(title):
+    """Normalizes a headline into a set of lowercase word tokens for near-duplicate detection."""
+    return frozenset(w for w in re.findall(r'[a-z0-9]+', title.lower()) if w not in HEADLINE_STOPWORDS)
+
+
+def _is_near_duplicate(tokens, kept_token_sets):
+    for other in kept_token_sets:
+        if tokens == other:
+            return True
+        union = len(tokens | other)
+        if union and len(tokens & other) / union >= DUPLICATE_SIMILARITY:
+            return True
+    return False
+
+
+class NewsAggregator:
+    """
+    Combines several feeds into one headline list.
+
+    Feeds are fetched concurrently through the shared pool. Items are de-duplicated
+    (near-identical headlines keep the copy from the higher-weighted feed), each feed gets
+    a share of the max_headlines slots in proportion to its weight (capped by its limit),
+    and the merged list is ordered newest first. Only the latest items of the currently
+    configured feeds are retained, so memory is bounded by MAX_FEEDS * MAX_ITEMS_PER_FEED.
+    """
+
+    def __init__(self, feeds, max_headlines, reader=feed_reader):
+        self.reader = reader
+        self.lock = threading.Lock()
+        self.feeds = []
+        self.max_headlines = max_headlines
+        self.feed_items = {}  # url -> items from the most recent successful fetch
+        self.headlines = []   # Merged, de-duplicated, ordered headline titles
+        self.set_feeds(feeds, max_headlines)
+
+    def set_feeds(self, feeds, max_headlines):
+        """Replaces the feed list. Items cached for feeds no longer listed are dropped."""
+        with self.lock:
+            self.feeds = list(feeds[:MAX_FEEDS])
+            self.max_headlines = max(1, max_headlines)
+            current_urls = {f['url'] for f in self.feeds}
+            for url in list(self.feed_items):
+                if url not in current_urls:
+                    del self.feed_items[url]
+
+    def refresh(self, total_timeout=None, max_bytes=None):
+        """
+        Fetches all feeds concurrently and rebuilds the merged headline list.
+
+        Returns {'headlines': [...], 'changed': bool, 'errors': {url: str}, 'results': {url: result}}.
+        A feed that fails keeps its previously fetched items.
+        """
+        with self.lock:
+            feeds = list(self.feeds)
+
+        total_timeout = total_timeout if total_timeout else self.reader.total_timeout
+        futures = {
+            _fetch_pool.submit(self.reader.fetch, f['url'], f['limit'], total_timeout, max_bytes): f['url']
+            for f in feeds
+        }
+        # Every fetch enforces its own deadline; the extra margin covers queueing behind other feeds.
+        done, not_done = wait(futures, timeout=total_timeout * (1 + len(feeds) / FETCH_POOL_WORKERS) + 1)
+
+        errors = {}
+        results = {}
+        for future in done:
+            url = futures[future]
+            result = future.result()
+            results[url] = result
+            if result['error'] and not result['items']:
+                errors[url] = result['error']
+        for future in not_done:
+            errors[futures[future]] = "Fetch did not complete in time"
+
+        with self.lock:
+            for url, result in results.items():
+                if result['items'] and url in {f['url'] for f in self.feeds}:
+                    self.feed_items[url] = result['items'][:MAX_ITEMS_PER_FEED]
+            merged = self._merge()
+            changed = merged != self.headlines
+            self.headlines = merged
+
+        return {'headlines': list(merged), 'changed': changed, 'errors': errors, 'results': results}
+
+    def _merge(self):
+        """Selects and orders headlines from feed_items. Caller must hold self.lock."""
+        # Flatten into candidates. Undated items get negative times: after every dated item, in feed order.
+        candidates = []
+        for feed_index, feed in enumerate(self.feeds):
+            for item_index, item in enumerate(self.feed_items.get(feed['url'], [])):
+                published = item['published'] if item['published'] is not None else -1.0 - item_index
+                candidates.append((feed['weight'], -feed_index, published, item['title'], feed['url']))
+
+        # De-duplicate, preferring higher-weighted feeds (then earlier-listed feeds, then newer items)
+        candidates.sort(key=lambda c: (c[0], c[1], c[2]), reverse=True)
+        kept_token_sets = []
+        per_feed = {}
+        for weight, _, published, title, url in candidates:
+            tokens = _headline_tokens(title)
+            if not tokens or _is_near_duplicate(tokens, kept_token_sets):
+                continue
+            kept_token_sets.append(tokens)
+            per_feed.setdefault(url, []).append((published, title))
+
+        # Allocate slots in proportion to feed weight, capped by each feed's limit
+        slots = self.max_headlines
+        total_weight = sum(f['weight'] for f in self.feeds if f['url'] in per_feed) or 1.0
+        selected = []
+        leftovers = []
+        for feed in self.feeds:
+            items = sorted(per_feed.get(feed['url'], []), reverse=True)[:feed['limit']]
+            quota = int(round(slots * feed['weight'] / total_weight))
+            selected.extend(items[:quota])
+            leftovers.extend(items[quota:])
+
+        # Fill any unclaimed slots with the newest remaining items, then trim any rounding overshoot
+        selected.sort(reverse=True)
+        if len(selected) < slots:
+            leftovers.sort(reverse=True)
+            selected.extend(leftovers[:slots - len(selected)])
+            selected.sort(reverse=True)
+        return [title for _, title in selected[:slots]]
@@ -0,0 +1,441 @@
+import time
+import zlib
+import struct
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from frame_publisher import PNG_SIGNATURE, png_chunk, encode_runs, apply_runs
+
+HISTORY_SECONDS = 60          # Default span of frames kept
+HISTORY_MEGABYTES = 4         # Default memory cap of the compressed ring
+KEYFRAME_INTERVAL_S = 5       # A new group of frames (keyframe + deltas) starts at least this often...
+KEYFRAME_MAX_FRAMES = 150     # ...or after this many frames
+ENTRY_OVERHEAD_BYTES = 120    # Python object overhead counted per stored frame on top of its compressed data
+HISTORY_COMPRESS_LEVEL = 6    # Runs on the history worker, off the render thread
+PENDING_MAX_FRAMES = 256      # Frames waiting for the worker; older ones are dropped if it falls behind
+MIN_FRAME_DURATION_S = 0.02   # Shorter frames are left out of exports; browsers slow down GIF delays under 2cs
+EXPORT_MAX_SCALE = 8
+EXPORT_TIMEOUT_S = 120
+EXPORT_FORMATS = {'gif': 'image/gif', 'apng': 'image/apng'}
+
+
+class _FrameGroup:
+    """A keyframe and the deltas that follow it, all zlib-compressed. Evicted as a whole."""
+
+    __slots__ = ('width', 'height', 'start_time', 'entries', 'nbytes')
+
+    def __init__(self, width: int, height: int, start_time: float):
+        self.width = width
+        self.height = height
+        self.start_time = start_time
+        self.entries = []   # [(timestamp, seq, mode, data)]; data: the RGB keyframe first, then encode_runs() deltas
+        self.nbytes = 0
+
+
+class FrameHistory:
+    """
+    A memory-bounded ring of the frames shown over the last HISTORY_SECONDS, for remote troubleshooting.
+
+    The render loop hands each published frame to record(), which only appends it to a queue. A
+    worker thread compresses it: every few seconds a zlib keyframe, otherwise the zlib-compressed
+    runs of pixels that changed since the frame before (encode_runs(), the SSE delta format). Whole
+    groups (keyframe + deltas) are dropped from the old end once the ring spans more than the
+    configured seconds or holds more than the configured megabytes. A static screen costs one
+    keyframe every KEYFRAME_INTERVAL_S, a ticking clock a few dozen bytes per frame.
+
+    export() turns a time range into an animated GIF or APNG on a single export thread, so an
+    export never runs on the render thread and two exports never run at once.
+    """
+
+    def __init__(self, seconds: float = HISTORY_SECONDS, megabytes: float = HISTORY_MEGABYTES):
+        self.lock = threading.Lock()
+        self.max_seconds = seconds
+        self.max_bytes = int(megabytes * 1024 * 1024)
+        self.groups = deque()           # _FrameGroup, oldest first
+        self.total_bytes = 0
+        self.pending = deque(maxlen=PENDING_MAX_FRAMES)
+        self._wake = threading.Event()
+        self._thread = None
+        self._exporter = None
+        self._last_recorded_seq = None  # Render thread only
+        self._last_rgb = None           # Worker only: the frame the next delta is taken against
+        self.recorded_count = 0
+        self.dropped_count = 0          # Frames the worker couldn't keep up with
+        self.raw_bytes = 0              # Uncompressed size of the frames in the ring, for the compression ratio
+        self.store_time_ms = 0.0
+        self.exports = {'count': 0, 'failed': 0, 'active': 0, 'last_ms': 0.0, 'last_size': 0, 'last_frames': 0}
+
+    def start(self):
+        """Starts the compression worker if it isn't already running."""
+        with self.lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="frame_history", daemon=True)
+            self._thread.start()
+            if self._exporter is None:
+                self._exporter = ThreadPoolExecutor(max_workers=1, thread_name_prefix="frame_export")
+        print(f"[HISTORY] Frame history started ({self.max_seconds:g}s, {self.max_bytes / 1048576:g}MB)")
+
+    def configure(self, seconds: float = None, megabytes: float = None):
+        """Changes the ring's span and memory cap; shrinking takes effect with the next frame."""
+        with self.lock:
+            if seconds is not None:
+                self.max_seconds = float(seconds)
+            if megabytes is not None:
+                self.max_bytes = int(float(megabytes) * 1024 * 1024)
+            self._evict(time.time())
+
+    # --- Recording ---
+
+    def record(self, frame):
+        """Queues a published frame for the history. Called by the render loop after every publish; repeats are ignored."""
+        if frame.seq == self._last_recorded_seq:
+            return
+        self._last_recorded_seq = frame.seq
+        if len(self.pending) == self.pending.maxlen:
+            self.dropped_count += 1
+        self.pending.append(frame)
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            while self.pending:
+                frame = self.pending.popleft()
+                try:
+                    self._store(frame)
+                except Exception as e:
+                    print(f"[HISTORY] Error storing frame {frame.seq}: {e}")
+
+    def _store(self, frame):
+        start = time.perf_counter()
+        group = self.groups[-1] if self.groups else None
+        data = None
+        if (group is not None and self._last_rgb is not None and (group.width, group.height) == (frame.width, frame.height)
+                and frame.timestamp - group.start_time < KEYFRAME_INTERVAL_S and len(group.entries) < KEYFRAME_MAX_FRAMES):
+            data = zlib.compress(encode_runs(self._last_rgb, frame.rgb, frame.width, frame.height), HISTORY_COMPRESS_LEVEL)
+            if len(data) >= len(group.entries[0][3]):
+                data = None # Most of the screen changed: a keyframe is no bigger and starts a fresh group
+        if data is None:
+            group = _FrameGroup(frame.width, frame.height, frame.timestamp)
+            data = zlib.compress(frame.rgb, HISTORY_COMPRESS_LEVEL)
+        self._last_rgb = frame.rgb
+        size = len(data) + ENTRY_OVERHEAD_BYTES
+        with self.lock:
+            if not group.entries:
+                self.groups.append(group)
+            group.entries.append((frame.timestamp, frame.seq, frame.mode, data))
+            group.nbytes += size
+            self.total_bytes += size
+            self.raw_bytes += len(frame.rgb)
+            self.recorded_count += 1
+            self._evict(frame.timestamp)
+        self.store_time_ms = (time.perf_counter() - start) * 1000
+
+    def _evict(self, now: float):
+        """Drops the oldest groups while over the byte cap, or while the next group alone still covers the span. Holds lock."""
+        while len(self.groups) > 1 and (self.total_bytes > self.max_bytes
+                                        or self.groups[1].start_time <= now - self.max_seconds):
+            group = self.groups.popleft()
+            self.total_bytes -= group.nbytes
+            self.raw_bytes -= len(group.entries) * group.width * group.height * 3
+
+    # --- Reading ---
+
+    def frames(self, start: float = None, end: float = None) -> list:
+        """
+        The frames shown between two Unix times (default: the whole ring) as [(timestamp, width,
+        height, rgb)]. The frame already on screen at `start` is included, with its timestamp moved to `start`.
+        """
+        with self.lock:
+            groups = [(g.width, g.height, g.entries[:]) for g in self.groups]
+        result = []
+        for index, (width, height, entries) in enumerate(groups):
+            next_start = groups[index + 1][2][0][0] if index + 1 < len(groups) else None
+            if (start is not None and next_start is not None and next_start <= start) or (end is not None and entries[0][0] > end):
+                continue # Over before the range, or begins after it
+            pixels = bytearray(zlib.decompress(entries[0][3]))
+            for i, (timestamp, seq, mode, data) in enumerate(entries):
+                if i:
+                    apply_runs(pixels, zlib.decompress(data))
+                if end is not None and timestamp > end:
+                    break
+                if start is not None and timestamp <= start:
+                    # At or before the start: keep only the latest such frame, shown from `start`
+                    result = [(start, width, height, bytes(pixels))]
+                else:
+                    result.append((timestamp, width, height, bytes(pixels)))
+        return result
+
+    # --- Export ---
+
+    def export(self, fmt: str, start: float = None, end: float = None, scale: int = 1):
+        """Encodes a time range as 'gif' or 'apng' on the export thread. Returns a Future of (bytes, frame count)."""
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format: {fmt}")
+        if self._exporter is None:
+            raise RuntimeError("Frame history is not running")
+        with self.lock:
+            self.exports['active'] += 1
+        return self._exporter.submit(self._export, fmt, start, end, max(1, min(int(scale), EXPORT_MAX_SCALE)))
+
+    def _export(self, fmt: str, start: float, end: float, scale: int):
+        export_start = time.perf_counter()
+        try:
+            end = end if end is not None else time.time()
+            frames = self.frames(start, end)
+            if frames:
+                width, height = frames[-1][1], frames[-1][2]
+                frames = [f for f in frames if (f[1], f[2]) == (width, height)] # Only after the panel last changed size
+            timed = _frame_durations([(timestamp, rgb) for timestamp, _, _, rgb in frames], end)
+            data = (encode_gif if fmt == 'gif' else encode_apng)(timed, width, height, scale) if timed else b''
+        except Exception:
+            with self.lock:
+                self.exports['active'] -= 1
+                self.exports['failed'] += 1
+            raise
+        elapsed_ms = (time.perf_counter() - export_start) * 1000
+        with self.lock:
+            self.exports.update(count=self.exports['count'] + 1, active=self.exports['active'] - 1,
+                                last_ms=round(elapsed_ms, 1), last_size=len(data), last_frames=len(timed))
+        print(f"[HISTORY] Exported {len(timed)} frames as {fmt} ({len(data)} bytes) in {elapsed_ms:.0f}ms")
+        return data, len(timed)
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            frame_count = sum(len(g.entries) for g in self.groups)
+            oldest = self.groups[0].entries[0][0] if self.groups else None
+            newest = self.groups[-1].entries[-1][0] if self.groups else None
+            return {
+                'seconds': self.max_seconds,
+                'megabytes': round(self.max_bytes / 1048576, 3),
+                'frames': frame_count,
+                'keyframes': len(self.groups),
+                'bytes': self.total_bytes,
+                'compression_ratio': round(self.raw_bytes / self.total_bytes, 1) if self.total_bytes else None,
+                'oldest': oldest,
+                'newest': newest,
+                'span_s': round(newest - oldest, 2) if self.groups else 0,
+                'recorded': self.recorded_count,
+                'dropped': self.dropped_count,
+                'pending': len(self.pending),
+                'last_store_ms': round(self.store_time_ms, 3),
+                'exports': dict(self.exports)
+            }
+
+
+def _frame_durations(frames: list, end: float) -> list:
+    """[(timestamp, rgb)] -> [(rgb, seconds shown)], leaving out frames shown for less than MIN_FRAME_DURATION_S."""
+    timed = []
+    for i, (timestamp, rgb) in enumerate(frames):
+        until = frames[i + 1][0] if i + 1 < len(frames) else max(end, timestamp + MIN_FRAME_DURATION_S)
+        if until - timestamp >= MIN_FRAME_DURATION_S:
+            timed.append((rgb, until - timestamp))
+        elif timed:
+            rgb_before, duration = timed[-1]
+            timed[-1] = (rgb_before, duration + until - timestamp)
+    return timed
+
+
+def _changed_rect(before: bytes, after: bytes, width: int, height: int):
+    """(x, y, w, h) bounding the pixels that differ, or None if the frames are identical."""
+    stride = width * 3
+    rows = [y for y in range(height) if before[y * stride:(y + 1) * stride] != after[y * stride:(y + 1) * stride]]
+    if not rows:
+        return None
+    left, right = width, 0
+    for y in rows:
+        row, base = after[y * stride:(y + 1) * stride], before[y * stride:(y + 1) * stride]
+        x = 0
+        while row[x * 3:x * 3 + 3] == base[x * 3:x * 3 + 3]:
+            x += 1
+        left = min(left, x)
+        x = width - 1
+        while row[x * 3:x * 3 + 3] == base[x * 3:x * 3 + 3]:
+            x -= 1
+        right = max(right, x + 1)
+    return left, rows[0], right - left, rows[-1] + 1 - rows[0]
+
+
+def _crop(rgb: bytes, width: int, rect) -> list:
+    """The rows of a rectangle of a frame, as RGB bytes per row."""
+    x, y, w, h = rect
+    stride = width * 3
+    return [rgb[(y + row) * stride + x * 3:(y + row) * stride + (x + w) * 3] for row in range(h)]
+
+
+def _scale_rows(rows: list, scale: int, pixel_size: int) -> list:
+    """Nearest-neighbour upscale of rows of pixels (pixel_size bytes each)."""
+    if scale == 1:
+        return rows
+    scaled = []
+    for row in rows:
+        wide = b''.join(row[i:i + pixel_size] * scale for i in range(0, len(row), pixel_size))
+        scaled.extend([wide] * scale)
+    return scaled
+
+
+def _animation_rects(frames: list, width: int, height: int):
+    """Yields (rgb, seconds, rect) per frame: the full frame first, then the rectangle that changed since the frame before."""
+    previous = None
+    for rgb, seconds in frames:
+        rect = (0, 0, width, height) if previous is None else _changed_rect(previous, rgb, width, height)
+        yield rgb, seconds, rect or (0, 0, 1, 1) # Nothing changed: redraw one pixel to keep the timing
+        previous = rgb
+
+
+# --- GIF ---
+
+def _gif_palette(rows: list):
+    """(palette RGB bytes, color index rows). Exact for up to 256 colors, else quantized to 3-3-2 bits."""
+    colors = {}
+    for row in rows:
+        for i in range(0, len(row), 3):
+            colors.setdefault(row[i:i + 3], len(colors))
+        if len(colors) > 256:
+            break
+    if len(colors) <= 256:
+        indexed = [bytes(colors[row[i:i + 3]] for i in range(0, len(row), 3)) for row in rows]
+        return b''.join(colors), indexed
+    palette = b''.join(bytes(((i >> 5) * 255 // 7, ((i >> 2) & 7) * 255 // 7, (i & 3) * 85)) for i in range(256))
+    indexed = [bytes((r & 0xE0) | ((g >> 3) & 0x1C) | (b >> 6) for r, g, b in zip(row[0::3], row[1::3], row[2::3]))
+               for row in rows]
+    return palette, indexed
+
+
+def _lzw_encode(indices: bytes, min_code_size: int) -> bytes:
+    """GIF variable-length LZW, packed LSB first."""
+    clear_code = 1 << min_code_size
+    out = bytearray()
+    bits = 0        # Pending bits, LSB first
+    bit_count = 0
+
+    def reset():
+        return {}, clear_code + 2, min_code_size + 1
+
+    table, next_code, code_size = reset()
+    pending_codes = [(clear_code, code_size)]
+    prefix = indices[0]
+    for index in indices[1:]:
+        key = (prefix << 8) | index
+        code = table.get(key)
+        if code is not None:
+            prefix = code
+            continue
+        pending_codes.append((prefix, code_size))
+        table[key] = next_code
+        if next_code == 1 << code_size and code_size < 12:
+            code_size += 1 # The new code doesn't fit the current width
+        next_code += 1
+        if next_code == 4096:
+            pending_codes.append((clear_code, code_size)) # Table full: start over
+            table, next_code, code_size = reset()
+        prefix = index
+    pending_codes.append((prefix, code_size))
+    pending_codes.append((clear_code + 1, code_size)) # End of information
+    for code, size in pending_codes:
+        bits |= code << bit_count
+        bit_count += size
+        while bit_count >= 8:
+            out.append(bits & 0xFF)
+            bits >>= 8
+            bit_count -= 8
+    if bit_count:
+        out.append(bits & 0xFF)
+    return bytes(out)
+
+
+def _gif_sub_blocks(data: bytes) -> bytes:
+    return b''.join(bytes((len(data[i:i + 255]),)) + data[i:i + 255] for i in range(0, len(data), 255)) + b'\x00'
+
+
+def encode_gif(frames: list, width: int, height: int, scale: int = 1) -> bytes:
+    """
+    An endlessly looping animated GIF of [(rgb, seconds)]. Every frame after the first only
+    covers the rectangle that changed, with its own color table, so a ticking clock stays small.
+    """
+    out = bytearray(b'GIF89a' + struct.pack('<HHBBB', width * scale, height * scale, 0, 0, 0))
+    out += b'\x21\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00' # Loop forever
+    carry = 0.0 # Delays are whole centiseconds; keep the rounding error so long animations don't drift
+    for rgb, seconds, rect in _animation_rects(frames, width, height):
+        exact = seconds * 100 + carry
+        delay = max(2, min(65535, round(exact)))
+        carry = exact - delay
+        palette, indexed = _gif_palette(_crop(rgb, width, rect))
+        table_bits = max(1, (len(palette) // 3 - 1).bit_length())
+        palette += b'\x00' * ((3 << table_bits) - len(palette))
+        x, y, w, h = rect
+        out += struct.pack('<BBBBHBB', 0x21, 0xF9, 4, 1 << 2, delay, 0, 0) # Graphic control: keep the frame below
+        out += struct.pack('<BHHHHB', 0x2C, x * scale, y * scale, w * scale, h * scale, 0x80 | (table_bits - 1)) + palette
+        min_code_size = max(2, table_bits)
+        out += bytes((min_code_size,)) + _gif_sub_blocks(_lzw_encode(b''.join(_scale_rows(indexed, scale, 1)), min_code_size))
+    out += b'\x3b'
+    return bytes(out)
+
+
+# --- APNG ---
+
+def encode_apng(frames: list, width: int, height: int, scale: int = 1) -> bytes:
+    """
+    An endlessly looping animated PNG of [(rgb, seconds)], lossless. Like the GIF, frames after
+    the first only cover the rectangle that changed.
+    """
+    out = bytearray(PNG_SIGNATURE)
+    out += png_chunk(b'IHDR', struct.pack('>IIBBBBB', width * scale, height * scale, 8, 2, 0, 0, 0))
+    out += png_chunk(b'acTL', struct.pack('>II', len(frames), 0))
+    sequence = 0
+    for index, (rgb, seconds, rect) in enumerate(_animation_rects(frames, width, height)):
+        milliseconds = round(seconds * 1000)
+        delay = (milliseconds, 1000) if milliseconds <= 65535 else (min(round(seconds * 100), 65535), 100)
+        x, y, w, h = rect
+        out += png_chunk(b'fcTL', struct.pack('>IIIIIHHBB', sequence, w * scale, h * scale, x * scale, y * scale,
+                                              delay[0], delay[1], 0, 0)) # Dispose none, blend source
+        sequence += 1
+        rows = _scale_rows(_crop(rgb, width, rect), scale, 3)
+        image = zlib.compress(b''.join(b'\x00' + row for row in rows), HISTORY_COMPRESS_LEVEL)
+        if index == 0:
+            out += png_chunk(b'IDAT', image) # The first frame is also the still image
+        else:
+            out += png_chunk(b'fdAT', struct.pack('>I', sequence) + image)
+            sequence += 1
+    out += png_chunk(b'IEND', b'')
+    return bytes(out)
+
+
+# Global instance
+frame_history = FrameHistory()
+
+
+if __name__ == '__main__':
+    # Benchmark: a minute of a ticking clock at 10 fps: memory held, time to store a frame (worker
+    # side), and the export time and size of each format
+    import random
+    from frame_publisher import FramePublisher
+
+    rows = [[(0, 0, 0)] * 64 for _ in range(64)]
+    for _ in range(600):
+        rows[random.randrange(64)][random.randrange(64)] = (random.randrange(256), random.randrange(256), 255)
+    publisher = FramePublisher()
+    history = FrameHistory()
+    frame_count = 600
+    base_time = time.time() - frame_count / 10
+    store_ms = 0.0
+    for n in range(frame_count):
+        for i in random.sample(range(24 * 64, 40 * 64), 40): # The clock's rows
+            rows[i // 64][i % 64] = (random.randrange(256), 0, 255)
+        frame = publisher.publish_buffer(rows, 'default', [])
+        frame.timestamp = base_time + n / 10
+        start = time.perf_counter()
+        history._store(frame)
+        store_ms += (time.perf_counter() - start) * 1000
+    stats = history.get_stats()
+    print(f"{stats['frames']} frames in {stats['bytes'] / 1024:.0f}KB ({stats['keyframes']} keyframes, "
+          f"{stats['compression_ratio']}x), {store_ms / frame_count:.3f}ms per frame")
+    history.start()
+    for fmt in EXPORT_FORMATS:
+        for scale in (1, 4):
+            start = time.perf_counter()
+            data, exported = history.export(fmt, scale=scale).result()
+            print(f"{fmt:<5} x{scale}: {exported} frames, {len(data) / 1024:7.1f}KB in {(time.perf_counter() - start) * 1000:6.0f}ms")
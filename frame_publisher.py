@@ -0,0 +1,472 @@
+import json
+import time
+import zlib
+import base64
+import struct
+import hashlib
+import threading
+from itertools import chain
+
+# Binary frame served by /api/matrix_frame. All integers are little-endian:
+#   magic      4s   b'SMXF'
+#   version    B    FRAME_FORMAT_VERSION
+#   flags      B    reserved, 0
+#   width      H
+#   height     H
+#   seq        I    frame sequence number; advances only when the frame's content changes
+#   dims_ver   I    bumps whenever the widget dimensions change (fetch /api/widget_dimensions then)
+#   mode_len   B    length of the UTF-8 display mode that follows
+#   mode       mode_len bytes
+#   pixels     width * height * 3 bytes, RGB, row-major
+FRAME_MAGIC = b'SMXF'
+FRAME_FORMAT_VERSION = 1
+FRAME_HEADER = struct.Struct('<4sBBHHIIB')
+
+# Delta pushed by /api/matrix_stream: the changes that turn frame base_seq into frame seq.
+#   magic      4s   b'SMXD'
+#   version, flags, width, height, seq, dims_ver   as in the frame header
+#   base_seq   I    the frame this delta applies to
+#   mode_len   B, mode
+#   runs       until the end: start I (pixel index, row-major), count H, then count * 3 RGB bytes
+DELTA_MAGIC = b'SMXD'
+DELTA_HEADER = struct.Struct('<4sBBHHIIIB')
+DELTA_RUN = struct.Struct('<IH')
+DELTA_RUN_MERGE_GAP = 2 # Unchanged pixels bridged inside a run; a new run header costs as much as 2 pixels
+STREAM_KEEPALIVE_S = 15 # SSE comment sent when no frame has changed for this long
+MULTIPART_BOUNDARY = 'smxframe' # Part boundary of /api/matrix_live (multipart/x-mixed-replace)
+POLL_CLIENT_WINDOW_S = 10 # A polling client counts as connected for this long after its last request
+DEFLATE_LEVEL = 1       # Frames are mostly black, so the fastest level already shrinks them 5-40x
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+def pack_rgb(buffer) -> bytes:
+    """Flattens rows of (R, G, B) tuples into raw RGB bytes. Invalid pixels become black."""
+    try:
+        return bytes(chain.from_iterable(chain.from_iterable(buffer)))
+    except (TypeError, ValueError):
+        pass
+    # Slow path: something drew a pixel that isn't three 0-255 ints
+    pixels = bytearray()
+    for row in buffer:
+        for color in row:
+            try:
+                r, g, b = color
+                pixels += bytes((r, g, b))
+            except (TypeError, ValueError):
+                pixels += b'\x00\x00\x00'
+    return bytes(pixels)
+
+
+def png_chunk(chunk_type: bytes, data: bytes) -> bytes:
+    """One PNG chunk: length, type, data and CRC."""
+    return struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', zlib.crc32(chunk_type + data))
+
+
+def encode_png(rgb: bytes, width: int, height: int) -> bytes:
+    """A truecolor 8-bit PNG of raw RGB bytes, using only zlib."""
+    stride = width * 3
+    scanlines = b''.join(b'\x00' + rgb[y * stride:(y + 1) * stride] for y in range(height)) # Filter type 0 per row
+    return (PNG_SIGNATURE
+            + png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+            + png_chunk(b'IDAT', zlib.compress(scanlines, DEFLATE_LEVEL))
+            + png_chunk(b'IEND', b''))
+
+
+def encode_runs(base_rgb: bytes, rgb: bytes, width: int, height: int) -> bytes:
+    """The runs of changed pixels between two frames of the same size, in the DELTA_RUN layout."""
+    stride = width * 3
+    out = bytearray()
+    for y in range(height):
+        row_start = y * stride
+        row = rgb[row_start:row_start + stride]
+        if row == base_rgb[row_start:row_start + stride]:
+            continue
+        base_row = base_rgb[row_start:row_start + stride]
+        run_start = None   # First pixel (x) of the open run
+        run_end = None     # One past its last changed pixel
+        for x in range(width):
+            i = x * 3
+            if row[i:i + 3] != base_row[i:i + 3]:
+                if run_start is None:
+                    run_start = x
+                elif x - run_end > DELTA_RUN_MERGE_GAP:
+                    out += DELTA_RUN.pack(y * width + run_start, run_end - run_start) + row[run_start * 3:run_end * 3]
+                    run_start = x
+                run_end = x + 1
+        if run_start is not None:
+            out += DELTA_RUN.pack(y * width + run_start, run_end - run_start) + row[run_start * 3:run_end * 3]
+    return bytes(out)
+
+
+def apply_runs(pixels: bytearray, runs: bytes):
+    """Applies runs from encode_runs() to a frame's RGB bytes in place."""
+    offset = 0
+    while offset < len(runs):
+        start, count = DELTA_RUN.unpack_from(runs, offset)
+        offset += DELTA_RUN.size
+        pixels[start * 3:(start + count) * 3] = runs[offset:offset + count * 3]
+        offset += count * 3
+
+
+def _sse_event(event: str, seq: int, payload: bytes) -> bytes:
+    return b'event: ' + event.encode() + b'\nid: ' + str(seq).encode() + b'\ndata: ' + base64.b64encode(payload) + b'\n\n'
+
+
+class EncodeStats:
+    """Per-encoding counters for the frame caches: encodes (cache misses), hits, encode time and size."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.encodings = {} # name -> [encodes, hits, total encode ms, max encode ms, last size]
+
+    def _entry(self, name: str) -> list:
+        entry = self.encodings.get(name)
+        if entry is None:
+            entry = self.encodings[name] = [0, 0, 0.0, 0.0, 0]
+        return entry
+
+    def record_encode(self, name: str, elapsed_ms: float, size: int):
+        with self.lock:
+            entry = self._entry(name)
+            entry[0] += 1
+            entry[2] += elapsed_ms
+            entry[3] = max(entry[3], elapsed_ms)
+            entry[4] = size
+
+    def record_hit(self, name: str):
+        with self.lock:
+            self._entry(name)[1] += 1
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return {name: {
+                'encodes': encodes,
+                'hits': hits,
+                'hit_ratio': round(hits / (encodes + hits), 3) if encodes + hits else None,
+                'avg_encode_ms': round(total_ms / encodes, 3) if encodes else None,
+                'max_encode_ms': round(max_ms, 3),
+                'last_size': size
+            } for name, (encodes, hits, total_ms, max_ms, size) in self.encodings.items()}
+
+
+class Frame:
+    """
+    One rendered frame: raw RGB pixels plus what the simulator needs to show it. Immutable once
+    published. Each encoding (binary, deflated binary, PNG, JSON, SSE events) is produced on first
+    request and cached on the frame, i.e. per sequence number, then shared by every client.
+    """
+
+    __slots__ = ('seq', 'width', 'height', 'mode', 'rgb', 'dims_version', 'widget_dimensions', 'content_hash',
+                 'timestamp', '_encoded', '_lock', '_stats')
+
+    def __init__(self, seq: int, width: int, height: int, mode: str, rgb: bytes, dims_version: int,
+                 widget_dimensions: list, content_hash: str, stats: EncodeStats = None):
+        self.seq = seq
+        self.width = width
+        self.height = height
+        self.mode = mode
+        self.rgb = rgb
+        self.dims_version = dims_version
+        self.widget_dimensions = widget_dimensions # Shared between frames until it changes; never mutated
+        self.content_hash = content_hash
+        self.timestamp = time.time()
+        self._encoded = {}
+        self._lock = threading.RLock() # 'deflate' encodes 'binary' first
+        self._stats = stats
+
+    def etag(self, encoding: str) -> str:
+        """Strong ETag of one encoding. Identical content gives the same ETag, even across restarts."""
+        return f'{self.content_hash}-{encoding}'
+
+    def _cached(self, key, build) -> bytes:
+        """The cached bytes for key, building them once (other threads asking meanwhile wait for it)."""
+        name = key if isinstance(key, str) else key[0]
+        data = self._encoded.get(key)
+        if data is None:
+            with self._lock:
+                data = self._encoded.get(key)
+                if data is None:
+                    start = time.perf_counter()
+                    data = build()
+                    self._encoded[key] = data
+                    if self._stats:
+                        self._stats.record_encode(name, (time.perf_counter() - start) * 1000, len(data))
+                    return data
+        if self._stats:
+            self._stats.record_hit(name)
+        return data
+
+    def encoded(self, encoding: str) -> bytes:
+        """The frame as 'binary', 'deflate' (zlib-wrapped binary), 'png', 'json' or 'sse_key' bytes, cached."""
+        return self._cached(encoding, lambda: self._encode(encoding))
+
+    def _encode(self, encoding: str) -> bytes:
+        if encoding == 'binary':
+            mode = self.mode.encode('utf-8')[:255]
+            return FRAME_HEADER.pack(FRAME_MAGIC, FRAME_FORMAT_VERSION, 0, self.width, self.height,
+                                     self.seq & 0xFFFFFFFF, self.dims_version & 0xFFFFFFFF, len(mode)) + mode + self.rgb
+        if encoding == 'deflate':
+            return zlib.compress(self.encoded('binary'), DEFLATE_LEVEL)
+        if encoding == 'png':
+            return encode_png(self.rgb, self.width, self.height)
+        if encoding == 'json':
+            return json.dumps({'pixels': self.pixels(), 'current_display_mode': self.mode, 'seq': self.seq,
+                               'widgets_dimensions': self.widget_dimensions}, separators=(',', ':')).encode('utf-8')
+        if encoding == 'sse_key':
+            return _sse_event('key', self.seq, self.encoded('binary'))
+        raise ValueError(f"Unknown frame encoding: {encoding}")
+
+    def delta_event(self, base: 'Frame') -> bytes:
+        """
+        The SSE event that brings a client showing `base` up to this frame: a delta, a keyframe if
+        the delta wouldn't be smaller, or b'' if nothing visible changed. Cached per base frame, so
+        every client that was on the same frame shares one encode.
+        """
+        return self._cached(('sse_delta', base.seq), lambda: self._encode_delta_event(base))
+
+    def _encode_delta_event(self, base: 'Frame') -> bytes:
+        if (base.width, base.height) != (self.width, self.height):
+            return self.encoded('sse_key')
+        runs = encode_runs(base.rgb, self.rgb, self.width, self.height)
+        if not runs and base.mode == self.mode and base.dims_version == self.dims_version:
+            return b''
+        mode = self.mode.encode('utf-8')[:255]
+        delta = DELTA_HEADER.pack(DELTA_MAGIC, FRAME_FORMAT_VERSION, 0, self.width, self.height, self.seq & 0xFFFFFFFF,
+                                  self.dims_version & 0xFFFFFFFF, base.seq & 0xFFFFFFFF, len(mode)) + mode + runs
+        if len(delta) >= len(self.rgb):
+            return self.encoded('sse_key')
+        return _sse_event('delta', self.seq, delta)
+
+    def pixels(self) -> list:
+        """The frame as nested [R, G, B] lists, the layout of the JSON /api/matrix_data."""
+        stride = self.width * 3
+        rows = []
+        for y in range(self.height):
+            row_bytes = iter(self.rgb[y * stride:(y + 1) * stride])
+            rows.append([list(color) for color in zip(row_bytes, row_bytes, row_bytes)])
+        return rows
+
+
+def content_hash(rgb: bytes, mode: str, dims_version: int) -> str:
+    """64-bit BLAKE2b of everything a client sees in a frame, as hex."""
+    digest = hashlib.blake2b(rgb, digest_size=8)
+    digest.update(mode.encode('utf-8'))
+    digest.update(struct.pack('<I', dims_version & 0xFFFFFFFF))
+    return digest.hexdigest()
+
+
+class FramePublisher:
+    """
+    Holds the latest rendered frame. At the end of each frame the render loop copies its buffer
+    with pack_rgb() (~0.3ms, the only part that needs data_lock) and publishes it. Publishing
+    builds an immutable Frame, with its binary encoding ready, and swaps it in as `frame`, a single
+    reference assignment. Readers just take `frame` and use it: no lock, and never a half-updated
+    frame. A composed frame identical to the current one is not published again: the sequence number
+    only advances when something visible changed, so clients can tell "nothing new" from the number alone.
+
+    Only the render thread publishes. `lock` guards the stream client count and the condition
+    stream clients wait on; readers never need it.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.frame_published = threading.Condition(self.lock) # Wakes stream clients
+        self.stream_clients = 0
+        self.poll_clients = {}      # Remote address -> time of its last frame request
+        self.encode_stats = EncodeStats()
+        self.frame = None
+        self.seq = 0
+        self.widget_dimensions = []
+        self.dims_version = 0
+        self.publish_count = 0      # Frames composed
+        self.unchanged_count = 0    # ...of which were identical to the frame before
+        self.publish_time_ms = 0.0
+
+    def publish(self, rgb: bytes, width: int, height: int, mode: str, widget_dimensions: list) -> Frame:
+        """
+        Publishes a frame (raw RGB from pack_rgb) and returns it; returns the current frame instead
+        if nothing changed. widget_dimensions must not be mutated afterwards. Render thread only.
+        """
+        start = time.perf_counter()
+        self.publish_count += 1
+        if widget_dimensions != self.widget_dimensions:
+            self.widget_dimensions = widget_dimensions
+            self.dims_version += 1
+        frame_hash = content_hash(rgb, mode, self.dims_version)
+        current = self.frame
+        if current is not None and current.content_hash == frame_hash and current.rgb == rgb:
+            self.unchanged_count += 1
+            self.publish_time_ms = (time.perf_counter() - start) * 1000
+            return current
+        frame = Frame(self.seq + 1, width, height, mode, rgb, self.dims_version, widget_dimensions, frame_hash,
+                      self.encode_stats)
+        frame.encoded('binary') # Pre-encoded: what pollers and new stream clients need first
+        with self.frame_published:
+            self.seq = frame.seq
+            self.frame = frame # The atomic swap readers rely on
+            self.frame_published.notify_all()
+        self.publish_time_ms = (time.perf_counter() - start) * 1000
+        return frame
+
+    def publish_buffer(self, buffer, mode: str, widget_dimensions: list) -> Frame:
+        """Copies and publishes a display buffer in one step, for callers that own the buffer outright."""
+        height = len(buffer)
+        return self.publish(pack_rgb(buffer), len(buffer[0]) if height else 0, height, mode, list(widget_dimensions))
+
+    def latest(self) -> Frame:
+        """The most recently published frame, or None before the first one."""
+        return self.frame
+
+    def wait_for_frame(self, after_seq: int, timeout: float) -> Frame:
+        """Blocks until a frame newer than after_seq is published (or timeout) and returns the latest frame."""
+        with self.frame_published:
+            self.frame_published.wait_for(lambda: self.frame is not None and self.frame.seq > after_seq, timeout)
+            return self.frame
+
+    def follow(self, max_fps: float = None):
+        """
+        The frames one streaming client should send: the current frame, then the newest frame each
+        time the client is ready for more, so a slow client skips the frames it couldn't take instead
+        of queueing them. Yields None when nothing changed for STREAM_KEEPALIVE_S. Counted as a stream client.
+        """
+        min_interval = 1.0 / max_fps if max_fps else 0.0
+        with self.lock:
+            self.stream_clients += 1
+        try:
+            sent = self.wait_for_frame(0, STREAM_KEEPALIVE_S)
+            if sent is None:
+                return
+            yield sent
+            last_frame_time = time.monotonic()
+            while True:
+                if min_interval:
+                    time.sleep(max(0.0, min_interval - (time.monotonic() - last_frame_time)))
+                frame = self.wait_for_frame(sent.seq, STREAM_KEEPALIVE_S)
+                if frame.seq == sent.seq:
+                    yield None
+                    continue
+                sent = frame
+                last_frame_time = time.monotonic()
+                yield frame
+        finally:
+            with self.lock:
+                self.stream_clients -= 1
+
+    def stream(self, max_fps: float = None):
+        """
+        Server-Sent Events for one client: a keyframe, then a delta per changed frame. The encoded
+        events are cached on the frames and shared by all clients.
+        """
+        sent = None
+        for frame in self.follow(max_fps):
+            if frame is None:
+                yield b': keepalive\n\n' # Lets the server notice a closed connection
+            elif sent is None:
+                yield b'retry: 2000\n\n' + frame.encoded('sse_key')
+                sent = frame
+            else:
+                event = frame.delta_event(sent)
+                sent = frame
+                if event:
+                    yield event
+
+    def multipart_stream(self, max_fps: float = None):
+        """
+        A live multipart/x-mixed-replace stream (boundary MULTIPART_BOUNDARY) of PNG frames, which
+        browsers, VLC and ffmpeg play like MJPEG. The PNGs are the frames' cached 'png' encodings.
+        """
+        frame = None
+        for latest in self.follow(max_fps):
+            frame = latest or frame # The current frame is sent again as a keepalive
+            png = frame.encoded('png')
+            yield (f'--{MULTIPART_BOUNDARY}\r\nContent-Type: image/png\r\nContent-Length: {len(png)}\r\n'
+                   f'X-Frame-Seq: {frame.seq}\r\n\r\n').encode('ascii') + png + b'\r\n'
+
+    def note_poll_client(self, address: str):
+        """Records a polling client's request, for the client count in the stats."""
+        self.poll_clients[address] = time.monotonic()
+
+    def _active_poll_clients(self) -> int:
+        cutoff = time.monotonic() - POLL_CLIENT_WINDOW_S
+        for address, last_seen in list(self.poll_clients.items()):
+            if last_seen < cutoff:
+                self.poll_clients.pop(address, None)
+        return len(self.poll_clients)
+
+    def get_widget_dimensions(self) -> dict:
+        frame = self.frame
+        if frame is None:
+            return {'version': 0, 'current_display_mode': None, 'widgets_dimensions': []}
+        return {
+            'version': frame.dims_version,
+            'current_display_mode': frame.mode,
+            'widgets_dimensions': frame.widget_dimensions
+        }
+
+    def get_stats(self) -> dict:
+        frame = self.frame
+        return {
+            'seq': frame.seq if frame else 0,
+            'published': self.publish_count,
+            'unchanged': self.unchanged_count,
+            'last_publish_ms': round(self.publish_time_ms, 3),
+            'dims_version': frame.dims_version if frame else 0,
+            'stream_clients': self.stream_clients,
+            'poll_clients': self._active_poll_clients(),
+            'encodings': self.encode_stats.get_stats()
+        }
+
+
+# Global instance
+frame_publisher = FramePublisher()
+
+
+if __name__ == '__main__':
+    # Benchmark: the per-frame cost of publishing and of each encoding (each run on a new frame, so
+    # nothing comes from the cache), against the old jsonify-the-nested-list path
+    import random
+
+    rows = [[(0, 0, 0)] * 64 for _ in range(64)]
+    for _ in range(600): # A screen's worth of text and graphics
+        rows[random.randrange(64)][random.randrange(64)] = (random.randrange(256), random.randrange(256), 255)
+    publisher = FramePublisher()
+    n = 500
+
+    def new_frame(changed=1):
+        """Changes some pixels (a ticking clock) and publishes the result."""
+        for i in random.sample(range(64 * 64), changed):
+            rows[i // 64][i % 64] = (random.randrange(256), 0, 255)
+        return publisher.publish_buffer(rows, 'default', [])
+
+    def tick_delta(changed):
+        """What a stream client costs per frame; every further client on the same frame reuses the event."""
+        base = publisher.frame
+        return new_frame(changed).delta_event(base)
+
+    new_frame()
+    for label, fn in (
+        ("pack_rgb (under data_lock)", lambda: pack_rgb(rows)),
+        ("publish (incl. pack_rgb)", lambda: new_frame()),
+        ("publish unchanged frame", lambda: publisher.publish_buffer(rows, 'default', [])),
+        ("+ deflate", lambda: new_frame().encoded('deflate')),
+        ("+ png", lambda: new_frame().encoded('png')),
+        ("+ json", lambda: new_frame().encoded('json')),
+        ("json.dumps(buffer) (old)", lambda: json.dumps({'pixels': rows})),
+        ("+ sse delta (40 px)", lambda: tick_delta(40)),
+        ("+ sse delta (all px)", lambda: tick_delta(64 * 64)),
+    ):
+        start = time.perf_counter()
+        for _ in range(n):
+            result = fn()
+        elapsed_ms = (time.perf_counter() - start) * 1000 / n
+        size = len(result) if isinstance(result, (bytes, str)) else len(publisher.frame.rgb)
+        print(f"{label:<27} {elapsed_ms:7.3f}ms  {size:6d} bytes")
+
+    # Fan-out: 50 clients polling the same frame cost one encode
+    publisher = FramePublisher()
+    frame = new_frame()
+    start = time.perf_counter()
+    for _ in range(50):
+        frame.encoded('deflate')
+    print(f"{'50 clients, one frame':<27} {(time.perf_counter() - start) * 1000:7.3f}ms  "
+          f"{publisher.get_stats()['encodings']['deflate']}")
@@ -0,0 +1,480 @@
+import os
+import json
+import time
+import atexit
+import ctypes
+import select
+import struct
+import hashlib
+import threading
+from collections import deque
+
+LAYOUTS_FILE_PATH = 'screen_layouts.json'
+VERSION_KEY = 'layout_version'   # Written into the file with every save; not a screen
+SAVE_DEBOUNCE_S = 0.5            # A save waits until the layouts have been quiet this long...
+SAVE_MAX_DELAY_S = 3.0           # ...but never longer than this after the first unsaved change
+FLUSH_TIMEOUT_S = 5              # How long exit waits for a pending save
+CHANGE_FEED_SIZE = 256           # Changes kept for clients following the change feed
+CHANGE_FEED_MAX_WAIT_S = 25      # Longest a change feed request is held open waiting for a change
+WATCH_SETTLE_S = 0.2             # A reload waits until the file has had no events for this long
+WATCH_POLL_INTERVAL_S = 2.0      # Stat interval when inotify isn't available
+SETTINGS_KEYS = ('matrix_data_logging_enabled', VERSION_KEY) # Top-level keys that are not screens
+
+
+class LayoutWriter:
+    """
+    Persists the screen layouts from a single background thread.
+
+    Every layout change calls mark_dirty(), which only bumps the in-memory version and wakes the
+    writer. The writer waits for SAVE_DEBOUNCE_S of quiet (at most SAVE_MAX_DELAY_S), so a burst of
+    changes, e.g. dragging a widget, becomes one write. It then takes one snapshot via the `snapshot`
+    callable given to start() (which serializes the layouts under the app's data_lock), and
+    writes it to a temp file, fsyncs it and renames it over the layouts file. A crash leaves either
+    the previous complete file or the new one, never a truncated one. Each write carries the
+    version it contains (VERSION_KEY), and saved_version tells which change is on disk.
+
+    The version is also the layouts' version for clients: etag() is derived from it, and every
+    change may be described to mark_dirty() for the change feed, so clients can follow changes
+    with changes_since() instead of refetching every layout.
+    """
+
+    def __init__(self, path: str = LAYOUTS_FILE_PATH):
+        self.path = path
+        self.snapshot = None
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock) # Wakes the writer on a change and flush() on a save
+        self.version = 0                # Bumped by every change
+        self.saved_version = 0          # The version last written to disk
+        self.first_dirty_time = None    # When the oldest unsaved change was made
+        self.last_dirty_time = 0.0
+        self._thread = None
+        self.write_count = 0
+        self.change_count = 0
+        self.error_count = 0
+        self.last_error = None
+        self.last_write_ms = 0.0        # Snapshot + write + fsync + rename
+        self.last_latency_ms = 0.0      # First unsaved change to its data being on disk
+        self.max_latency_ms = 0.0
+        self.total_latency_ms = 0.0
+        self.last_size = 0
+        self.instance = os.urandom(4).hex()      # Tells clients the versions are from a different run
+        self.changes = deque(maxlen=CHANGE_FEED_SIZE)
+        self.writing = False
+        self.own_digests = deque(maxlen=2) # Of our last two saves, newest last; the newest is recorded before it's on disk
+
+    def start(self, snapshot):
+        """Starts the writer thread. snapshot() must return the JSON-serializable data to save, as a dict."""
+        with self.lock:
+            self.snapshot = snapshot
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="layout_writer", daemon=True)
+            self._thread.start()
+        atexit.register(self.flush, FLUSH_TIMEOUT_S)
+        print(f"[LAYOUTS] Layout writer started ({SAVE_DEBOUNCE_S}s debounce) for {self.path}")
+
+    def loaded(self, version):
+        """Continues the version numbering from the layouts file that was just loaded."""
+        try:
+            version = int(version or 0)
+        except (TypeError, ValueError):
+            return
+        with self.lock:
+            self.version = max(self.version, version)
+            self.saved_version = max(self.saved_version, version)
+
+    def mark_dirty(self, op: str = 'replace', screen_id: str = None, widget_id: str = None, data=None,
+                   on_disk: bool = False) -> int:
+        """
+        Records a layout change to be saved and publishes it on the change feed. Returns the new
+        version. op is 'replace' (anything may have changed: clients refetch), 'screen' or 'widget'
+        (data is the screen's or widget's new config, not to be mutated afterwards), 'add_screen',
+        'remove_screen' or 'settings'. on_disk: the change came from the file itself, so it isn't
+        written back unless other changes are waiting to be saved. Cheap; never blocks on I/O.
+        """
+        now = time.monotonic()
+        with self.changed:
+            self.version += 1
+            self.change_count += 1
+            if on_disk and not self.writing and self.saved_version == self.version - 1:
+                self.saved_version = self.version
+            else:
+                self.last_dirty_time = now
+                if self.first_dirty_time is None:
+                    self.first_dirty_time = now
+            self.changes.append({'version': self.version, 'op': op, 'screen_id': screen_id, 'widget_id': widget_id,
+                                 'data': data})
+            self.changed.notify_all()
+            return self.version
+
+    def etag(self) -> str:
+        """ETag of the current layouts. Read it under the same lock the layouts are changed under."""
+        return f'{self.instance}-{self.version}'
+
+    def changes_since(self, version: int, wait: float = 0, instance: str = None) -> dict:
+        """
+        The changes after a version, waiting up to `wait` seconds for one if there are none yet.
+        'reset' is true when the changes since that version are no longer all known, or when
+        `instance`, the one the client got the version from, is another run's; the client must
+        then refetch the layouts.
+        """
+        with self.changed:
+            if instance is not None and instance != self.instance:
+                return {'instance': self.instance, 'version': self.version, 'reset': True, 'changes': []}
+            if wait > 0 and version == self.version:
+                self.changed.wait_for(lambda: self.version != version, min(wait, CHANGE_FEED_MAX_WAIT_S))
+            oldest_known = self.changes[0]['version'] - 1 if self.changes else self.version
+            return {
+                'instance': self.instance,
+                'version': self.version,
+                'reset': not oldest_known <= version <= self.version,
+                'changes': [change for change in self.changes if change['version'] > version]
+            }
+
+    def flush(self, timeout: float = FLUSH_TIMEOUT_S) -> bool:
+        """Waits until every change made so far is on disk. False on timeout or if the writer isn't running."""
+        with self.changed:
+            target = self.version
+            if self._thread is None:
+                return self.saved_version >= target
+            return self.changed.wait_for(lambda: self.saved_version >= target, timeout)
+
+    def _run(self):
+        while True:
+            with self.changed:
+                self.changed.wait_for(lambda: self.version > self.saved_version)
+                # Debounce: wait for a quiet period, bounded by the maximum delay
+                while True:
+                    now = time.monotonic()
+                    deadline = min(self.last_dirty_time + SAVE_DEBOUNCE_S, self.first_dirty_time + SAVE_MAX_DELAY_S)
+                    if now >= deadline:
+                        break
+                    self.changed.wait(deadline - now)
+                version = self.version # Taken before the snapshot, so the snapshot holds at least this version
+                first_dirty_time = self.first_dirty_time
+                self.first_dirty_time = None
+                self.writing = True
+            try:
+                self._write(version, first_dirty_time)
+            finally:
+                with self.changed:
+                    self.writing = False
+
+    def _write(self, version: int, first_dirty_time: float):
+        start = time.perf_counter()
+        try:
+            data = dict(self.snapshot())
+            data[VERSION_KEY] = version
+            text = json.dumps(data, indent=4)
+            with self.changed:
+                self.own_digests.append(hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest())
+            temp_path = self.path + '.tmp'
+            with open(temp_path, 'w') as f:
+                f.write(text)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+            self._fsync_directory()
+        except Exception as e:
+            print(f"[LAYOUTS] Error saving screen layouts to {self.path}: {e}")
+            with self.changed:
+                self.error_count += 1
+                self.last_error = str(e)
+                if self.first_dirty_time is None:
+                    self.first_dirty_time = first_dirty_time
+                self.last_dirty_time = time.monotonic() # Retry after another debounce period
+            time.sleep(SAVE_DEBOUNCE_S)
+            return
+        now = time.monotonic()
+        latency_ms = (now - first_dirty_time) * 1000
+        with self.changed:
+            self.saved_version = max(self.saved_version, version)
+            self.write_count += 1
+            self.last_write_ms = (time.perf_counter() - start) * 1000
+            self.last_latency_ms = latency_ms
+            self.max_latency_ms = max(self.max_latency_ms, latency_ms)
+            self.total_latency_ms += latency_ms
+            self.last_size = len(text)
+            self.changed.notify_all()
+        print(f"[LAYOUTS] Saved version {version} to {self.path} ({len(text)} bytes, {self.last_write_ms:.1f}ms write)")
+
+    def _fsync_directory(self):
+        """Makes the rename itself durable. Not supported everywhere, so failures are ignored."""
+        try:
+            fd = os.open(os.path.dirname(os.path.abspath(self.path)), os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        except OSError:
+            pass
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return {
+                'path': self.path,
+                'version': self.version,
+                'saved_version': self.saved_version,
+                'pending': self.version > self.saved_version,
+                'changes': self.change_count,
+                'writes': self.write_count,
+                'coalesced': max(0, self.change_count - self.write_count),
+                'errors': self.error_count,
+                'last_error': self.last_error,
+                'last_write_ms': round(self.last_write_ms, 2),
+                'last_latency_ms': round(self.last_latency_ms, 1),
+                'avg_latency_ms': round(self.total_latency_ms / self.write_count, 1) if self.write_count else None,
+                'max_latency_ms': round(self.max_latency_ms, 1),
+                'last_size': self.last_size
+            }
+
+
+def validate_widget_config(widget_config):
+    """An error message if a widget config can't be rendered, else None."""
+    if not isinstance(widget_config, dict) or not widget_config.get('id') or not isinstance(widget_config['id'], str):
+        return "Each widget must be an object with a string 'id'."
+    for key in ('x', 'y'):
+        if key in widget_config and (not isinstance(widget_config[key], int) or isinstance(widget_config[key], bool)):
+            return f"Widget '{widget_config['id']}': '{key}' must be an integer."
+    if 'type' in widget_config and not isinstance(widget_config['type'], str):
+        return f"Widget '{widget_config['id']}': 'type' must be a string."
+    return None
+
+
+def validate_screen_config(screen_config):
+    """An error message if a screen config can't be rendered (bad widgets, duplicate widget ids, bad display time), else None."""
+    if not isinstance(screen_config, dict):
+        return "A screen must be an object."
+    widgets = screen_config.get('widgets', [])
+    if not isinstance(widgets, list):
+        return "widgets must be a list."
+    widget_ids = set()
+    for widget_config in widgets:
+        error = validate_widget_config(widget_config)
+        if error:
+            return error
+        if widget_config['id'] in widget_ids:
+            return f"Duplicate widget id '{widget_config['id']}'."
+        widget_ids.add(widget_config['id'])
+    if 'display_time_seconds' in screen_config: # Missing means the default
+        display_time = screen_config['display_time_seconds']
+        if not isinstance(display_time, (int, float)) or isinstance(display_time, bool) or display_time <= 0:
+            return "display_time_seconds must be a positive number."
+    return None
+
+
+def parse_layouts(text: str, default_display_time: float):
+    """
+    Parses and validates a screen_layouts.json. Returns (screens, settings) with the same defaults
+    load_screen_layouts() fills in. Raises ValueError describing the first problem: a file with
+    any invalid screen is rejected as a whole.
+    """
+    try:
+        raw = json.loads(text)
+    except ValueError as e:
+        raise ValueError(f"Invalid JSON: {e}")
+    if not isinstance(raw, dict):
+        raise ValueError("The top level must be an object of screens")
+    settings = {key: raw[key] for key in SETTINGS_KEYS if key in raw}
+    if not isinstance(settings.get('matrix_data_logging_enabled', True), bool):
+        raise ValueError("matrix_data_logging_enabled must be true or false")
+    screens = {}
+    for screen_id, screen_config in raw.items():
+        if screen_id in SETTINGS_KEYS:
+            continue
+        error = validate_screen_config(screen_config)
+        if error:
+            raise ValueError(f"Screen '{screen_id}': {error}")
+        screen_config = dict(screen_config)
+        screen_config.setdefault('widgets', [])
+        screen_config.setdefault('display_time_seconds', default_display_time)
+        screens[screen_id] = screen_config
+    if 'default' not in screens:
+        raise ValueError("The 'default' screen is missing")
+    return screens, settings
+
+
+class LayoutWatcher:
+    """
+    Reloads the layouts file when something other than this app changes it, e.g. config management
+    pushing a new screen_layouts.json to a fleet of panels.
+
+    Watches the file's directory with inotify (so replacing the file by rename is seen too), or
+    stats the file every WATCH_POLL_INTERVAL_S where inotify isn't available. Once the file has
+    settled, it is read, parsed and validated on this thread; the render thread never waits for
+    it. Content we wrote ourselves (the layout writer's newest save) or already applied is
+    ignored; an older save of ours is a rollback and is applied like any other file. A valid
+    file is handed to the `apply` callable given to start(), which applies the difference; an
+    invalid one is reported and the current layouts are kept.
+    """
+
+    IN_CLOSE_WRITE = 0x008
+    IN_MOVED_TO = 0x080
+    IN_CREATE = 0x100
+    IN_Q_OVERFLOW = 0x4000
+    INOTIFY_EVENT = struct.Struct('iIII') # wd, mask, cookie, name length
+
+    def __init__(self, writer: LayoutWriter, default_display_time: float = 10):
+        self.writer = writer
+        self.default_display_time = default_display_time
+        self.apply = None
+        self.lock = threading.Lock()
+        self._thread = None
+        self.mode = None                # 'inotify' or 'polling'
+        self.known_digest = None        # Content last loaded, applied or saved by us
+        self.reload_count = 0
+        self.ignored_count = 0          # Events for our own saves or unchanged content
+        self.failure_count = 0
+        self.last_error = None
+        self.last_result = None         # What the last reload changed, from apply()
+        self.last_reload_ms = 0.0       # File modified to changes applied
+        self.max_reload_ms = 0.0
+        self.last_reload_time = None
+
+    def start(self, apply, default_display_time: float = None):
+        """
+        Starts watching. apply(screens, settings) applies a validated file and returns a summary of
+        what changed. default_display_time fills in screens without display_time_seconds.
+        """
+        with self.lock:
+            self.apply = apply
+            if default_display_time is not None:
+                self.default_display_time = default_display_time
+            if self._thread and self._thread.is_alive():
+                return
+            try:
+                with open(self.writer.path, 'rb') as f:
+                    self.known_digest = self._digest(f.read())
+            except OSError:
+                pass
+            self._thread = threading.Thread(target=self._run, name="layout_watcher", daemon=True)
+            self._thread.start()
+
+    @staticmethod
+    def _digest(data: bytes) -> bytes:
+        return hashlib.blake2b(data, digest_size=16).digest()
+
+    def _run(self):
+        try:
+            fd = self._inotify_open()
+        except Exception as e:
+            print(f"[LAYOUTS] inotify unavailable ({e}); polling {self.writer.path} every {WATCH_POLL_INTERVAL_S}s")
+            self.mode = 'polling'
+            self._poll()
+            return
+        self.mode = 'inotify'
+        print(f"[LAYOUTS] Watching {self.writer.path} for external changes (inotify)")
+        name = os.path.basename(self.writer.path).encode()
+        last_event_time = None
+        while True:
+            timeout = None if last_event_time is None else max(0.0, last_event_time + WATCH_SETTLE_S - time.monotonic())
+            readable, _, _ = select.select([fd], [], [], timeout)
+            if readable:
+                data = os.read(fd, 65536)
+                offset = 0
+                while offset < len(data):
+                    _, mask, _, length = self.INOTIFY_EVENT.unpack_from(data, offset)
+                    event_name = data[offset + self.INOTIFY_EVENT.size:offset + self.INOTIFY_EVENT.size + length].rstrip(b'\0')
+                    offset += self.INOTIFY_EVENT.size + length
+                    if event_name == name or mask & self.IN_Q_OVERFLOW:
+                        last_event_time = time.monotonic()
+            elif last_event_time is not None:
+                self._check()
+                last_event_time = None
+
+    def _inotify_open(self) -> int:
+        """An inotify descriptor watching the layouts file's directory, via libc. Raises OSError if unsupported."""
+        libc = ctypes.CDLL(None, use_errno=True)
+        fd = libc.inotify_init1(os.O_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        directory = os.path.dirname(os.path.abspath(self.writer.path))
+        if libc.inotify_add_watch(fd, directory.encode(), self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE) < 0:
+            error = ctypes.get_errno()
+            os.close(fd)
+            raise OSError(error, f"inotify_add_watch on {directory} failed")
+        return fd
+
+    def _poll(self):
+        signature = self._stat_signature()
+        while True:
+            time.sleep(WATCH_POLL_INTERVAL_S)
+            current = self._stat_signature()
+            if current != signature:
+                signature = current
+                self._check()
+
+    def _stat_signature(self):
+        try:
+            stat = os.stat(self.writer.path)
+            return stat.st_mtime_ns, stat.st_size, stat.st_ino
+        except OSError:
+            return None
+
+    def _check(self):
+        """Reads the file and applies it if it is new, valid content."""
+        try:
+            with open(self.writer.path, 'rb') as f:
+                data = f.read()
+                modified_time = os.fstat(f.fileno()).st_mtime
+        except FileNotFoundError:
+            return # Removed: keep the current layouts; a new file is picked up when it appears
+        except OSError as e:
+            self._failed(f"Could not read {self.writer.path}: {e}")
+            return
+        digest = self._digest(data)
+        with self.writer.lock:
+            own_digests = self.writer.own_digests
+            # While a save is being written, the file still holds the one before it
+            own_save = bool(own_digests) and (digest == own_digests[-1] or
+                                              (self.writer.writing and len(own_digests) == 2 and digest == own_digests[0]))
+        if own_save or digest == self.known_digest:
+            self.known_digest = digest # So going back to the content loaded before our save is a change
+            with self.lock:
+                self.ignored_count += 1
+            return
+        self.known_digest = digest # A broken file is reported once, not on every event
+        try:
+            screens, settings = parse_layouts(data.decode('utf-8'), self.default_display_time)
+        except (ValueError, UnicodeDecodeError) as e:
+            self._failed(f"Rejected {self.writer.path}: {e}")
+            return
+        try:
+            result = self.apply(screens, settings)
+        except Exception as e:
+            self._failed(f"Error applying {self.writer.path}: {e}")
+            return
+        elapsed_ms = max(0.0, time.time() - modified_time) * 1000
+        with self.lock:
+            self.reload_count += 1
+            self.last_result = result
+            self.last_error = None
+            self.last_reload_ms = elapsed_ms
+            self.max_reload_ms = max(self.max_reload_ms, elapsed_ms)
+            self.last_reload_time = time.strftime("%Y-%m-%d %H:%M:%S")
+        print(f"[LAYOUTS] Reloaded {self.writer.path} in {elapsed_ms:.0f}ms: {result}")
+
+    def _failed(self, message: str):
+        print(f"[LAYOUTS] {message}; keeping the current layouts")
+        with self.lock:
+            self.failure_count += 1
+            self.last_error = message
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return {
+                'mode': self.mode,
+                'reloads': self.reload_count,
+                'ignored': self.ignored_count,
+                'validation_failures': self.failure_count,
+                'last_error': self.last_error,
+                'last_reload': self.last_reload_time,
+                'last_changes': self.last_result,
+                'last_reload_ms': round(self.last_reload_ms, 1),
+                'max_reload_ms': round(self.max_reload_ms, 1)
+            }
+
+
+# Global instance
+layout_writer = LayoutWriter()
+layout_watcher = LayoutWatcher(layout_writer)
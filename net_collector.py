@@ -0,0 +1,361 @@
+import os
+import sys
+import time
+import array
+import socket
+import struct
+import threading
+import subprocess
+from collections import deque
+
+try:
+    import fcntl # ioctl access; Unix only
+except ImportError:
+    fcntl = None
+
+# Kernel interfaces read by the collector. All of these are plain file reads or a single
+# ioctl, so nothing here forks a process.
+PROC_NET_WIRELESS = '/proc/net/wireless'
+PROC_NET_DEV = '/proc/net/dev'
+PROC_UPTIME = '/proc/uptime'
+SYS_CLASS_NET = '/sys/class/net'
+
+# ioctl request numbers from <linux/sockios.h> and <linux/wireless.h>
+SIOCGIFADDR = 0x8915
+SIOCGIWESSID = 0x8B1B
+IW_ESSID_MAX_SIZE = 32
+IFNAMSIZ = 16
+
+# connect() on a UDP socket only selects a route, no packet is sent. The local address
+# it picks is the one outbound traffic uses, i.e. the first address `hostname -I` reports.
+ROUTE_PROBE_ADDR = ('8.8.8.8', 80)
+
+# Throughput sampler cadence and per-interface history (SAMPLE_HISTORY samples of rx/tx rate)
+SAMPLE_INTERVAL_S = 1.0
+SAMPLE_HISTORY = 120
+
+
+class LinuxNetCollector:
+    """
+    Reads network statistics straight from /proc, /sys and socket ioctls instead of forking
+    iwgetid/iwconfig/hostname/nmcli. Every getter returns None when the value can't be read
+    this way (not Linux, no wireless extensions, ...) so callers can fall back to their
+    subprocess paths.
+    """
+
+    def __init__(self):
+        self.available = sys.platform.startswith('linux')
+
+    def read_net_dev(self) -> dict:
+        """Returns {interface: (rx_bytes, tx_bytes)} from /proc/net/dev, or {} if unreadable."""
+        counters = {}
+        try:
+            with open(PROC_NET_DEV, 'r') as f:
+                lines = f.readlines()[2:] # Skip the two header lines
+        except OSError:
+            return counters
+        for line in lines:
+            name, sep, data = line.partition(':')
+            if not sep:
+                continue
+            fields = data.split()
+            if len(fields) < 9:
+                continue
+            counters[name.strip()] = (int(fields[0]), int(fields[8]))
+        return counters
+
+    def list_interfaces(self) -> list:
+        """Names of all network interfaces, from /sys/class/net (or /proc/net/dev)."""
+        try:
+            return sorted(os.listdir(SYS_CLASS_NET))
+        except OSError:
+            return sorted(self.read_net_dev())
+
+    def is_wireless(self, interface: str) -> bool:
+        return (os.path.isdir(os.path.join(SYS_CLASS_NET, interface, 'wireless')) or
+                os.path.exists(os.path.join(SYS_CLASS_NET, interface, 'phy80211')))
+
+    def get_operstate(self, interface: str) -> str | None:
+        """'up', 'down', 'dormant', ... as reported in /sys/class/net/<if>/operstate."""
+        try:
+            with open(os.path.join(SYS_CLASS_NET, interface, 'operstate'), 'r') as f:
+                return f.read().strip()
+        except OSError:
+            return None
+
+    def _read_wireless(self) -> dict:
+        """
+        Parses /proc/net/wireless into {interface: {'link': float, 'level': int, 'noise': int}}.
+        Only interfaces with wireless extensions appear in this file.
+        """
+        stats = {}
+        try:
+            with open(PROC_NET_WIRELESS, 'r') as f:
+                lines = f.readlines()[2:]
+        except OSError:
+            return stats
+        for line in lines:
+            name, sep, data = line.partition(':')
+            fields = data.split()
+            if not sep or len(fields) < 4:
+                continue
+            try:
+                level = int(float(fields[2]))
+                noise = int(float(fields[3]))
+            except ValueError:
+                continue
+            # Some drivers report dBm as an unsigned byte (e.g. 200 for -56 dBm)
+            if level > 0:
+                level -= 256
+            stats[name.strip()] = {'link': float(fields[1].rstrip('.') or 0), 'level': level, 'noise': noise}
+        return stats
+
+    def get_wifi_interface(self) -> str | None:
+        """The active Wi-Fi interface: first one in /proc/net/wireless, else the first wireless one in /sys."""
+        if not self.available:
+            return None
+        wireless = self._read_wireless()
+        if wireless:
+            return next(iter(wireless))
+        candidates = [name for name in self.list_interfaces() if self.is_wireless(name)]
+        # Prefer an interface that is up, otherwise take any wireless one
+        for name in candidates:
+            if self.get_operstate(name) == 'up':
+                return name
+        return candidates[0] if candidates else None
+
+    def get_rssi(self, interface: str = None) -> int | None:
+        """Signal level in dBm from /proc/net/wireless, or None if the interface isn't associated."""
+        if not self.available:
+            return None
+        wireless = self._read_wireless()
+        if interface is None:
+            interface = next(iter(wireless), None)
+        entry = wireless.get(interface)
+        # An interface that isn't associated is still listed, with a link quality and level of 0
+        if not entry or not entry['link'] or not entry['level']:
+            return None
+        return entry['level']
+
+    def get_ssid(self, interface: str = None) -> str | None:
+        """
+        SSID via the SIOCGIWESSID wireless-extensions ioctl. Returns '' when the interface
+        isn't associated, None when it can't be queried this way.
+        """
+        if not self.available or fcntl is None:
+            return None
+        interface = interface or self.get_wifi_interface()
+        if not interface:
+            return None
+        essid = array.array('B', bytes(IW_ESSID_MAX_SIZE + 1))
+        essid_addr, essid_len = essid.buffer_info()
+        # struct iwreq: char ifr_name[IFNAMSIZ]; struct iw_point { void *pointer; __u16 length; __u16 flags; }
+        request = struct.pack(f'{IFNAMSIZ}sPHH', interface.encode()[:IFNAMSIZ - 1], essid_addr, essid_len, 0)
+        request += bytes(max(0, 2 * IFNAMSIZ - len(request))) # Pad to the size of the iwreq union
+        try:
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+                result = fcntl.ioctl(sock.fileno(), SIOCGIWESSID, request)
+        except OSError:
+            return None
+        length = struct.unpack(f'{IFNAMSIZ}sPHH', result[:struct.calcsize(f'{IFNAMSIZ}sPHH')])[2]
+        return essid.tobytes()[:length].rstrip(b'\x00').decode('utf-8', errors='replace')
+
+    def get_interface_ip(self, interface: str) -> str | None:
+        """IPv4 address of a specific interface via the SIOCGIFADDR ioctl."""
+        if not self.available or fcntl is None or not interface:
+            return None
+        try:
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+                result = fcntl.ioctl(sock.fileno(), SIOCGIFADDR,
+                                     struct.pack('256s', interface.encode()[:IFNAMSIZ - 1]))
+            return socket.inet_ntoa(result[20:24]) # sockaddr_in.sin_addr within ifreq
+        except OSError:
+            return None
+
+    def get_ip(self) -> str | None:
+        """Primary IPv4 address: the source address of the default route, else the Wi-Fi interface's address."""
+        if not self.available:
+            return None
+        try:
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+                sock.connect(ROUTE_PROBE_ADDR)
+                ip_address = sock.getsockname()[0]
+            if ip_address and not ip_address.startswith('0.'):
+                return ip_address
+        except OSError:
+            pass # No route (offline); try the interface directly
+        return self.get_interface_ip(self.get_wifi_interface())
+
+    def get_uptime_seconds(self) -> float | None:
+        try:
+            with open(PROC_UPTIME, 'r') as f:
+                return float(f.readline().split()[0])
+        except (OSError, ValueError, IndexError):
+            return None
+
+
+class NetDevSampler:
+    """
+    Process-wide /proc/net/dev sampler. A single background thread reads the byte counters
+    at a fixed cadence and keeps per-interface ring buffers of (rx, tx) rates in bytes/second,
+    so any number of widgets can show throughput without reading the counters themselves.
+    """
+
+    def __init__(self, collector: LinuxNetCollector, interval: float = SAMPLE_INTERVAL_S, history: int = SAMPLE_HISTORY):
+        self.collector = collector
+        self.interval = interval
+        self.history = history
+        self.lock = threading.Lock()
+        self._rates = {}          # interface -> deque of (rx_bytes_per_s, tx_bytes_per_s)
+        self._totals = {}         # interface -> rx + tx bytes at the last tick (for picking the busiest interface)
+        self._last_counters = None
+        self._last_tick_time = None
+        self._thread = None
+        self._stop_event = threading.Event()
+        self.tick_count = 0
+        self.last_tick_us = 0.0
+
+    def start(self):
+        """Starts the sampling thread if it isn't already running. Safe to call from every widget."""
+        with self.lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="netdev_sampler", daemon=True)
+            self._thread.start()
+        print(f"[NET] /proc/net/dev sampler started ({self.interval}s interval, {self.history} samples)")
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _run(self):
+        next_tick = time.monotonic()
+        while not self._stop_event.is_set():
+            self.tick()
+            # Schedule against a fixed grid so processing time doesn't make the cadence drift
+            next_tick += self.interval
+            delay = next_tick - time.monotonic()
+            if delay < 0:
+                next_tick = time.monotonic()
+                delay = 0
+            self._stop_event.wait(delay)
+
+    def tick(self):
+        """Takes one sample: reads the counters and appends the rate since the previous sample."""
+        start = time.perf_counter()
+        now = time.monotonic()
+        counters = self.collector.read_net_dev()
+        with self.lock:
+            if self._last_counters is not None:
+                elapsed = now - self._last_tick_time
+                if elapsed > 0:
+                    for interface, (rx_bytes, tx_bytes) in counters.items():
+                        previous = self._last_counters.get(interface)
+                        if previous is None:
+                            continue
+                        rx_delta = rx_bytes - previous[0]
+                        tx_delta = tx_bytes - previous[1]
+                        if rx_delta < 0 or tx_delta < 0:
+                            continue # Counter reset (interface re-created); skip this sample
+                        ring = self._rates.get(interface)
+                        if ring is None:
+                            ring = self._rates[interface] = deque(maxlen=self.history)
+                        ring.append((rx_delta / elapsed, tx_delta / elapsed))
+                # Forget interfaces that have disappeared
+                for interface in list(self._rates):
+                    if interface not in counters:
+                        del self._rates[interface]
+            self._last_counters = counters
+            self._last_tick_time = now
+            self._totals = {interface: rx + tx for interface, (rx, tx) in counters.items()}
+            self.tick_count += 1
+            self.last_tick_us = (time.perf_counter() - start) * 1e6
+
+    def default_interface(self) -> str | None:
+        """The Wi-Fi interface if it is being sampled, otherwise the non-loopback interface with the most traffic."""
+        wifi_interface = self.collector.get_wifi_interface()
+        with self.lock:
+            if wifi_interface in self._totals:
+                return wifi_interface
+            candidates = [(total, name) for name, total in self._totals.items() if name != 'lo']
+        return max(candidates)[1] if candidates else None
+
+    def get_history(self, interface: str, count: int = None) -> list:
+        """The most recent `count` (rx, tx) rate samples for an interface, oldest first."""
+        with self.lock:
+            ring = self._rates.get(interface)
+            if not ring:
+                return []
+            samples = list(ring)
+        return samples[-count:] if count else samples
+
+    def get_latest(self, interface: str) -> tuple | None:
+        with self.lock:
+            ring = self._rates.get(interface)
+            return ring[-1] if ring else None
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return {
+                'running': bool(self._thread and self._thread.is_alive()),
+                'interval_s': self.interval,
+                'ticks': self.tick_count,
+                'last_tick_us': round(self.last_tick_us, 1),
+                'interfaces': sorted(self._rates)
+            }
+
+
+# Global instances
+net_collector = LinuxNetCollector()
+net_sampler = NetDevSampler(net_collector)
+
+
+def _bench(label, func, iterations):
+    """Times func() over a number of iterations and prints the mean cost per call."""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        try:
+            func()
+        except (OSError, subprocess.SubprocessError):
+            pass # Missing commands still pay for the fork/exec attempt, which is what we measure
+    elapsed = time.perf_counter() - start
+    per_call_us = elapsed / iterations * 1e6
+    print(f"  {label:<38} {per_call_us:>12.1f} us/call")
+    return per_call_us
+
+
+if __name__ == '__main__':
+    # Benchmark: direct kernel reads vs. the subprocess commands NetworkStatsWidget used to run.
+    def run(args, shell=False):
+        return subprocess.run(args, shell=shell, capture_output=True, text=True, timeout=3)
+
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    wifi_if = net_collector.get_wifi_interface() or 'wlan0'
+    print(f"Network stats collection benchmark ({iterations} iterations, Wi-Fi interface: {wifi_if})")
+
+    comparisons = [
+        ('wifi interface',
+         lambda: net_collector.get_wifi_interface(),
+         lambda: (run(['iwgetid']), run(['ip', '-o', 'link', 'show']))),
+        ('ssid',
+         lambda: net_collector.get_ssid(wifi_if),
+         lambda: (run(['iwgetid', '-r']), run("nmcli -t -f active,ssid dev wifi | grep '^yes:' | cut -d: -f2", shell=True))),
+        ('ip',
+         lambda: net_collector.get_ip(),
+         lambda: run(['hostname', '-I'])),
+        ('rssi',
+         lambda: net_collector.get_rssi(wifi_if),
+         lambda: (run(['iwgetid', wifi_if, '--signal']), run(['iwconfig', wifi_if]))),
+        ('uptime',
+         lambda: net_collector.get_uptime_seconds(),
+         lambda: run(['uptime', '-p'])),
+    ]
+    comparisons.append(
+        ('throughput sample (/proc/net/dev)',
+         lambda: net_sampler.tick(),
+         lambda: run(['cat', PROC_NET_DEV])))
+    for name, direct, forked in comparisons:
+        print(f"{name}: direct={direct()!r}")
+        direct_us = _bench('direct (/proc, /sys, ioctl)', direct, iterations)
+        forked_us = _bench('subprocess', forked, max(1, iterations // 5))
+        print(f"  speedup: {forked_us / direct_us:.0f}x" if direct_us > 0 else "  speedup: n/a")
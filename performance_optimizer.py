@@ -1,18 +1,18 @@
-import time
 import threading
 import json
 import os
-from collections import deque
+
+from span_tracer import tracer
+from span_histograms import span_histograms
 
 class PerformanceOptimizer:
     def __init__(self, log_file="performance_log.json", log_size=1000, performance_threshold_ms=50):
         self.log_file = log_file
         self.log_size = log_size  # Maximum number of entries to keep in memory
         self.performance_threshold_ms = performance_threshold_ms  # Warning threshold in ms
-        self.performance_log = deque(maxlen=log_size)
         self.lock = threading.Lock()
-        self.timing_data = {}
         self.enabled = True
+        tracer.slow_ms = performance_threshold_ms # Sections are timed by the span tracer
         
         # Load existing log if available
         self._load_log()
@@ -27,61 +27,42 @@ class PerformanceOptimizer:
             "log_settings_updates": False,  # Disable settings update logs
         }
         
+        tracer.log_slow = not self.settings["minimize_logging"]
         print(f"[PERF] Performance optimizer initialized with threshold: {performance_threshold_ms}ms")
     
     def _load_log(self):
-        """Load existing performance log if available"""
+        """Load existing performance log if available; its samples show up once their sections are registered again"""
         if os.path.exists(self.log_file):
             try:
                 with open(self.log_file, 'r') as f:
                     data = json.load(f)
                     if isinstance(data, list):
-                        self.performance_log = deque(data[-self.log_size:], maxlen=self.log_size)
-                        print(f"[PERF] Loaded {len(self.performance_log)} performance log entries")
+                        entries = data[-self.log_size:]
+                        for entry in entries:
+                            tracer.preload(entry["section"], entry["timestamp"], entry["duration_ms"])
+                        print(f"[PERF] Loaded {len(entries)} performance log entries")
             except Exception as e:
                 print(f"[PERF] Error loading performance log: {e}")
     
     def save_log(self):
-        """Save performance log to file"""
+        """Save the latest log_size samples of every section to file"""
+        entries = []
+        for span_id, section in enumerate(tracer.span_names()):
+            for timestamp, duration_ms in tracer.samples(span_id):
+                entries.append({
+                    "timestamp": timestamp,
+                    "section": section,
+                    "duration_ms": duration_ms,
+                    "exceeded_threshold": duration_ms > self.performance_threshold_ms
+                })
+        entries.sort(key=lambda entry: entry["timestamp"])
         with self.lock:
             try:
                 with open(self.log_file, 'w') as f:
-                    json.dump(list(self.performance_log), f)
+                    json.dump(entries[-self.log_size:], f)
             except Exception as e:
                 print(f"[PERF] Error saving performance log: {e}")
     
-    def start_timer(self, section_name):
-        """Start timing a section of code"""
-        if not self.enabled:
-            return
-            
-        self.timing_data[section_name] = time.monotonic()
-    
-    def end_timer(self, section_name, log=True):
-        """End timing a section of code and optionally log results"""
-        if not self.enabled or section_name not in self.timing_data:
-            return 0
-        
-        duration_ms = (time.monotonic() - self.timing_data[section_name]) * 1000
-        
-        if log:
-            exceeded = duration_ms > self.performance_threshold_ms
-            
-            # Only log if it exceeded threshold and minimize_logging is False
-            if exceeded and not self.settings["minimize_logging"]:
-                print(f"[PERF] {section_name}: {duration_ms:.2f}ms (SLOW)")
-            
-            with self.lock:
-                self.performance_log.append({
-                    "timestamp": time.time(),
-                    "section": section_name,
-                    "duration_ms": duration_ms,
-                    "exceeded_threshold": exceeded
-                })
-        
-        del self.timing_data[section_name]
-        return duration_ms
-    
     def should_skip_frame(self):
         """Determine if we should skip rendering this frame to catch up"""
         if not self.enabled:
@@ -103,46 +84,43 @@ class PerformanceOptimizer:
             
         return self.settings["disable_animations"]
     
-    def get_performance_summary(self):
-        """Get a summary of performance data"""
-        with self.lock:
-            if not self.performance_log:
-                return {"message": "No performance data collected yet"}
-                
-            total_entries = len(self.performance_log)
-            exceeded_count = sum(1 for entry in self.performance_log if entry.get("exceeded_threshold", False))
-            
-            by_section = {}
-            for entry in self.performance_log:
-                section = entry.get("section", "unknown")
-                if section not in by_section:
-                    by_section[section] = {
-                        "count": 0,
-                        "total_ms": 0,
-                        "max_ms": 0,
-                        "exceeded_count": 0
-                    }
-                
-                by_section[section]["count"] += 1
-                by_section[section]["total_ms"] += entry.get("duration_ms", 0)
-                by_section[section]["max_ms"] = max(by_section[section]["max_ms"], entry.get("duration_ms", 0))
-                if entry.get("exceeded_threshold", False):
-                    by_section[section]["exceeded_count"] += 1
-            
-            # Calculate averages
-            for section, data in by_section.items():
-                data["avg_ms"] = data["total_ms"] / data["count"] if data["count"] > 0 else 0
-                data["exceed_percent"] = (data["exceeded_count"] / data["count"] * 100) if data["count"] > 0 else 0
-            
-            # Sort sections by average time (descending)
-            sorted_sections = sorted(by_section.items(), key=lambda x: x[1]["avg_ms"], reverse=True)
-            
-            return {
-                "total_entries": total_entries,
-                "exceeded_threshold_count": exceeded_count,
-                "exceeded_percent": (exceeded_count / total_entries * 100) if total_entries > 0 else 0,
-                "sections": dict(sorted_sections)
+    def get_performance_summary(self, window="1m"):
+        """Get a summary of each section over `window`, with its percentiles over every window"""
+        by_section = {}
+        for section, windows in span_histograms.summary().items():
+            if not any(stats["count"] for stats in windows.values()):
+                continue
+            stats = windows[window]
+            by_section[section] = {
+                "count": stats["count"],
+                "total_ms": stats["avg_ms"] * stats["count"],
+                "max_ms": stats["max_ms"],
+                "exceeded_count": stats["exceeded_count"],
+                "avg_ms": stats["avg_ms"],
+                "exceed_percent": stats["exceeded_count"] / stats["count"] * 100 if stats["count"] else 0,
+                "p50_ms": stats["p50"],
+                "p90_ms": stats["p90"],
+                "p99_ms": stats["p99"],
+                "parent": tracer.parent_name(tracer.ids[section]),
+                "windows": windows
             }
+        if not by_section:
+            return {"message": "No performance data collected yet"}
+        
+        total_entries = sum(data["count"] for data in by_section.values())
+        exceeded_count = sum(data["exceeded_count"] for data in by_section.values())
+        
+        # Sort sections by average time (descending)
+        sorted_sections = sorted(by_section.items(), key=lambda x: x[1]["avg_ms"], reverse=True)
+        
+        return {
+            "window": window,
+            "total_entries": total_entries,
+            "exceeded_threshold_count": exceeded_count,
+            "exceeded_percent": (exceeded_count / total_entries * 100) if total_entries > 0 else 0,
+            "sections": dict(sorted_sections),
+            "histograms": span_histograms.get_stats()
+        }
 
     def update_settings(self, new_settings):
         """Update optimization settings"""
@@ -152,6 +130,7 @@ class PerformanceOptimizer:
         for key, value in new_settings.items():
             if key in self.settings:
                 self.settings[key] = value
+        tracer.log_slow = not self.settings["minimize_logging"]
                 
         # Only print settings update if log_settings_updates is enabled
         if self.settings.get("log_settings_updates", False):
@@ -4,6 +4,7 @@ import subprocess
 import psutil
 import time
 import json
+from system_sampler import system_sampler
 
 # Class to detect and manage Raspberry Pi specific optimizations
 class RaspberryPiOptimizer:
@@ -220,40 +221,16 @@ echo "[PI_OPT] Reboot recommended: sudo reboot"
             return False
     
     def get_system_stats(self):
-        """Get current system statistics"""
+        """Get current system statistics from the shared background sampler (never blocks)"""
+        system_sampler.start()
+        latest = system_sampler.get_latest()
         stats = {
-            "cpu_percent": psutil.cpu_percent(interval=0.02),
-            "memory_percent": psutil.virtual_memory().percent,
-            "temperature": self._get_cpu_temperature() if self.is_raspberry_pi else "N/A",
-            "cpu_frequency": self._get_cpu_frequency() if self.is_raspberry_pi else "N/A"
+            "cpu_percent": round(latest['cpu'], 1) if latest['cpu'] is not None else None, # None until the first sample
+            "memory_percent": latest['memory'] if latest['memory'] is not None else psutil.virtual_memory().percent,
+            "temperature": f"{latest['temperature']:.1f}°C" if latest['temperature'] is not None else "N/A",
+            "cpu_frequency": f"{latest['frequency']:.0f} MHz" if latest['frequency'] is not None else "N/A"
         }
         return stats
-    
-    def _get_cpu_temperature(self):
-        """Get CPU temperature on Raspberry Pi"""
-        try:
-            temp_file = '/sys/class/thermal/thermal_zone0/temp'
-            if os.path.exists(temp_file):
-                with open(temp_file, 'r') as f:
-                    temp = float(f.read().strip()) / 1000.0
-                    return f"{temp:.1f}°C"
-            return "N/A"
-        except Exception as e:
-            print(f"[PI_OPT] Error getting CPU temperature: {e}")
-            return "Error"
-    
-    def _get_cpu_frequency(self):
-        """Get current CPU frequency on Raspberry Pi"""
-        try:
-            freq_file = '/sys/devices/system/cpu/cpu0/cpufreq/scaling_cur_freq'
-            if os.path.exists(freq_file):
-                with open(freq_file, 'r') as f:
-                    freq = float(f.read().strip()) / 1000.0
-                    return f"{freq:.0f} MHz"
-            return "N/A"
-        except Exception as e:
-            print(f"[PI_OPT] Error getting CPU frequency: {e}")
-            return "Error"
 
 # Flask performance optimizations
 def optimize_flask_app():
@@ -0,0 +1,292 @@
+import math
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+
+# Drawing primitives that work on a framebuffer: a list of rows, each a list of (R, G, B)
+# tuples. That is both Display.pixel_buffer and the 'data' of a widget pixel_map.
+# Filled shapes are written as row spans with slice assignment rather than pixel by pixel,
+# and line loops write straight into the rows without calling a helper per pixel.
+# Everything is clipped to the framebuffer.
+
+
+def _size(buf):
+    height = len(buf)
+    return (len(buf[0]) if height else 0), height
+
+
+def _fill_span(row, x0, x1, color, width):
+    """Fills row[x0..x1] inclusive, clipped to the row."""
+    if x0 > x1:
+        x0, x1 = x1, x0
+    x0 = max(0, x0)
+    x1 = min(width - 1, x1)
+    if x0 <= x1:
+        row[x0:x1 + 1] = [color] * (x1 - x0 + 1)
+
+
+def line_pixels(x0, y0, x1, y1, width, height) -> list:
+    """Returns the in-bounds (x, y) pixels of a line from (x0,y0) to (x1,y1) using Bresenham's algorithm."""
+    # Ensure coordinates are integers
+    x0, y0, x1, y1 = int(round(x0)), int(round(y0)), int(round(x1)), int(round(y1))
+
+    dx = abs(x1 - x0)
+    dy = -abs(y1 - y0)
+    sx = 1 if x0 < x1 else -1
+    sy = 1 if y0 < y1 else -1
+    err = dx + dy  # error value e_xy
+
+    pixels = []
+    while True:
+        if 0 <= y0 < height and 0 <= x0 < width:
+            pixels.append((x0, y0))
+        if x0 == x1 and y0 == y1:
+            break
+        e2 = 2 * err
+        if e2 >= dy:  # e_xy+e_x > 0
+            err += dy
+            x0 += sx
+        if e2 <= dx:  # e_xy+e_y < 0
+            err += dx
+            y0 += sy
+    return pixels
+
+
+def draw_line(buf, x0, y0, x1, y1, color, antialias=False):
+    """
+    Draws a line. With antialias=True uses Xiaolin Wu's algorithm, blending the line colour
+    into the existing pixels by coverage; otherwise a 1px Bresenham line.
+    """
+    width, height = _size(buf)
+    if not antialias:
+        for x, y in line_pixels(x0, y0, x1, y1, width, height):
+            buf[y][x] = color
+        return
+
+    steep = abs(y1 - y0) > abs(x1 - x0)
+    if steep:
+        x0, y0, x1, y1 = y0, x0, y1, x1
+    if x0 > x1:
+        x0, x1, y0, y1 = x1, x0, y1, y0
+    dx = x1 - x0
+    gradient = (y1 - y0) / dx if dx else 1.0
+    cr, cg, cb = color
+
+    # Endpoints are included at full x-range; the main loop walks every integer x between them
+    start_x = int(math.floor(x0 + 0.5))
+    end_x = int(math.floor(x1 + 0.5))
+    intery = y0 + gradient * (start_x - x0)
+    for x in range(start_x, end_x + 1):
+        y_floor = int(math.floor(intery))
+        frac = intery - y_floor
+        for y, coverage in ((y_floor, 1.0 - frac), (y_floor + 1, frac)):
+            px, py = (y, x) if steep else (x, y)
+            if coverage > 0 and 0 <= px < width and 0 <= py < height:
+                row = buf[py]
+                dr, dg, db = row[px]
+                row[px] = (int(dr + (cr - dr) * coverage + 0.5),
+                           int(dg + (cg - dg) * coverage + 0.5),
+                           int(db + (cb - db) * coverage + 0.5))
+        intery += gradient
+
+
+def fill_rect(buf, x, y, w, h, color):
+    """Fills a w x h rectangle with its top-left corner at (x, y)."""
+    width, height = _size(buf)
+    x, y, w, h = int(round(x)), int(round(y)), int(round(w)), int(round(h))
+    x0 = max(0, x)
+    x1 = min(width, x + w)
+    if x0 >= x1:
+        return
+    span = [color] * (x1 - x0)
+    for row_y in range(max(0, y), min(height, y + h)):
+        buf[row_y][x0:x1] = span
+
+
+def draw_rect(buf, x, y, w, h, color):
+    """Draws a 1px rectangle outline."""
+    x, y, w, h = int(round(x)), int(round(y)), int(round(w)), int(round(h))
+    if w <= 0 or h <= 0:
+        return
+    fill_rect(buf, x, y, w, 1, color)
+    fill_rect(buf, x, y + h - 1, w, 1, color)
+    fill_rect(buf, x, y, 1, h, color)
+    fill_rect(buf, x + w - 1, y, 1, h, color)
+
+
+def _circle_octant(r):
+    """(x, y) offsets of one octant of a midpoint circle of radius r, x >= y."""
+    points = []
+    x, y, err = r, 0, 1 - r
+    while x >= y:
+        points.append((x, y))
+        y += 1
+        if err < 0:
+            err += 2 * y + 1
+        else:
+            x -= 1
+            err += 2 * (y - x) + 1
+    return points
+
+
+@lru_cache(maxsize=64)
+def _octant_angles(r):
+    """The octant of radius r and the angle of each point in degrees from the x axis (0..45, ascending)."""
+    octant = _circle_octant(r)
+    return octant, [math.degrees(math.atan2(oy, ox)) for ox, oy in octant]
+
+
+# The eight reflections of an octant point (ox, oy) as (swap x and y, x sign, y sign), then the
+# clock angle range [lo, lo + 45] it covers and whether the angle is lo + a (+1) or lo + 45 - a (-1)
+# for the point's octant angle a
+_OCTANTS = (
+    (True, 1, -1, 0, 1), (False, 1, -1, 45, -1), (False, 1, 1, 90, 1), (True, 1, 1, 135, -1),
+    (True, -1, 1, 180, 1), (False, -1, 1, 225, -1), (False, -1, -1, 270, 1), (True, -1, -1, 315, -1),
+)
+
+
+def draw_circle(buf, cx, cy, r, color, fill=False):
+    """Draws a circle of radius r centred on (cx, cy), as an outline or filled with row spans."""
+    width, height = _size(buf)
+    cx, cy, r = int(round(cx)), int(round(cy)), int(round(r))
+    if r < 0:
+        return
+    octant = _circle_octant(r)
+    if fill:
+        # Widest half-span per row offset, then one slice assignment per row
+        half_widths = {}
+        for ox, oy in octant:
+            for dy, dx in ((oy, ox), (ox, oy)):
+                if half_widths.get(dy, -1) < dx:
+                    half_widths[dy] = dx
+        for dy, dx in half_widths.items():
+            for row_y in {cy - dy, cy + dy}:
+                if 0 <= row_y < height:
+                    _fill_span(buf[row_y], cx - dx, cx + dx, color, width)
+        return
+    for ox, oy in octant:
+        for px, py in ((ox, oy), (oy, ox), (-oy, ox), (-ox, oy), (-ox, -oy), (-oy, -ox), (oy, -ox), (ox, -oy)):
+            x, y = cx + px, cy + py
+            if 0 <= x < width and 0 <= y < height:
+                buf[y][x] = color
+
+
+def draw_arc(buf, cx, cy, r, start_deg, end_deg, color):
+    """
+    Draws the part of a circle outline between two angles. Angles are in degrees clockwise
+    from 12 o'clock, like a clock face; the arc runs clockwise from start_deg to end_deg.
+    """
+    width, height = _size(buf)
+    cx, cy, r = int(round(cx)), int(round(cy)), int(round(r))
+    if r < 0:
+        return
+    start = start_deg % 360.0
+    sweep = (end_deg - start_deg) % 360.0 or (360.0 if end_deg != start_deg else 0.0)
+    # The arc as clock-angle intervals within 0..360, split where it passes 12 o'clock
+    end = start + sweep
+    intervals = [(start, end)] if end <= 360.0 else [(start, 360.0), (0.0, end - 360.0)]
+    if r == 0:
+        if 0 <= cx < width and 0 <= cy < height:
+            buf[cy][cx] = color
+        return
+    octant, angles = _octant_angles(r)
+    eps = 1e-9
+    # Each octant's points are in angle order, so the arc covers a contiguous run of them
+    for swap, sx, sy, lo, direction in _OCTANTS:
+        for a0, a1 in intervals:
+            a0, a1 = max(a0, lo), min(a1, lo + 45)
+            if a0 > a1:
+                continue
+            first, last = (a0 - lo, a1 - lo) if direction > 0 else (lo + 45 - a1, lo + 45 - a0)
+            for ox, oy in octant[bisect_left(angles, first - eps):bisect_right(angles, last + eps)]:
+                if swap:
+                    ox, oy = oy, ox
+                x, y = cx + sx * ox, cy + sy * oy
+                if 0 <= x < width and 0 <= y < height:
+                    buf[y][x] = color
+
+
+def draw_polygon(buf, points, color, antialias=False):
+    """Draws the outline of a closed polygon given as [(x, y), ...]."""
+    count = len(points)
+    for i in range(count):
+        x0, y0 = points[i]
+        x1, y1 = points[(i + 1) % count]
+        draw_line(buf, x0, y0, x1, y1, color, antialias)
+
+
+def fill_polygon(buf, points, color):
+    """Fills a polygon (even-odd rule) by scanline, writing each covered span as one slice."""
+    width, height = _size(buf)
+    count = len(points)
+    if count < 3:
+        return
+    min_y = max(0, int(math.floor(min(p[1] for p in points))))
+    max_y = min(height - 1, int(math.ceil(max(p[1] for p in points))))
+    edges = [(points[i], points[(i + 1) % count]) for i in range(count)]
+    for row_y in range(min_y, max_y + 1):
+        scan_y = row_y + 0.5 # Sample at pixel centres
+        crossings = []
+        for (x0, y0), (x1, y1) in edges:
+            if (y0 <= scan_y < y1) or (y1 <= scan_y < y0):
+                crossings.append(x0 + (scan_y - y0) * (x1 - x0) / (y1 - y0))
+        crossings.sort()
+        row = buf[row_y]
+        for i in range(0, len(crossings) - 1, 2):
+            # Pixels whose centres lie inside the span
+            _fill_span(row, int(math.ceil(crossings[i] - 0.5)), int(math.ceil(crossings[i + 1] - 0.5)) - 1, color, width)
+
+
+def fill_gradient(buf, x, y, w, h, color_start, color_end, vertical=False):
+    """
+    Fills a rectangle with a linear gradient from color_start to color_end, left to right
+    (or top to bottom if vertical). A horizontal gradient computes one row and copies it to
+    every row; a vertical one fills each row with a single span.
+    """
+    width, height = _size(buf)
+    x, y, w, h = int(round(x)), int(round(y)), int(round(w)), int(round(h))
+    steps = (h if vertical else w) - 1
+    def lerp(t):
+        return tuple(int(s + (e - s) * t + 0.5) for s, e in zip(color_start, color_end))
+
+    x0 = max(0, x)
+    x1 = min(width, x + w)
+    if x0 >= x1:
+        return
+    if vertical:
+        for row_y in range(max(0, y), min(height, y + h)):
+            buf[row_y][x0:x1] = [lerp((row_y - y) / steps if steps > 0 else 0.0)] * (x1 - x0)
+    else:
+        span = [lerp((col - x) / steps if steps > 0 else 0.0) for col in range(x0, x1)]
+        for row_y in range(max(0, y), min(height, y + h)):
+            buf[row_y][x0:x1] = span
+
+
+if __name__ == '__main__':
+    # Micro-benchmark: mean time per call of each primitive on a 64x64 framebuffer.
+    import sys
+    import timeit
+
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    size = 64
+    black, white, red, blue = (0, 0, 0), (255, 255, 255), (255, 0, 0), (0, 0, 255)
+    framebuffer = [[black] * size for _ in range(size)]
+    hexagon = [(32 + 28 * math.cos(math.radians(a)), 32 + 28 * math.sin(math.radians(a))) for a in range(0, 360, 60)]
+
+    cases = [
+        ('line 64px', lambda: draw_line(framebuffer, 0, 5, 63, 58, white)),
+        ('line 64px antialiased', lambda: draw_line(framebuffer, 0, 5, 63, 58, white, antialias=True)),
+        ('circle r=28', lambda: draw_circle(framebuffer, 32, 32, 28, red)),
+        ('circle r=28 filled', lambda: draw_circle(framebuffer, 32, 32, 28, red, fill=True)),
+        ('arc r=28 90deg', lambda: draw_arc(framebuffer, 32, 32, 28, 0, 90, red)),
+        ('rect 60x60 outline', lambda: draw_rect(framebuffer, 2, 2, 60, 60, blue)),
+        ('rect 60x60 filled', lambda: fill_rect(framebuffer, 2, 2, 60, 60, blue)),
+        ('hexagon outline', lambda: draw_polygon(framebuffer, hexagon, white)),
+        ('hexagon filled', lambda: fill_polygon(framebuffer, hexagon, white)),
+        ('gradient 64x64 horizontal', lambda: fill_gradient(framebuffer, 0, 0, 64, 64, red, blue)),
+        ('gradient 64x64 vertical', lambda: fill_gradient(framebuffer, 0, 0, 64, 64, red, blue, vertical=True)),
+        ('set_pixel loop 60x60 (reference)', lambda: [framebuffer[r].__setitem__(c, blue) for r in range(2, 62) for c in range(2, 62)]),
+    ]
+    print(f"Primitive micro-benchmark ({size}x{size} framebuffer, {iterations} iterations)")
+    for label, func in cases:
+        per_call_us = timeit.timeit(func, number=iterations) / iterations * 1e6
+        print(f"  {label:<34} {per_call_us:>10.1f} us/call")
@@ -0,0 +1,11 @@
+from .base_provider import BaseProvider
+from .registry import ProviderRegistry, Subscription
+from .weather_provider import WeatherProvider
+from .news_provider import NewsProvider
+
+__all__ = ['BaseProvider', 'ProviderRegistry', 'Subscription', 'WeatherProvider', 'NewsProvider', 'provider_registry']
+
+# Global instance
+provider_registry = ProviderRegistry()
+provider_registry.register_type(WeatherProvider)
+provider_registry.register_type(NewsProvider)
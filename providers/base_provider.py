@@ -0,0 +1,200 @@
+import time
+import threading
+import weakref
+from abc import ABC, abstractmethod
+
+
+class BaseProvider(ABC):
+    """
+    Abstract base class for all data providers.
+
+    A provider owns one data source (e.g. the weather for one location). It fetches and caches
+    the latest snapshot, tracks how fresh it is, and pushes each new snapshot to its subscribers.
+    Providers are created and scheduled by the ProviderRegistry. Every widget asking for the
+    same source shares a single instance, so the source is fetched once however many widgets
+    show it.
+    """
+    provider_type = 'base'
+    ERROR_RETRY_S = 60 # Wait before retrying after a failed fetch
+
+    def __init__(self, key: tuple, params: dict):
+        self.key = key
+        self.params = dict(params)
+        self.lock = threading.RLock()
+
+        self.snapshot = None          # Data from the most recent successful fetch
+        self.version = 0              # Bumped on every successful fetch
+        self.last_update_time = 0     # time.monotonic() of the last successful fetch
+        self.last_update_wall = None  # time.time() of the last successful fetch (for display/API)
+        self.last_attempt_time = 0
+        self.last_error = None
+        self.is_fetching = False
+        self.fetch_count = 0
+        self.error_count = 0
+        self.idle_since = time.monotonic()
+
+        # token -> (weak reference to the callback or None, refresh interval in seconds or None).
+        # Callbacks are held weakly so a widget that is dropped without unsubscribing doesn't
+        # keep itself (or this provider) alive.
+        self._subscribers = {}
+        self._next_token = 0
+        self._refresh_requested = True
+
+    @classmethod
+    def make_key(cls, params: dict) -> tuple:
+        """Identifies the data source; subscriptions with equal keys share one provider."""
+        return tuple(sorted(params.items()))
+
+    @abstractmethod
+    def fetch(self):
+        """
+        Fetches fresh data from the source. Runs on the registry's fetch pool, never on the
+        render thread. Returns the new snapshot data or raises on failure.
+        """
+        pass
+
+    # --- Subscriptions ---
+
+    def subscribe(self, callback=None, refresh_interval=None) -> int:
+        """
+        Adds a subscriber. callback(snapshot) is called after every successful fetch.
+        refresh_interval (seconds) is how stale this subscriber tolerates the data; the provider
+        refreshes at the shortest interval any subscriber asks for. None means fetch once.
+        """
+        if callback is None:
+            callback_ref = None
+        elif hasattr(callback, '__self__'):
+            callback_ref = weakref.WeakMethod(callback)
+        else:
+            callback_ref = weakref.ref(callback)
+        with self.lock:
+            token = self._next_token
+            self._next_token += 1
+            self._subscribers[token] = (callback_ref, refresh_interval)
+        return token
+
+    def unsubscribe(self, token: int):
+        with self.lock:
+            self._subscribers.pop(token, None)
+            if not self._subscribers:
+                self.idle_since = time.monotonic()
+
+    def subscriber_count(self) -> int:
+        """Live subscribers; entries whose callback owner has been garbage collected are dropped."""
+        with self.lock:
+            dead = [token for token, (callback_ref, _) in self._subscribers.items()
+                    if callback_ref is not None and callback_ref() is None]
+            for token in dead:
+                del self._subscribers[token]
+            if dead and not self._subscribers:
+                self.idle_since = time.monotonic()
+            return len(self._subscribers)
+
+    def refresh_interval(self):
+        with self.lock:
+            intervals = [interval for _, interval in self._subscribers.values() if interval]
+        return min(intervals) if intervals else None
+
+    def invalidate(self):
+        """Requests a fetch on the next scheduler tick regardless of freshness."""
+        with self.lock:
+            self._refresh_requested = True
+
+    # --- Freshness and fetching ---
+
+    def is_fresh(self, now: float = None) -> bool:
+        now = now if now is not None else time.monotonic()
+        with self.lock:
+            if self.snapshot is None:
+                return False
+            interval = self.refresh_interval()
+            return interval is None or (now - self.last_update_time) < interval
+
+    def needs_refresh(self, now: float) -> bool:
+        with self.lock:
+            if self.is_fetching:
+                return False
+            if self._refresh_requested:
+                return True
+            if self.last_error and (now - self.last_attempt_time) < self.ERROR_RETRY_S:
+                return False
+            return not self.is_fresh(now)
+
+    def run_fetch(self):
+        """Performs one fetch and publishes the result. Called on a fetch pool thread."""
+        with self.lock:
+            self.is_fetching = True
+            self._refresh_requested = False
+            self.last_attempt_time = time.monotonic()
+        data = None
+        error = None
+        try:
+            data = self.fetch()
+        except Exception as e:
+            error = str(e) or e.__class__.__name__
+
+        with self.lock:
+            self.is_fetching = False
+            if error:
+                self.last_error = error
+                self.error_count += 1
+                self._log("ERROR", f"Fetch failed: {error}")
+                return
+            self.snapshot = data
+            self.version += 1
+            self.last_update_time = time.monotonic()
+            self.last_update_wall = time.time()
+            self.last_error = None
+            self.fetch_count += 1
+            snapshot = self._snapshot_locked()
+            callbacks = [callback_ref() for callback_ref, _ in self._subscribers.values() if callback_ref is not None]
+
+        # Push outside the lock so a slow subscriber can't block readers
+        for callback in callbacks:
+            if callback is None:
+                continue
+            try:
+                callback(snapshot)
+            except Exception as e:
+                self._log("ERROR", f"Subscriber callback failed: {e}")
+
+    # --- Reading ---
+
+    def _snapshot_locked(self):
+        if self.snapshot is None:
+            return None
+        return {
+            'data': self.snapshot,
+            'version': self.version,
+            'updated_at': self.last_update_wall,
+            'age_s': time.monotonic() - self.last_update_time
+        }
+
+    def get_snapshot(self):
+        """The latest snapshot as {'data', 'version', 'updated_at', 'age_s'}, or None if nothing has been fetched yet."""
+        with self.lock:
+            return self._snapshot_locked()
+
+    def get_stats(self) -> dict:
+        now = time.monotonic()
+        with self.lock:
+            return {
+                'type': self.provider_type,
+                'key': [str(part) for part in self.key],
+                'subscribers': len(self._subscribers),
+                'version': self.version,
+                'fresh': self.is_fresh(now),
+                'age_s': round(now - self.last_update_time, 1) if self.snapshot is not None else None,
+                'refresh_interval_s': self.refresh_interval(),
+                'is_fetching': self.is_fetching,
+                'fetch_count': self.fetch_count,
+                'error_count': self.error_count,
+                'last_error': self.last_error,
+                'idle_s': round(now - self.idle_since, 1) if not self._subscribers else None
+            }
+
+    def _log(self, level: str, message: str):
+        print(f"[{self.__class__.__name__}-{self.provider_type}] {level.upper()}: {message}")
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(key={self.key}, subscribers={len(self._subscribers)}, version={self.version})"
@@ -0,0 +1,51 @@
+from feed_ingest import NewsAggregator, DEFAULT_TOTAL_TIMEOUT_S, DEFAULT_MAX_BYTES
+from .base_provider import BaseProvider
+
+
+class NewsProvider(BaseProvider):
+    """
+    Merged headlines from a set of RSS feeds (see feed_ingest.NewsAggregator).
+    The snapshot data is {'headlines': [...], 'stats': {url: fetch stats}, 'errors': {url: error}}.
+    """
+    provider_type = 'news'
+
+    def __init__(self, key: tuple, params: dict):
+        super().__init__(key, params)
+        self.feeds = list(params.get('feeds', []))
+        self.num_headlines = params.get('num_headlines', 5)
+        self.total_timeout = DEFAULT_TOTAL_TIMEOUT_S
+        self.max_bytes = DEFAULT_MAX_BYTES
+        self.aggregator = NewsAggregator(self.feeds, self.num_headlines)
+
+    @classmethod
+    def make_key(cls, params: dict) -> tuple:
+        feeds = tuple((f['url'], f['weight'], f['limit']) for f in params.get('feeds', []))
+        return (feeds, params.get('num_headlines', 5))
+
+    def set_limits(self, total_timeout, max_bytes):
+        """Per-fetch deadline and byte budget. Shared by all subscribers; the latest setting wins."""
+        with self.lock:
+            self.total_timeout = total_timeout
+            self.max_bytes = max_bytes
+
+    def fetch(self):
+        with self.lock:
+            total_timeout, max_bytes = self.total_timeout, self.max_bytes
+        # Feeds are fetched concurrently. Each read enforces connect/read timeouts, a total deadline
+        # and a byte budget, and stops parsing once it has that feed's item limit.
+        refresh = self.aggregator.refresh(total_timeout=total_timeout, max_bytes=max_bytes)
+        for url, result in refresh['results'].items():
+            self._log("INFO", f"Feed {url}: {len(result['items'])} headlines, {result['bytes_read']} bytes, "
+                              f"fetch {result['fetch_ms']:.1f}ms, parse {result['parse_ms']:.1f}ms, "
+                              f"truncated: {result['truncation_reason'] or 'no'}")
+        headlines = refresh['headlines']
+        # Partial feeds and failures of some feeds are tolerated; only fail if we got nothing
+        if refresh['errors'] and not headlines:
+            raise RuntimeError("; ".join(f"{url}: {err}" for url, err in refresh['errors'].items()))
+        for url, err in refresh['errors'].items():
+            self._log("WARNING", f"Feed {url} failed, keeping its previous headlines: {err}")
+        return {
+            'headlines': headlines,
+            'stats': {url: {k: v for k, v in result.items() if k != 'items'} for url, result in refresh['results'].items()},
+            'errors': refresh['errors']
+        }
@@ -0,0 +1,113 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+SCHEDULER_TICK_S = 1.0
+FETCH_POOL_WORKERS = 4
+LINGER_S = 600 # Keep a provider without subscribers (and its cache) this long before dropping it
+
+
+class Subscription:
+    """A widget's handle on a provider. Keep it while the data is needed and call unsubscribe() when done."""
+
+    def __init__(self, registry, provider, token):
+        self.registry = registry
+        self.provider = provider
+        self.token = token
+        self.active = True
+
+    def snapshot(self):
+        """The provider's latest snapshot (see BaseProvider.get_snapshot), or None."""
+        return self.provider.get_snapshot()
+
+    def unsubscribe(self):
+        if self.active:
+            self.active = False
+            self.provider.unsubscribe(self.token)
+
+    def __repr__(self):
+        return f"Subscription(provider={self.provider!r}, token={self.token}, active={self.active})"
+
+
+class ProviderRegistry:
+    """
+    Owns every provider instance. Subscriptions to equal parameters share one provider.
+    A single scheduler thread decides which providers are due and hands their fetches to a
+    small pool. Providers outlive screen switches: one whose last subscriber has gone keeps
+    its cache for LINGER_S, so a widget that comes back shows data at once.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.provider_types = {}   # provider_type -> provider class
+        self.providers = {}        # (provider_type, key) -> provider instance
+        self._pool = ThreadPoolExecutor(max_workers=FETCH_POOL_WORKERS, thread_name_prefix="provider_fetch")
+        self._thread = None
+        self._wake_event = threading.Event()
+
+    def register_type(self, provider_class):
+        with self.lock:
+            self.provider_types[provider_class.provider_type] = provider_class
+
+    def subscribe(self, provider_type: str, params: dict, callback=None, refresh_interval=None) -> Subscription:
+        """
+        Subscribes to the provider for (provider_type, params), creating it if needed, and
+        starts the scheduler. callback(snapshot) is invoked on a fetch thread after each update.
+        """
+        with self.lock:
+            provider_class = self.provider_types.get(provider_type)
+            if provider_class is None:
+                raise ValueError(f"Unknown provider type '{provider_type}'")
+            key = provider_class.make_key(params)
+            provider = self.providers.get((provider_type, key))
+            if provider is None:
+                provider = provider_class(key, params)
+                self.providers[(provider_type, key)] = provider
+                print(f"[PROVIDERS] Created {provider!r}")
+            self._ensure_started()
+        token = provider.subscribe(callback, refresh_interval)
+        if provider.snapshot is None:
+            self._wake_event.set() # Don't make a new subscriber wait for the next tick
+        return Subscription(self, provider, token)
+
+    def _ensure_started(self):
+        """Starts the scheduler thread. Caller must hold self.lock."""
+        if not self._thread or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="provider_scheduler", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"[PROVIDERS] ERROR: Scheduler tick failed: {e}")
+            self._wake_event.wait(SCHEDULER_TICK_S)
+            self._wake_event.clear()
+
+    def tick(self, now: float = None):
+        """Starts fetches for providers that are due and drops providers that have lingered too long."""
+        now = now if now is not None else time.monotonic()
+        with self.lock:
+            providers = list(self.providers.items())
+        for registry_key, provider in providers:
+            if provider.subscriber_count() == 0:
+                if now - provider.idle_since >= LINGER_S:
+                    with self.lock:
+                        # Re-check under the lock in case someone subscribed meanwhile
+                        if provider.subscriber_count() == 0 and self.providers.get(registry_key) is provider:
+                            del self.providers[registry_key]
+                            print(f"[PROVIDERS] Dropped idle {provider!r}")
+                continue
+            if provider.needs_refresh(now):
+                with provider.lock:
+                    provider.is_fetching = True # Claimed; run_fetch sets it again on the pool thread
+                self._pool.submit(provider.run_fetch)
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            providers = list(self.providers.values())
+        return {
+            'provider_count': len(providers),
+            'providers': [provider.get_stats() for provider in providers]
+        }
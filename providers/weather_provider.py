@@ -0,0 +1,55 @@
+import requests
+from .base_provider import BaseProvider
+
+
+class WeatherProvider(BaseProvider):
+    """
+    Current weather and daily forecast for one location from Open-Meteo.
+    The snapshot data is the decoded API response.
+    """
+    provider_type = 'weather'
+
+    API_BASE_URL = "https://api.open-meteo.com/v1/forecast"
+    REQUEST_TIMEOUT_S = 10
+
+    def __init__(self, key: tuple, params: dict):
+        super().__init__(key, params)
+        self.latitude, self.longitude, self.units = key
+        self.forecast_days = 1
+
+    @classmethod
+    def make_key(cls, params: dict) -> tuple:
+        # Rounded so widgets configured with the same place share one provider (0.01 deg is ~1km)
+        return (round(float(params.get('latitude', 0)), 2),
+                round(float(params.get('longitude', 0)), 2),
+                params.get('units', 'metric'))
+
+    def require_forecast_days(self, days: int):
+        """Widen the forecast to at least this many days; refetches if the cached one is too short."""
+        with self.lock:
+            if days > self.forecast_days:
+                self.forecast_days = days
+                self._refresh_requested = True
+
+    def fetch(self):
+        with self.lock:
+            forecast_days = self.forecast_days
+        params = {
+            'latitude': self.latitude,
+            'longitude': self.longitude,
+            'current_weather': 'true',
+            'daily': 'sunrise,sunset,temperature_2m_max,temperature_2m_min,weathercode',
+            'temperature_unit': 'celsius' if self.units == 'metric' else 'fahrenheit',
+            'windspeed_unit': 'kmh' if self.units == 'metric' else 'mph',
+            'timezone': 'auto',
+            'forecast_days': forecast_days
+        }
+        self._log("INFO", f"Fetching weather for lat={self.latitude}, lon={self.longitude} ({forecast_days} day(s))")
+        try:
+            response = requests.get(self.API_BASE_URL, params=params, timeout=self.REQUEST_TIMEOUT_S)
+            response.raise_for_status()
+        except requests.exceptions.HTTPError as e:
+            raise RuntimeError(f"HTTP Error: {e} - Resp: {e.response.text if e.response is not None else 'No response'}")
+        except requests.exceptions.RequestException as e:
+            raise RuntimeError(f"RequestException: {e}")
+        return response.json()
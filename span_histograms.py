@@ -0,0 +1,229 @@
+import math
+import time
+import threading
+from array import array
+
+from span_tracer import tracer, DURATION, END, FRAME
+
+WINDOWS = (('10s', 10, 10), ('1m', 60, 6), ('15m', 900, 15)) # (name, seconds, slices)
+PERCENTILES = (50, 90, 99)
+SUB_BUCKETS = 16          # Linear buckets per power of two: a bucket midpoint is within 3.2% of every sample in it
+MAX_EXPONENT = 24         # Samples of 2^24 us (16.8 s) and more share the last bucket; max stays exact
+BUCKETS = (MAX_EXPONENT + 1) * SUB_BUCKETS
+DRAIN_INTERVAL_S = 1.0
+EMPTY_SLICE = None        # slice_ids entry of a slot holding no slice; slice numbers can be negative
+
+
+def bucket_index(ms: float) -> int:
+    """HDR-style log-linear bucket of a duration: its power of two of microseconds, then a linear step within it."""
+    us = ms * 1000.0
+    if us < 1.0:
+        return 0
+    mantissa, exponent = math.frexp(us) # us = mantissa * 2**exponent, 0.5 <= mantissa < 1
+    return min(exponent * SUB_BUCKETS + int((mantissa - 0.5) * 2 * SUB_BUCKETS), BUCKETS - 1)
+
+
+def _bucket_midpoint_ms(index: int) -> float:
+    exponent, step = divmod(index, SUB_BUCKETS)
+    if exponent == 0:
+        return 0.0005
+    width_us = 2.0 ** exponent / (2 * SUB_BUCKETS)
+    return (2.0 ** (exponent - 1) + (step + 0.5) * width_us) / 1000.0
+
+
+BUCKET_MS = [_bucket_midpoint_ms(index) for index in range(BUCKETS)]
+
+
+class SlidingHistogram:
+    """
+    Bucket counts of the samples of the last `window_s` seconds, kept as a ring of `slices` time
+    slices and their running sum. Adding a sample touches one bucket of one slice and of the sum;
+    when a slice expires its counts are subtracted from the sum. The window therefore covers
+    between window_s - window_s / slices and window_s seconds.
+    """
+
+    def __init__(self, window_s: float, slices: int):
+        self.slice_s = window_s / slices
+        self.slices = slices
+        self.counts = [array('I', bytes(4 * BUCKETS)) for _ in range(slices)]
+        self.sum = array('I', bytes(4 * BUCKETS))
+        self.slice_ids = [EMPTY_SLICE] * slices       # Absolute slice number held by each slot
+        self.slice_count = array('I', bytes(4 * slices))
+        self.slice_exceeded = array('I', bytes(4 * slices))
+        self.slice_total_ms = array('d', bytes(8 * slices))
+        self.slice_max_ms = array('d', bytes(8 * slices))
+        self.newest = None                            # Newest slice number seen
+
+    def _expire(self, slot: int):
+        if self.slice_ids[slot] is EMPTY_SLICE:
+            return
+        counts = self.counts[slot]
+        for index, count in enumerate(counts):
+            if count:
+                self.sum[index] -= count
+                counts[index] = 0
+        self.slice_ids[slot] = EMPTY_SLICE
+        self.slice_count[slot] = self.slice_exceeded[slot] = 0
+        self.slice_total_ms[slot] = self.slice_max_ms[slot] = 0.0
+
+    def advance(self, now: float):
+        """Expires the slices that are older than the window at `now` (perf_counter seconds)."""
+        slice_id = int(now // self.slice_s)
+        if self.newest is not None and slice_id <= self.newest:
+            return
+        first = slice_id - self.slices + 1
+        if self.newest is not None:
+            first = max(self.newest + 1, first)
+        for expired in range(first, slice_id + 1):
+            self._expire(expired % self.slices)
+        self.newest = slice_id
+
+    def add(self, index: int, ms: float, end: float, exceeded: bool):
+        slice_id = int(end // self.slice_s)
+        if self.newest is None or slice_id > self.newest:
+            self.advance(end)
+        elif slice_id <= self.newest - self.slices:
+            return # Older than the window
+        slot = slice_id % self.slices
+        self.slice_ids[slot] = slice_id
+        self.counts[slot][index] += 1
+        self.sum[index] += 1
+        self.slice_count[slot] += 1
+        self.slice_total_ms[slot] += ms
+        if ms > self.slice_max_ms[slot]:
+            self.slice_max_ms[slot] = ms
+        if exceeded:
+            self.slice_exceeded[slot] += 1
+
+    def summary(self) -> dict:
+        """Count, average, max, threshold overruns and percentiles of the window. O(slices + buckets)."""
+        count = sum(self.slice_count)
+        max_ms = max(self.slice_max_ms)
+        result = {'count': count, 'avg_ms': sum(self.slice_total_ms) / count if count else 0.0, 'max_ms': max_ms,
+                  'exceeded_count': sum(self.slice_exceeded)}
+        ranks = [(f'p{p}', max(1, math.ceil(count * p / 100))) for p in PERCENTILES]
+        seen = 0
+        position = 0
+        for index, bucket_count in enumerate(self.sum):
+            if not bucket_count:
+                continue
+            seen += bucket_count
+            while position < len(ranks) and seen >= ranks[position][1]:
+                result[ranks[position][0]] = min(BUCKET_MS[index], max_ms)
+                position += 1
+            if position == len(ranks):
+                break
+        for name, _ in ranks[position:]:
+            result[name] = 0.0
+        return result
+
+
+class SpanHistograms:
+    """
+    Streaming percentiles of every span of the tracer over sliding windows (WINDOWS).
+
+    A background thread folds each span ring's new samples into one SlidingHistogram per window
+    every DRAIN_INTERVAL_S, using the time each sample ended, so the render loop does no extra
+    work. The summary costs a fixed amount per span and window, however many samples there are.
+    """
+
+    def __init__(self, span_tracer=tracer, interval: float = DRAIN_INTERVAL_S):
+        self.tracer = span_tracer
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.histograms = []  # span id -> {window name: SlidingHistogram}
+        self.seen = []        # span id -> ring total already folded in
+        self.dropped = 0      # Samples overwritten in a ring before they were drained
+        self.drains = 0
+        self.last_drain_ms = 0.0
+        self._thread = None
+
+    def start(self):
+        with self.lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="span_histograms", daemon=True)
+            self._thread.start()
+        print(f"[PERF] Span histograms started ({', '.join(name for name, _, _ in WINDOWS)} windows)")
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.drain()
+            except Exception as e:
+                print(f"[PERF] Error updating span histograms: {e}")
+
+    def drain(self):
+        """Adds the samples recorded since the previous drain. Samples loaded from a saved log are skipped."""
+        start = time.perf_counter()
+        slow_ms = self.tracer.slow_ms
+        with self.lock:
+            for span_id, ring in enumerate(list(self.tracer.rings)):
+                if span_id == len(self.histograms):
+                    self.histograms.append({name: SlidingHistogram(seconds, slices) for name, seconds, slices in WINDOWS})
+                    self.seen.append(0)
+                total = ring.total
+                first = max(self.seen[span_id], total - ring.capacity)
+                self.dropped += first - self.seen[span_id]
+                windows = self.histograms[span_id].values()
+                for sample in range(first, total):
+                    slot = sample % ring.capacity
+                    if not ring.field(slot, FRAME):
+                        continue # Preloaded from a previous run: its end time isn't on this run's clock
+                    ms = ring.field(slot, DURATION)
+                    end = ring.field(slot, END)
+                    index = bucket_index(ms)
+                    exceeded = ms > slow_ms
+                    for histogram in windows:
+                        histogram.add(index, ms, end, exceeded)
+                self.seen[span_id] = total
+            self.drains += 1
+            self.last_drain_ms = (time.perf_counter() - start) * 1000
+
+    def summary(self) -> dict:
+        """{span name: {window name: {'count', 'avg_ms', 'max_ms', 'exceeded_count', 'p50', 'p90', 'p99'}}}"""
+        now = time.perf_counter()
+        names = self.tracer.span_names()
+        result = {}
+        with self.lock:
+            for span_id, windows in enumerate(self.histograms):
+                for histogram in windows.values():
+                    histogram.advance(now)
+                result[names[span_id]] = {name: histogram.summary() for name, histogram in windows.items()}
+        return result
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return {
+                'spans': len(self.histograms),
+                'drains': self.drains,
+                'dropped_samples': self.dropped,
+                'last_drain_ms': round(self.last_drain_ms, 3)
+            }
+
+
+# Global instance
+span_histograms = SpanHistograms()
+
+
+if __name__ == '__main__':
+    # Accuracy of the bucket percentiles against exact ones, and the cost of adding samples and of a summary
+    import random
+
+    random.seed(1)
+    samples = [random.lognormvariate(1.0, 0.8) for _ in range(100000)]
+    histogram = SlidingHistogram(60, 6)
+    start = time.perf_counter()
+    for ms in samples:
+        histogram.add(bucket_index(ms), ms, 1000.0, ms > 50)
+    add_ns = (time.perf_counter() - start) / len(samples) * 1e9
+    start = time.perf_counter()
+    summary = histogram.summary()
+    summary_ms = (time.perf_counter() - start) * 1000
+    ordered = sorted(samples)
+    print(f"{'Percentile':<10} {'Exact':>9} {'Histogram':>10} {'Error':>7}")
+    for p in PERCENTILES:
+        exact = ordered[max(1, math.ceil(len(ordered) * p / 100)) - 1]
+        print(f"p{p:<9} {exact:>8.3f}ms {summary[f'p{p}']:>8.3f}ms {(summary[f'p{p}'] - exact) / exact * 100:>6.2f}%")
+    print(f"Add: {add_ns:.0f} ns/sample per window; summary of one window: {summary_ms:.2f}ms for {len(samples)} samples")
@@ -0,0 +1,345 @@
+import time
+import threading
+from array import array
+
+SPAN_RING_SIZE = 1024   # Samples kept per span
+MAX_SPAN_DEPTH = 32     # Spans open at once on one thread
+NO_PARENT = -1
+
+# Fields of each sample in _SpanRing.samples
+DURATION, SELF_MS, END, FRAME = range(4)
+SAMPLE_FIELDS = 4
+
+
+class _NoSpan:
+    """Shared context manager returned while tracing is disabled; entering and leaving it does nothing."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+class _SpanRing:
+    """
+    The last SPAN_RING_SIZE samples of one span in a single preallocated array('d'), SAMPLE_FIELDS
+    per sample: duration in ms including children, self time in ms excluding them, perf_counter()
+    at the end of the span, and the frame number. Tags (e.g. widget ids) are kept alongside.
+    """
+
+    def __init__(self, name: str, capacity: int, frame_root: bool):
+        self.name = name
+        self.capacity = capacity
+        self.frame_root = frame_root # Ending this span completes a frame
+        self.samples = array('d', bytes(8 * SAMPLE_FIELDS * capacity))
+        self.tags = [None] * capacity
+        self.total = 0
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def indexes(self):
+        """Ring slots of the retained samples, newest first."""
+        return [i % self.capacity for i in range(self.total - 1, self.total - 1 - len(self), -1)]
+
+    def field(self, slot: int, field: int) -> float:
+        return self.samples[slot * SAMPLE_FIELDS + field]
+
+
+class _Span:
+    """A slot of a thread's span stack, reused by every span opened at its depth."""
+    __slots__ = ('tracer', 'stack', 'ring', 'tag', 'start', 'child_ms', 'ms')
+
+    def __init__(self, tracer, stack):
+        self.tracer = tracer
+        self.stack = stack
+        self.ring = None
+        self.tag = None
+
+    def __enter__(self):
+        self.child_ms = 0.0
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        stack = self.stack
+        stack.depth -= 1
+        self.ms = duration_ms = (end - self.start) * 1000
+        if stack.depth:
+            stack.spans[stack.depth - 1].child_ms += duration_ms
+        ring = self.ring
+        slot = ring.total % ring.capacity
+        ring.tags[slot] = self.tag
+        slot *= SAMPLE_FIELDS
+        samples = ring.samples
+        samples[slot] = duration_ms
+        samples[slot + 1] = duration_ms - self.child_ms
+        samples[slot + 2] = end
+        tracer = self.tracer
+        samples[slot + 3] = tracer.frame
+        ring.total += 1
+        if ring.frame_root:
+            tracer.completed_frame = tracer.frame
+            tracer.frame += 1
+        if duration_ms > tracer.slow_ms and tracer.log_slow:
+            tracer.report_slow(ring, self.tag, duration_ms)
+        return False
+
+
+class _ThreadStack:
+    """One thread's open spans: MAX_SPAN_DEPTH _Spans allocated once, of which the first `depth` are open."""
+
+    def __init__(self, tracer):
+        self.spans = [_Span(tracer, self) for _ in range(MAX_SPAN_DEPTH)]
+        self.depth = 0
+
+
+class SpanTracer:
+    """
+    Hierarchical timing of the render loop.
+
+    Spans are registered once, by name and with their parent, and identified by the int that
+    register() returns, so nothing is formatted or hashed per frame. Per-instance detail such as
+    a widget id is passed as a tag instead of being baked into the name. Each thread has its own
+    stack of open spans, so nested and concurrent spans can't overwrite each other, and a span's
+    self time excludes the spans opened inside it.
+
+    Samples go into preallocated per-span rings without taking a lock; the render thread is the
+    only writer of its spans. Each sample carries the current frame number, which moves on when
+    a span registered as a frame root (the render cycle) ends, and last_frame() returns the tree
+    of the last completed frame. While `enabled` is False, span() returns a shared no-op context
+    manager. Flip it between frames, not while spans are open.
+    """
+
+    def __init__(self, capacity: int = SPAN_RING_SIZE):
+        self.capacity = capacity
+        self.enabled = True
+        self.slow_ms = 50.0       # Samples above this count as exceeding the threshold
+        self.log_slow = False     # Print every slow sample
+        self.lock = threading.Lock() # Registration only
+        self.local = threading.local() # .stack: this thread's _ThreadStack
+        self.ids = {}             # name -> span id
+        self.names = []           # span id -> name
+        self.parents = []         # span id -> parent span id or NO_PARENT
+        self.rings = []           # span id -> _SpanRing
+        self.frame = 1            # Number of the frame being rendered
+        self.completed_frame = 0  # Number of the last frame whose root span has ended
+        self.preloaded = {}       # name -> [(wall time, ms)] from a saved log, replayed when the name is registered
+        self.clock_offset = time.time() - time.perf_counter() # perf_counter() -> wall time
+
+    # --- Registration ---
+
+    def register(self, name: str, parent: str = None, frame_root: bool = False) -> int:
+        """The id of the span called `name`, registering it (and its parent) on first use."""
+        span_id = self.ids.get(name)
+        if span_id is not None:
+            return span_id
+        parent_id = self.register(parent) if parent else NO_PARENT
+        with self.lock:
+            span_id = self.ids.get(name)
+            if span_id is not None:
+                return span_id
+            span_id = len(self.names)
+            self.names.append(name)
+            self.parents.append(parent_id)
+            self.rings.append(_SpanRing(name, self.capacity, frame_root))
+            self.ids[name] = span_id
+            history = self.preloaded.pop(name, ())
+        for wall_time, duration_ms in history:
+            self._store(span_id, duration_ms, wall_time - self.clock_offset)
+        return span_id
+
+    def preload(self, name: str, wall_time: float, duration_ms: float):
+        """Adds a sample from a saved log. Names that are never registered again are dropped with their history."""
+        span_id = self.ids.get(name)
+        if span_id is not None:
+            self._store(span_id, duration_ms, wall_time - self.clock_offset)
+        else:
+            self.preloaded.setdefault(name, []).append((wall_time, duration_ms))
+
+    def _store(self, span_id: int, duration_ms: float, end: float):
+        ring = self.rings[span_id]
+        slot = ring.total % ring.capacity
+        ring.tags[slot] = None
+        ring.samples[slot * SAMPLE_FIELDS:(slot + 1) * SAMPLE_FIELDS] = array('d', (duration_ms, duration_ms, end, 0))
+        ring.total += 1
+
+    # --- Recording ---
+
+    def span(self, span_id: int, tag=None):
+        """
+        Context manager timing its block as `span_id`, tagged with e.g. a widget id.
+        Use it in a with statement straight away: the span is already on the thread's stack.
+        """
+        if not self.enabled:
+            return _NO_SPAN
+        try:
+            stack = self.local.stack
+        except AttributeError:
+            stack = self.local.stack = _ThreadStack(self)
+        if stack.depth == MAX_SPAN_DEPTH:
+            raise RuntimeError(f"Span '{self.names[span_id]}' nested deeper than {MAX_SPAN_DEPTH}")
+        span = stack.spans[stack.depth]
+        stack.depth += 1
+        span.ring = self.rings[span_id]
+        span.tag = tag
+        return span
+
+    def begin(self, span_id: int, tag=None):
+        """Opens a span for code a with block doesn't fit. Every begin() needs one end()."""
+        self.span(span_id, tag).__enter__()
+
+    def end(self) -> float:
+        """Closes this thread's innermost span and returns its duration in ms."""
+        stack = getattr(self.local, 'stack', None)
+        if not self.enabled or stack is None or not stack.depth:
+            return 0.0
+        span = stack.spans[stack.depth - 1]
+        span.__exit__(None, None, None)
+        return span.ms
+
+    def report_slow(self, ring: _SpanRing, tag, duration_ms: float):
+        print(f"[PERF] {ring.name}{f' ({tag})' if tag is not None else ''}: {duration_ms:.2f}ms (SLOW)")
+
+    # --- Reading ---
+
+    def last_ms(self, span_id: int):
+        """Duration of the span's most recent sample, or None if it has none or tracing is disabled."""
+        ring = self.rings[span_id]
+        if not self.enabled or not ring.total:
+            return None
+        return ring.field((ring.total - 1) % ring.capacity, DURATION)
+
+    def samples(self, span_id: int) -> list:
+        """The span's retained samples as (wall time, duration ms), oldest first."""
+        ring = self.rings[span_id]
+        return [(ring.field(slot, END) + self.clock_offset, ring.field(slot, DURATION))
+                for slot in reversed(ring.indexes())]
+
+    def span_names(self) -> list:
+        with self.lock:
+            return list(self.names)
+
+    def parent_name(self, span_id: int):
+        parent_id = self.parents[span_id]
+        return self.names[parent_id] if parent_id != NO_PARENT else None
+
+    def last_frame(self) -> dict:
+        """
+        The spans of the last completed frame as a tree: {'name', 'tag', 'ms', 'self_ms', 'children'}.
+        Children are listed, in the order they ended, under the sample of their parent span.
+        """
+        target = self.completed_frame
+        records = []
+        for span_id in range(len(self.names)):
+            ring = self.rings[span_id]
+            for slot in ring.indexes():
+                frame = ring.field(slot, FRAME)
+                if frame > target:
+                    continue
+                if frame < target:
+                    break
+                records.append((ring.field(slot, END), span_id, {
+                    'name': self.names[span_id],
+                    'tag': ring.tags[slot],
+                    'ms': round(ring.field(slot, DURATION), 3),
+                    'self_ms': round(ring.field(slot, SELF_MS), 3),
+                    'children': []
+                }))
+        records.sort(key=lambda record: record[0])
+        by_span = {}
+        for _, span_id, node in records:
+            by_span.setdefault(span_id, node)
+        roots = []
+        for _, span_id, node in records:
+            parent = by_span.get(self.parents[span_id])
+            (parent['children'] if parent is not None else roots).append(node)
+        return {'frame': target, 'spans': roots}
+
+    def get_stats(self) -> dict:
+        return {
+            'enabled': self.enabled,
+            'frame': self.completed_frame,
+            'spans': {name: {'parent': self.parent_name(span_id), 'samples': self.rings[span_id].total}
+                      for span_id, name in enumerate(self.span_names())}
+        }
+
+
+# Global instance
+tracer = SpanTracer()
+
+
+if __name__ == '__main__':
+    # Per-span overhead of the tracer, enabled and disabled, against the old flat-dict timers
+    # (f-string name, dict of start times, a dict appended to a deque under a lock per end).
+    import sys
+    from collections import deque
+
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    bench = SpanTracer()
+    outer = bench.register('bench_outer', frame_root=True)
+    inner = bench.register('bench_inner', parent='bench_outer')
+
+    class OldTimers:
+        def __init__(self):
+            self.enabled = True
+            self.timing_data = {}
+            self.last_duration_ms = {}
+            self.performance_log = deque(maxlen=1000)
+            self.lock = threading.Lock()
+
+        def start_timer(self, section_name):
+            if not self.enabled:
+                return
+            self.timing_data[section_name] = time.monotonic()
+
+        def end_timer(self, section_name):
+            if not self.enabled or section_name not in self.timing_data:
+                return 0
+            duration_ms = (time.monotonic() - self.timing_data[section_name]) * 1000
+            self.last_duration_ms[section_name] = duration_ms
+            with self.lock:
+                self.performance_log.append({"timestamp": time.time(), "section": section_name,
+                                             "duration_ms": duration_ms, "exceeded_threshold": duration_ms > 50})
+            del self.timing_data[section_name]
+            return duration_ms
+
+    old = OldTimers()
+
+    def old_timers(widget_id):
+        old.start_timer(f"widget_{widget_id}_draw_text")
+        old.end_timer(f"widget_{widget_id}_draw_text")
+
+    def spans(widget_id):
+        with bench.span(inner, widget_id):
+            pass
+
+    def empty(widget_id):
+        pass
+
+    def measure(function):
+        best = None
+        for _ in range(5):
+            start = time.perf_counter()
+            bench.begin(outer)
+            for i in range(iterations):
+                function('clock')
+            bench.end()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best / iterations * 1e9
+
+    baseline = measure(empty)
+    print(f"{'Variant':<28} {'ns/span':>8}")
+    print(f"{'old start/end_timer':<28} {measure(old_timers) - baseline:>8.0f}")
+    print(f"{'tracer, enabled':<28} {measure(spans) - baseline:>8.0f}")
+    bench.enabled = False
+    print(f"{'tracer, disabled':<28} {measure(spans) - baseline:>8.0f}")
+    bench.enabled = True
+    print(f"Last frame: {len(bench.last_frame()['spans'][0]['children'])} child samples retained")
@@ -0,0 +1,135 @@
+import time
+import threading
+from collections import deque
+
+import psutil
+
+SAMPLE_INTERVAL_S = 1.0
+SAMPLE_HISTORY = 300                 # 5 minutes at the default interval
+THERMAL_ZONE_TEMP = '/sys/class/thermal/thermal_zone0/temp'
+CPU0_CUR_FREQ = '/sys/devices/system/cpu/cpu0/cpufreq/scaling_cur_freq'
+METRICS = ('cpu', 'memory', 'temperature', 'frequency')
+
+
+class SystemSampler:
+    """
+    Process-wide system metrics sampler. A single background thread samples CPU load, memory
+    use, CPU temperature and CPU frequency at a fixed cadence into fixed-size ring buffers.
+    The /api/system_stats endpoint, the render loop's periodic log and the system metrics
+    widget all read from those buffers, so none of them ever wait for a measurement.
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL_S, history: int = SAMPLE_HISTORY):
+        self.interval = interval
+        self.history = history
+        self.lock = threading.Lock()
+        # metric -> deque of values; temperature in deg C, frequency in MHz, None when unavailable
+        self._series = {metric: deque(maxlen=history) for metric in METRICS}
+        self._thread = None
+        self._stop_event = threading.Event()
+        self.tick_count = 0
+        self.last_tick_us = 0.0
+
+    def start(self):
+        """Starts the sampling thread if it isn't already running. Safe to call from every widget."""
+        with self.lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            # cpu_percent(interval=None) reports usage since the previous call; prime it so the first tick is meaningful
+            psutil.cpu_percent(interval=None)
+            self._thread = threading.Thread(target=self._run, name="system_sampler", daemon=True)
+            self._thread.start()
+        print(f"[SYS] System metrics sampler started ({self.interval}s interval, {self.history} samples)")
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _run(self):
+        next_tick = time.monotonic() + self.interval
+        while not self._stop_event.wait(max(0.0, next_tick - time.monotonic())):
+            self.tick()
+            # Schedule against a fixed grid so processing time doesn't make the cadence drift
+            next_tick += self.interval
+            if next_tick < time.monotonic():
+                next_tick = time.monotonic()
+
+    def tick(self):
+        """Takes one sample of every metric and appends it to the ring buffers."""
+        start = time.perf_counter()
+        sample = {
+            'cpu': psutil.cpu_percent(interval=None), # Non-blocking: usage since the previous tick
+            'memory': psutil.virtual_memory().percent,
+            'temperature': self._read_temperature(),
+            'frequency': self._read_frequency()
+        }
+        with self.lock:
+            for metric, value in sample.items():
+                self._series[metric].append(value)
+            self.tick_count += 1
+            self.last_tick_us = (time.perf_counter() - start) * 1e6
+
+    @staticmethod
+    def _read_temperature():
+        try:
+            with open(THERMAL_ZONE_TEMP, 'r') as f:
+                return float(f.read().strip()) / 1000.0
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _read_frequency():
+        try:
+            with open(CPU0_CUR_FREQ, 'r') as f:
+                return float(f.read().strip()) / 1000.0
+        except (OSError, ValueError):
+            pass
+        try:
+            freq = psutil.cpu_freq()
+            return float(freq.current) if freq else None
+        except Exception:
+            return None
+
+    def get_history(self, metric: str, count: int = None) -> list:
+        """The most recent `count` samples of a metric, oldest first."""
+        with self.lock:
+            ring = self._series.get(metric)
+            if not ring:
+                return []
+            samples = list(ring)
+        return samples[-count:] if count else samples
+
+    def get_latest(self) -> dict:
+        """The most recent value of every metric (None for metrics not sampled yet or unavailable)."""
+        with self.lock:
+            return {metric: (ring[-1] if ring else None) for metric, ring in self._series.items()}
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return {
+                'running': bool(self._thread and self._thread.is_alive()),
+                'interval_s': self.interval,
+                'history': self.history,
+                'ticks': self.tick_count,
+                'last_tick_us': round(self.last_tick_us, 1)
+            }
+
+
+# Global instance
+system_sampler = SystemSampler()
+
+
+if __name__ == '__main__':
+    # Compares the old blocking call with reading the sampler's buffers.
+    import sys
+    import timeit
+
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    system_sampler.tick()
+    blocking_ms = timeit.timeit(lambda: psutil.cpu_percent(interval=0.02), number=max(1, iterations // 20)) / max(1, iterations // 20) * 1000
+    tick_us = timeit.timeit(system_sampler.tick, number=iterations) / iterations * 1e6
+    read_us = timeit.timeit(system_sampler.get_latest, number=iterations) / iterations * 1e6
+    print(f"psutil.cpu_percent(interval=0.02): {blocking_ms:10.2f} ms/call")
+    print(f"sampler tick (all metrics):        {tick_us:10.1f} us/call (background thread)")
+    print(f"sampler get_latest():              {read_us:10.1f} us/call")
+    print(f"Latest sample: {system_sampler.get_latest()}")
@@ -0,0 +1,379 @@
+import os
+import time
+import threading
+from array import array
+
+# Each source imports its backend (samplers, tracer, providers and requests) when it is first
+# tracked, so importing this module, and the graph widget, costs only what its graphs use
+
+RECORDER_TICK_S = 1.0
+RING_CAPACITY = 16384        # Raw points kept per series: two arrays of doubles, 256 KB
+SOURCE_RETAIN_S = 24 * 3600  # A source nobody has read for this long stops being recorded
+FILE_MAX_READ_BYTES = 1 << 20
+WEATHER_REFRESH_S = 15 * 60
+
+
+class SeriesRing:
+    """
+    Fixed-capacity ring of (timestamp, value) points stored in two array('d') buffers.
+    `total` counts every point ever appended, so a reader can ask for just the points it hasn't seen.
+    """
+
+    def __init__(self, capacity: int = RING_CAPACITY):
+        self.capacity = capacity
+        self.times = array('d', bytes(8 * capacity))
+        self.values = array('d', bytes(8 * capacity))
+        self.total = 0
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def append(self, t: float, v: float):
+        index = self.total % self.capacity
+        self.times[index] = t
+        self.values[index] = v
+        self.total += 1
+
+    def latest(self):
+        if not self.total:
+            return None
+        index = (self.total - 1) % self.capacity
+        return self.times[index], self.values[index]
+
+    def since(self, seen_total: int):
+        """
+        Points appended after the reader had seen `seen_total`, oldest first, and the new total.
+        If the reader fell so far behind that points were overwritten, only the retained ones are returned.
+        """
+        start = max(seen_total, self.total - self.capacity)
+        points = [(self.times[i % self.capacity], self.values[i % self.capacity]) for i in range(start, self.total)]
+        return points, self.total
+
+
+class StreamingLTTB:
+    """
+    Largest-Triangle-Three-Buckets downsampling, fed one point at a time.
+
+    Buckets are aligned to absolute time (bucket_s wide) rather than to the number of points,
+    so a bucket's contents never change once time has moved on. As in LTTB, a bucket keeps the
+    point forming the largest triangle with the point kept from the previous bucket and the
+    average of the next bucket. That choice is final once the next bucket is complete, so each
+    new point costs one triangle test per point of a single bucket, and only the two newest
+    buckets are ever re-evaluated. points() returns one point per bucket for the latest
+    `buckets` buckets; the newest bucket is represented by its latest point.
+    """
+
+    def __init__(self, bucket_s: float, buckets: int):
+        self.bucket_s = bucket_s
+        self.buckets = buckets
+        self.newest_bucket = None
+        self._open = {}      # bucket index -> [(t, v), ...] for buckets whose selection isn't final
+        self._selected = []  # [(bucket index, t, v)] final selections, oldest first
+        self._anchor = None  # The last final selection, even if it has scrolled out of the window
+
+    def add(self, t: float, v: float):
+        bucket = int(t // self.bucket_s)
+        if self.newest_bucket is not None and bucket < self.newest_bucket and bucket not in self._open:
+            return # Late point for a bucket that is already final
+        self._open.setdefault(bucket, []).append((t, v))
+        if self.newest_bucket is None or bucket > self.newest_bucket:
+            self.newest_bucket = bucket
+            keys = sorted(self._open)
+            # A bucket is final when the bucket after it is complete (i.e. isn't the newest)
+            while len(keys) >= 3:
+                self._finalize(keys[0], self._average(keys[1]))
+                keys.pop(0)
+            first_in_window = self.newest_bucket - self.buckets + 1
+            if self._selected and self._selected[0][0] < first_in_window:
+                self._selected = [s for s in self._selected if s[0] >= first_in_window]
+
+    def _average(self, bucket):
+        points = self._open[bucket]
+        return (sum(p[0] for p in points) / len(points), sum(p[1] for p in points) / len(points))
+
+    def _select(self, bucket, next_average):
+        points = self._open[bucket]
+        if self._anchor is None:
+            return points[0] # LTTB always keeps the first point
+        ax, ay = self._anchor
+        cx, cy = next_average
+        best, best_area = points[0], -1.0
+        for bx, by in points:
+            # Twice the triangle area; the constant factor doesn't change which point wins
+            area = abs((ax - cx) * (by - ay) - (ax - bx) * (cy - ay))
+            if area > best_area:
+                best, best_area = (bx, by), area
+        return best
+
+    def _finalize(self, bucket, next_average):
+        t, v = self._select(bucket, next_average)
+        self._selected.append((bucket, t, v))
+        self._anchor = (t, v)
+        del self._open[bucket]
+
+    def points(self) -> list:
+        """[(bucket index, t, v)] for the buckets in the window, oldest first."""
+        result = list(self._selected)
+        keys = sorted(self._open)
+        if len(keys) == 2:
+            # Tentative: the newest bucket is still filling, so its average may move
+            t, v = self._select(keys[0], self._average(keys[1]))
+            result.append((keys[0], t, v))
+        if keys:
+            t, v = self._open[keys[-1]][-1] # LTTB always keeps the last point
+            result.append((keys[-1], t, v))
+        first_in_window = self.newest_bucket - self.buckets + 1 if self.newest_bucket is not None else 0
+        return [p for p in result if p[0] >= first_in_window]
+
+
+class _Source:
+    """A tracked series: how to read it and the ring it is recorded into."""
+
+    def __init__(self, key, interval_s):
+        self.key = key
+        self.interval_s = interval_s
+        self.ring = SeriesRing()
+        self.lock = threading.Lock()
+        self.last_sample_time = 0.0
+        self.last_requested = time.monotonic()
+        self.error = None
+
+    def sample(self, now_wall: float):
+        """Returns a value to record now, or None."""
+        return None
+
+    def record(self, t: float, v):
+        if v is None:
+            return
+        with self.lock:
+            self.ring.append(t, float(v))
+
+    def close(self):
+        pass
+
+
+class _SystemSource(_Source):
+    def __init__(self, key, interval_s):
+        from system_sampler import system_sampler
+        super().__init__(key, interval_s)
+        self.metric = key[1]
+        self.last_tick = None
+        self.sampler = system_sampler
+        system_sampler.start()
+
+    def sample(self, now_wall):
+        if self.sampler.tick_count == self.last_tick:
+            return None # Nothing new since the last read
+        self.last_tick = self.sampler.tick_count
+        return self.sampler.get_latest()[self.metric]
+
+
+class _NetworkSource(_Source):
+    def __init__(self, key, interval_s):
+        from net_collector import net_sampler
+        super().__init__(key, interval_s)
+        self.direction, self.interface = key[1], key[2]
+        self.sampler = net_sampler
+        net_sampler.start()
+
+    def sample(self, now_wall):
+        interface = self.interface or self.sampler.default_interface()
+        latest = self.sampler.get_latest(interface) if interface else None
+        if latest is None:
+            return None
+        return latest[0] if self.direction == 'rx' else latest[1]
+
+
+class _FrameTimeSource(_Source):
+    def __init__(self, key, interval_s):
+        from span_tracer import tracer
+        super().__init__(key, interval_s)
+        self.tracer = tracer
+        self.span_id = tracer.register('display_update_cycle', frame_root=True)
+
+    def sample(self, now_wall):
+        return self.tracer.last_ms(self.span_id)
+
+
+class _WeatherSource(_Source):
+    """Current temperature pushed by a WeatherProvider subscription."""
+
+    def __init__(self, key, interval_s):
+        from providers import provider_registry
+        super().__init__(key, interval_s)
+        _, latitude, longitude, units = key
+        self.subscription = provider_registry.subscribe(
+            'weather', {'latitude': latitude, 'longitude': longitude, 'units': units},
+            self._on_weather_update, WEATHER_REFRESH_S)
+        snapshot = self.subscription.snapshot()
+        if snapshot:
+            self._on_weather_update(snapshot)
+
+    def _on_weather_update(self, snapshot):
+        current = (snapshot['data'] or {}).get('current_weather') or {}
+        if 'temperature' in current:
+            self.record(snapshot['updated_at'] or time.time(), current['temperature'])
+
+    def close(self):
+        self.subscription.unsubscribe()
+
+
+class _FileSource(_Source):
+    """
+    Tails a local text file of 'value' or 'timestamp,value' lines (timestamp in epoch seconds).
+    Only bytes appended since the last read are parsed; a file that shrinks is re-read from the start.
+    """
+
+    def __init__(self, key, interval_s):
+        super().__init__(key, interval_s)
+        self.path = key[1]
+        self.offset = 0
+        self.partial = b''
+
+    def sample(self, now_wall):
+        try:
+            size = os.path.getsize(self.path)
+            if size < self.offset:
+                self.offset, self.partial = 0, b'' # Truncated or replaced
+            if size == self.offset:
+                return None
+            with open(self.path, 'rb') as f:
+                f.seek(self.offset)
+                chunk = f.read(FILE_MAX_READ_BYTES)
+            self.offset += len(chunk)
+            self.error = None
+        except OSError as e:
+            self.error = str(e)
+            return None
+        lines = (self.partial + chunk).split(b'\n')
+        self.partial = lines.pop() # Incomplete last line; finished on a later read
+        for line in lines:
+            parts = line.decode('utf-8', 'replace').strip().split(',')
+            try:
+                if len(parts) >= 2:
+                    self.record(float(parts[0]), float(parts[1]))
+                elif parts[0]:
+                    self.record(now_wall, float(parts[0]))
+            except ValueError:
+                continue # Header or malformed line
+        return None
+
+
+_SOURCE_TYPES = {
+    'system': _SystemSource,
+    'network': _NetworkSource,
+    'frame_time': _FrameTimeSource,
+    'weather': _WeatherSource,
+    'file': _FileSource
+}
+
+
+class SeriesRecorder:
+    """
+    Process-wide recorder of time series for graph widgets. Once a widget asks for a series,
+    a single background thread keeps sampling it into an array-backed ring, including while the
+    widget's screen isn't shown, so a 24 hour graph doesn't start empty after every rotation.
+    Each (key, interval) has its own ring, so a short graph sampling often doesn't shrink the
+    history a longer graph of the same metric can keep. Series nobody has read for
+    SOURCE_RETAIN_S are dropped.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sources = {}  # (key, interval_s) -> _Source
+        self._thread = None
+        self._wake_event = threading.Event()
+
+    def track(self, key: tuple, interval_s: float = RECORDER_TICK_S) -> _Source:
+        """
+        Returns the series for `key` recorded every `interval_s`, creating it if needed. Keys are
+        ('system', metric), ('network', 'rx'|'tx', interface), ('frame_time',),
+        ('weather', latitude, longitude, units) or ('file', path).
+        """
+        with self.lock:
+            source = self.sources.get((key, interval_s))
+            if source is None:
+                source_class = _SOURCE_TYPES.get(key[0])
+                if source_class is None:
+                    raise ValueError(f"Unknown series source '{key[0]}'")
+                source = self.sources[(key, interval_s)] = source_class(key, interval_s)
+                print(f"[SERIES] Recording {key} every {interval_s:.1f}s")
+                self._wake_event.set() # Take the first sample now
+            source.last_requested = time.monotonic()
+            if not self._thread or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="series_recorder", daemon=True)
+                self._thread.start()
+            return source
+
+    def _run(self):
+        while True:
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"[SERIES] ERROR: Recorder tick failed: {e}")
+            self._wake_event.wait(RECORDER_TICK_S)
+            self._wake_event.clear()
+
+    def tick(self):
+        now = time.monotonic()
+        now_wall = time.time()
+        with self.lock:
+            sources = list(self.sources.items())
+        for source_key, source in sources:
+            if now - source.last_requested > SOURCE_RETAIN_S:
+                with self.lock:
+                    self.sources.pop(source_key, None)
+                source.close()
+                print(f"[SERIES] Stopped recording {source.key} every {source.interval_s:.1f}s (unused)")
+                continue
+            if now - source.last_sample_time >= source.interval_s:
+                source.last_sample_time = now
+                try:
+                    source.record(now_wall, source.sample(now_wall))
+                except Exception as e:
+                    source.error = str(e)
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            sources = list(self.sources.values())
+        return {
+            'series': [{'key': [str(part) for part in s.key], 'points': len(s.ring), 'total': s.ring.total,
+                        'interval_s': s.interval_s, 'error': s.error} for s in sources]
+        }
+
+
+# Global instance
+series_recorder = SeriesRecorder()
+
+
+if __name__ == '__main__':
+    # Compares rebuilding LTTB from scratch for every new point with the streaming version.
+    import math
+    import sys
+    import random
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    width = 64
+    points = [(float(i), math.sin(i / 500.0) * 10 + random.random()) for i in range(count)]
+    bucket_s = count / width
+
+    start = time.perf_counter()
+    stream = StreamingLTTB(bucket_s, width)
+    for t, v in points:
+        stream.add(t, v)
+        stream.points()
+    streaming_us = (time.perf_counter() - start) / count * 1e6
+
+    start = time.perf_counter()
+    rebuilds = max(1, count // 200)
+    for n in range(count - rebuilds, count):
+        rebuilt = StreamingLTTB(bucket_s, width)
+        for t, v in points[:n + 1]:
+            rebuilt.add(t, v)
+        rebuilt.points()
+    rebuild_us = (time.perf_counter() - start) / rebuilds * 1e6
+
+    print(f"{count} points downsampled to {width} columns")
+    print(f"  streaming add + points(): {streaming_us:10.1f} us/point")
+    print(f"  rebuild per new point:    {rebuild_us:10.1f} us/point")
+    print(f"  output points: {len(stream.points())}, identical to rebuild: {stream.points() == rebuilt.points()}")
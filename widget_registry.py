@@ -0,0 +1,257 @@
+import os
+import re
+import sys
+import ast
+import json
+import time
+import inspect
+import importlib
+import threading
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+WIDGETS_DIR = os.path.join(APP_DIR, 'widgets')
+MANIFEST_FILE_PATH = os.path.join(APP_DIR, 'widget_manifest.json')
+MANIFEST_VERSION = 2
+
+
+class WidgetRegistry:
+    """
+    Maps widget type keys to widget classes without importing every widget at startup.
+
+    A manifest (type, module, class name, display name and config options of every
+    `widgets/*_widget.py`) is cached in widget_manifest.json. It is rebuilt only when a file in
+    widgets/, or an app module they import (directly or not), has changed size or mtime since it
+    was written: config options can come from such a module, e.g. feed_ingest's defaults for the
+    news widget. Startup then only stats those files and reads the manifest. A widget module, and whatever it imports (requests, ntplib, ...),
+    is imported the first time a layout instantiates that type. The widget type list for the
+    config page is served from the manifest.
+    """
+
+    def __init__(self, widgets_dir: str = WIDGETS_DIR, manifest_path: str = MANIFEST_FILE_PATH):
+        self.widgets_dir = widgets_dir
+        self.manifest_path = manifest_path
+        self.lock = threading.Lock()
+        self.manifest = {}          # type key -> {'module', 'class_name', 'display_name', 'config_options'}
+        self.classes = {}           # type key -> imported class
+        self.import_errors = {}     # type key -> error message; failed imports are not retried every frame
+        self.import_times_ms = {}   # module name -> time spent importing it (including its dependencies)
+        self.manifest_load_ms = 0.0
+        self.manifest_rebuilt = False
+
+    # --- Manifest ---
+
+    def _source_signature(self, dependencies=()) -> dict:
+        """{filename: [size, mtime_ns]} of every .py file in the widgets directory, then of the given app module paths."""
+        signature = {}
+        for filename in sorted(os.listdir(self.widgets_dir)):
+            if filename.endswith('.py'):
+                stat = os.stat(os.path.join(self.widgets_dir, filename))
+                signature[filename] = [stat.st_size, stat.st_mtime_ns]
+        app_dir = os.path.dirname(self.widgets_dir)
+        for filename in dependencies:
+            try:
+                stat = os.stat(os.path.join(app_dir, filename))
+                signature[f"../{filename}"] = [stat.st_size, stat.st_mtime_ns]
+            except OSError:
+                signature[f"../{filename}"] = None
+        return signature
+
+    def _app_dependencies(self) -> list:
+        """
+        Paths, relative to the app directory, of the app modules and packages outside widgets/ that
+        the widget files import, directly or through each other.
+        """
+        app_dir = os.path.dirname(self.widgets_dir)
+        pending = [os.path.join(self.widgets_dir, f) for f in os.listdir(self.widgets_dir) if f.endswith('.py')]
+        found = set()
+        while pending:
+            path = pending.pop()
+            try:
+                with open(path, 'r') as f:
+                    tree = ast.parse(f.read())
+            except (OSError, SyntaxError, ValueError):
+                continue # An unreadable widget fails its import and is retried anyway
+            for node in ast.walk(tree):
+                if isinstance(node, ast.Import):
+                    base_dir, names = app_dir, [alias.name for alias in node.names]
+                elif isinstance(node, ast.ImportFrom):
+                    base_dir = app_dir
+                    if node.level: # Relative: from the importing file's package
+                        base_dir = os.path.dirname(path)
+                        for _ in range(node.level - 1):
+                            base_dir = os.path.dirname(base_dir)
+                    prefix = f"{node.module}." if node.module else ''
+                    names = ([node.module] if node.module else []) + [prefix + alias.name for alias in node.names]
+                else:
+                    continue
+                for name in names:
+                    # Each level of a dotted name is a module file or a package's __init__.py
+                    parts = name.split('.')
+                    for depth in range(1, len(parts) + 1):
+                        stem = os.path.join(base_dir, *parts[:depth])
+                        for candidate in (stem + '.py', os.path.join(stem, '__init__.py')):
+                            relative = os.path.relpath(candidate, app_dir)
+                            if (relative not in found and not candidate.startswith(self.widgets_dir + os.sep)
+                                    and not relative.startswith('..') and os.path.isfile(candidate)):
+                                found.add(relative)
+                                pending.append(candidate)
+        return sorted(found)
+
+    @staticmethod
+    def _display_name(class_name: str) -> str:
+        display_name = class_name.replace("Widget", "")
+        return re.sub(r'(?<=[a-z])(?=[A-Z])|(?<=[A-Z])(?=[A-Z][a-z])', ' ', display_name).strip()
+
+    def load_manifest(self):
+        """Loads the cached manifest, rebuilding it if any widget source file changed."""
+        start = time.perf_counter()
+        if not os.path.isdir(self.widgets_dir):
+            print(f"[WIDGETS] Widgets directory not found at {self.widgets_dir}")
+            return
+        cached = None
+        try:
+            with open(self.manifest_path, 'r') as f:
+                cached = json.load(f)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"[WIDGETS] Ignoring unreadable widget manifest: {e}")
+
+        # A manifest written while some module failed to import is retried on the next start
+        if (cached and cached.get('version') == MANIFEST_VERSION and not cached.get('failed')
+                and cached.get('sources') == self._source_signature(cached.get('dependencies', ()))):
+            manifest = cached['widgets']
+            self.manifest_rebuilt = False
+        else:
+            dependencies = self._app_dependencies()
+            signature = self._source_signature(dependencies) # Taken before the imports, so edits made meanwhile cause a rebuild
+            manifest, failed = self._build_manifest()
+            self.manifest_rebuilt = True
+            try:
+                with open(self.manifest_path, 'w') as f:
+                    json.dump({'version': MANIFEST_VERSION, 'sources': signature, 'dependencies': dependencies,
+                               'failed': failed, 'widgets': manifest}, f, indent=2)
+            except Exception as e:
+                print(f"[WIDGETS] Could not write widget manifest {self.manifest_path}: {e}")
+
+        with self.lock:
+            self.manifest = manifest
+            self.import_errors = {k: v for k, v in self.import_errors.items() if k in manifest}
+        self.manifest_load_ms = (time.perf_counter() - start) * 1000
+        print(f"[WIDGETS] {len(manifest)} widget types from {'rebuilt' if self.manifest_rebuilt else 'cached'} "
+              f"manifest in {self.manifest_load_ms:.1f}ms: {sorted(manifest)}")
+
+    def _build_manifest(self):
+        """Imports every widget module once to record its class and config options. Returns (manifest, failed modules)."""
+        from widgets.base_widget import BaseWidget
+
+        manifest = {}
+        failed = []
+        for filename in sorted(os.listdir(self.widgets_dir)):
+            if not filename.endswith('_widget.py'): # Convention: widget_type_widget.py
+                continue
+            module_name = f"widgets.{filename[:-3]}"
+            widget_type_key = filename[:-10] # Extracts 'time' from 'time_widget.py'
+            try:
+                module = self._import(module_name)
+            except Exception as e:
+                print(f"[WIDGETS] Error importing widget module {module_name}: {e}")
+                failed.append(module_name)
+                continue
+            for name, cls in inspect.getmembers(module, inspect.isclass):
+                # A subclass of BaseWidget actually defined in this module (not imported)
+                if issubclass(cls, BaseWidget) and cls is not BaseWidget and cls.__module__ == module_name:
+                    if widget_type_key in manifest:
+                        print(f"[WIDGETS] Warning: Duplicate widget type key '{widget_type_key}' found. Overwriting.")
+                    manifest[widget_type_key] = {
+                        'module': module_name,
+                        'class_name': name,
+                        'display_name': self._display_name(name),
+                        'config_options': cls.get_config_options()
+                    }
+                    with self.lock:
+                        self.classes[widget_type_key] = cls
+        return manifest, failed
+
+    # --- Lookup ---
+
+    def _import(self, module_name: str):
+        already_loaded = module_name in sys.modules
+        start = time.perf_counter()
+        module = importlib.import_module(module_name)
+        if not already_loaded:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.import_times_ms[module_name] = round(elapsed_ms, 2)
+            print(f"[WIDGETS] Imported {module_name} in {elapsed_ms:.1f}ms")
+        return module
+
+    def get_class(self, widget_type: str):
+        """The widget class for a type key, importing its module on first use. None if unknown or broken."""
+        cls = self.classes.get(widget_type)
+        if cls is not None:
+            return cls
+        with self.lock:
+            entry = self.manifest.get(widget_type)
+            if entry is None or widget_type in self.import_errors:
+                return None
+            cls = self.classes.get(widget_type)
+            if cls is not None:
+                return cls
+            try:
+                cls = getattr(self._import(entry['module']), entry['class_name'])
+            except Exception as e:
+                self.import_errors[widget_type] = str(e)
+                print(f"[WIDGETS] Error loading widget type '{widget_type}' from {entry['module']}: {e}")
+                return None
+            self.classes[widget_type] = cls
+            return cls
+
+    def __contains__(self, widget_type: str) -> bool:
+        return widget_type in self.manifest
+
+    def get_widget_types(self) -> list:
+        """Widget types and their config options for the config UI, served from the manifest without importing anything."""
+        with self.lock:
+            return [{
+                "type": type_key,
+                "displayName": entry['display_name'],
+                "configOptions": entry['config_options']
+            } for type_key, entry in self.manifest.items()]
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return {
+                'types': sorted(self.manifest),
+                'imported': sorted(self.classes),
+                'import_errors': dict(self.import_errors),
+                'import_times_ms': dict(self.import_times_ms),
+                'manifest_load_ms': round(self.manifest_load_ms, 2),
+                'manifest_rebuilt': self.manifest_rebuilt
+            }
+
+
+# Global instance
+widget_registry = WidgetRegistry()
+
+
+if __name__ == '__main__':
+    # Startup report: manifest load time, then the cold import cost of each widget module,
+    # each measured in a fresh interpreter so shared dependencies aren't credited to whichever loads first.
+    import subprocess
+
+    registry = WidgetRegistry()
+    registry.load_manifest()
+    start = time.perf_counter()
+    registry.load_manifest()
+    print(f"Cached manifest load: {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    root = APP_DIR
+    probe = "import time; t = time.perf_counter(); import {module}; print((time.perf_counter() - t) * 1000)"
+    print(f"{'Widget type':<16} {'Module':<34} {'Cold import':>12}")
+    for type_key, entry in sorted(registry.manifest.items()):
+        result = subprocess.run([sys.executable, '-c', probe.format(module=entry['module'])],
+                                cwd=root, capture_output=True, text=True)
+        lines = result.stdout.strip().splitlines()
+        cost = f"{float(lines[-1]):.1f}ms" if result.returncode == 0 and lines else "failed"
+        print(f"{type_key:<16} {entry['module']:<34} {cost:>12}")
+    print("For a per-dependency breakdown run: python -X importtime -c 'import widgets.<name>_widget'")
@@ -1,3 +1,4 @@
+import math
 from abc import ABC, abstractmethod
 
 class BaseWidget(ABC):
@@ -29,6 +30,7 @@ class BaseWidget(ABC):
         self.enable_logging = config.get('enable_logging', self.DEFAULT_ENABLE_LOGGING)
 
         self.config = config # Store the full config for widget-specific use
+        self._invalid_config_warned = {} # Option name -> repr of the invalid value last warned about
         self.global_context = global_context if global_context is not None else {}
 
     def reconfigure(self):
@@ -47,6 +49,71 @@ class BaseWidget(ABC):
         # Note: self.config itself is assumed to be updated by the caller before calling reconfigure.
         # self.global_context is also updated by the caller.
 
+    def close(self):
+        """
+        Called when the instance is discarded (screen switch, layout change). Widgets that
+        subscribe to providers release their subscriptions here. The default does nothing.
+        """
+        pass
+
+    # --- Config parsing: config can come from the PATCH API or a hot-reloaded file, so never raise ---
+
+    def _config_number(self, name: str, default, minimum=None, cast=int):
+        """
+        Config option `name` as a finite number of type `cast` (int or float), at least `minimum`.
+        A missing, empty or unparseable value gives `default`, with a warning (once per value, as
+        reconfigure() runs every frame) unless it was empty.
+        """
+        value = self.config.get(name, default)
+        try:
+            number = cast(value)
+            if not math.isfinite(number):
+                raise ValueError(value)
+        except (TypeError, ValueError):
+            if value not in ('', None) and self._invalid_config_warned.get(name) != repr(value):
+                self._invalid_config_warned[name] = repr(value)
+                self._log("WARNING", f"Invalid {name} '{value}'. Defaulting to {default}.")
+            number = default
+        return number if minimum is None else max(minimum, number)
+
+    def _config_str(self, name: str, default: str = '') -> str:
+        """Config option `name` as a stripped string; None gives `default`."""
+        value = self.config.get(name, default)
+        return str(value).strip() if value is not None else default
+
+    # --- Helpers for widgets that render their own pixel maps ---
+
+    FONT_NAMES = {'small': '3x5', 'medium': '5x7', 'large': '7x9', 'xl': 'xl'}
+
+    def _hex_to_rgb(self, hex_color: str, default=(255, 255, 255)) -> tuple[int, int, int]:
+        """'#RRGGBB' or '#RGB' as an (r, g, b) tuple, or `default` if it can't be parsed."""
+        hex_color = (hex_color or '').lstrip('#')
+        try:
+            if len(hex_color) == 6:
+                return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
+            elif len(hex_color) == 3: # Shorthand e.g. #RGB
+                return tuple(int(hex_color[i:i+1]*2, 16) for i in (0, 1, 2))
+        except ValueError:
+            pass
+        return default
+
+    def _get_font_name(self):
+        """The bitmap font for the widget's font_size option, or None if it names no font."""
+        return self.FONT_NAMES.get(getattr(self, 'font_size', None))
+
+    @staticmethod
+    def _blit_mask(pixel_map, mask_rows, x_offset, y_offset, color_rgb):
+        """Copies the lit pixels of a 1-bit text mask into pixel_map, clipped to its bounds."""
+        map_height = len(pixel_map)
+        map_width = len(pixel_map[0]) if pixel_map else 0
+        for r_idx, mask_row in enumerate(mask_rows):
+            if not 0 <= y_offset + r_idx < map_height:
+                continue
+            dest_row = pixel_map[y_offset + r_idx]
+            for c_idx, lit in enumerate(mask_row):
+                if lit and 0 <= x_offset + c_idx < map_width:
+                    dest_row[x_offset + c_idx] = color_rgb
+
     def _log(self, level: str, message: str):
         """Helper method for logging. Prints if self.enable_logging is True."""
         if self.enable_logging:
@@ -0,0 +1,313 @@
+import os
+import math
+import time
+from .base_widget import BaseWidget
+import primitives
+from timeseries import series_recorder, StreamingLTTB, RING_CAPACITY # Shared background series recording
+
+class GraphWidget(BaseWidget):
+    """
+    Plots a time series over a time window, one column per time bucket. Samples are recorded by
+    the shared series recorder (so history survives screen switches) and downsampled to the
+    graph width with streaming Largest-Triangle-Three-Buckets, which keeps the peaks and dips a
+    plain average would flatten. The frame is only redrawn when the downsampled points change.
+    """
+
+    DEFAULT_GRAPH_WIDTH = 64
+    DEFAULT_GRAPH_HEIGHT = 16
+    DEFAULT_WINDOW_MINUTES = 60
+    DEFAULT_LATITUDE = 54.61
+    DEFAULT_LONGITUDE = -1.29
+    MIN_RECORD_INTERVAL_S = 1.0
+    UNITS = {'cpu': '%', 'memory': '%', 'temperature': 'C', 'frequency': 'M', 'frame_time': 'ms'}
+
+    def __init__(self, config: dict, global_context: dict = None):
+        super().__init__(config, global_context)
+        self.downsampler = None
+        self._series_state = None # (source key, bucket_s, buckets) the downsampler was built for
+        self._seen_total = 0      # How many of the ring's points the downsampler has consumed
+        self._rendered_key = None
+        self._rendered_content = None
+        self._read_config()
+
+    def reconfigure(self):
+        super().reconfigure()
+        self._read_config()
+
+    def _read_config(self):
+        self.source = self.config.get('source', 'system')
+        self.metric = self.config.get('metric', 'cpu')
+        self.direction = self.config.get('direction', 'rx')
+        self.interface = self._config_str('interface')
+        self.file_path = self._config_str('file_path')
+        self.latitude = self._config_number('latitude', self.DEFAULT_LATITUDE, cast=float)
+        self.longitude = self._config_number('longitude', self.DEFAULT_LONGITUDE, cast=float)
+        self.units = self.config.get('units', 'metric')
+        self.graph_width = self._config_number('graph_width', self.DEFAULT_GRAPH_WIDTH, 2)
+        self.graph_height = self._config_number('graph_height', self.DEFAULT_GRAPH_HEIGHT, 2)
+        self.window_minutes = self._config_number('window_minutes', self.DEFAULT_WINDOW_MINUTES, 1.0, cast=float)
+        self.y_min = self._parse_optional_float(self.config.get('y_min', ''))
+        self.y_max = self._parse_optional_float(self.config.get('y_max', ''))
+        self.style = self.config.get('style', 'line')
+        self.show_value = self.config.get('show_value', True)
+        self.font_size = self.config.get('font_size', 'small')
+
+    @staticmethod
+    def _parse_optional_float(value):
+        try:
+            number = float(value) if str(value).strip() != '' else None
+        except (TypeError, ValueError):
+            return None
+        return number if number is None or math.isfinite(number) else None
+
+    def _source_key(self):
+        if self.source == 'network':
+            return ('network', self.direction, self.interface)
+        if self.source == 'frame_time':
+            return ('frame_time',)
+        if self.source == 'weather':
+            return ('weather', round(self.latitude, 2), round(self.longitude, 2), self.units)
+        if self.source == 'file':
+            return ('file', os.path.abspath(self.file_path)) if self.file_path else None
+        return ('system', self.metric)
+
+    def _format_value(self, value: float) -> str:
+        unit = self.UNITS.get(self.metric if self.source == 'system' else self.source, '')
+        magnitude = abs(value)
+        if magnitude >= 1e6:
+            return f"{value / 1e6:.1f}M{unit}"
+        if magnitude >= 1e4:
+            return f"{value / 1e3:.0f}k{unit}"
+        if magnitude < 10 and value != int(value):
+            return f"{value:.1f}{unit}"
+        return f"{value:.0f}{unit}"
+
+    def _update_series(self, now_wall: float):
+        """Feeds points recorded since the last frame into the downsampler, rebuilding it if the layout changed."""
+        key = self._source_key()
+        if key is None:
+            return None
+        window_s = self.window_minutes * 60
+        # Enough raw points per bucket for LTTB to choose from, without outrunning the ring
+        record_interval = max(self.MIN_RECORD_INTERVAL_S, window_s / RING_CAPACITY)
+        series = series_recorder.track(key, record_interval)
+
+        bucket_s = window_s / self.graph_width
+        state = (key, bucket_s, self.graph_width)
+        if state != self._series_state:
+            self.downsampler = StreamingLTTB(bucket_s, self.graph_width)
+            self._series_state = state
+            self._seen_total = 0
+        with series.lock:
+            new_points, self._seen_total = series.ring.since(self._seen_total)
+        for t, v in new_points:
+            self.downsampler.add(t, v)
+        return int(now_wall // bucket_s)
+
+    def get_content(self):
+        now_bucket = self._update_series(time.time())
+        if now_bucket is None:
+            return "No file"
+        first_bucket = now_bucket - self.graph_width + 1
+        points = [(bucket - first_bucket, v) for bucket, _, v in self.downsampler.points() if bucket >= first_bucket]
+
+        render_key = (tuple(points), self.graph_height, self.y_min, self.y_max, self.style, self.show_value,
+                      self.font_size, self.color)
+        if render_key != self._rendered_key:
+            self._rendered_content = self._render(points)
+            self._rendered_key = render_key
+        return self._rendered_content
+
+    def _render(self, points):
+        width, height = self.graph_width, self.graph_height
+        pixel_map = [[(0, 0, 0)] * width for _ in range(height)]
+        line_rgb = self._hex_to_rgb(self.color)
+        if points:
+            values = [v for _, v in points]
+            low = self.y_min if self.y_min is not None else min(values)
+            high = self.y_max if self.y_max is not None else max(values)
+            if high <= low:
+                low, high = low - 1.0, low + 1.0
+            def to_y(value):
+                fraction = min(1.0, max(0.0, (value - low) / (high - low)))
+                return round((1.0 - fraction) * (height - 1))
+            plotted = [(x, to_y(v)) for x, v in points]
+
+            if self.style == 'area':
+                fill_rgb = tuple(c // 3 for c in line_rgb)
+                for (x0, y0), (x1, y1) in zip(plotted, plotted[1:]):
+                    for x in range(x0, x1):
+                        y = round(y0 + (y1 - y0) * (x - x0) / (x1 - x0))
+                        primitives.fill_rect(pixel_map, x, y, 1, height - y, fill_rgb)
+                x_last, y_last = plotted[-1]
+                primitives.fill_rect(pixel_map, x_last, y_last, 1, height - y_last, fill_rgb)
+            if len(plotted) == 1:
+                primitives.fill_rect(pixel_map, plotted[0][0], plotted[0][1], 1, 1, line_rgb)
+            for (x0, y0), (x1, y1) in zip(plotted, plotted[1:]):
+                primitives.draw_line(pixel_map, x0, y0, x1, y1, line_rgb)
+
+            render_mask = self.global_context.get('render_text_mask')
+            font = self._get_font_name()
+            if self.show_value and render_mask and font:
+                _, _, text_rows = render_mask(self._format_value(values[-1]), font)
+                self._blit_mask(pixel_map, text_rows, 0, 0, line_rgb)
+
+        return {
+            'type': 'pixel_map',
+            'width': width,
+            'height': height,
+            'data': pixel_map
+        }
+
+    @staticmethod
+    def get_config_options() -> list:
+        options = BaseWidget.get_config_options()
+        options.extend([
+            {
+                'name': 'source',
+                'label': 'Data Source',
+                'type': 'select',
+                'default': 'system',
+                'options': [
+                    {'value': 'system', 'label': 'System metric'},
+                    {'value': 'network', 'label': 'Network throughput (Linux)'},
+                    {'value': 'frame_time', 'label': 'Display frame time (ms)'},
+                    {'value': 'weather', 'label': 'Outdoor temperature (Open-Meteo)'},
+                    {'value': 'file', 'label': 'Local file'}
+                ]
+            },
+            {
+                'name': 'metric',
+                'label': 'Metric',
+                'type': 'select',
+                'default': 'cpu',
+                'options': [
+                    {'value': 'cpu', 'label': 'CPU (%)'},
+                    {'value': 'memory', 'label': 'Memory (%)'},
+                    {'value': 'temperature', 'label': 'CPU temperature (°C)'},
+                    {'value': 'frequency', 'label': 'CPU frequency (MHz)'}
+                ],
+                'condition': {'field': 'source', 'value': 'system', 'action': 'show'}
+            },
+            {
+                'name': 'direction',
+                'label': 'Direction',
+                'type': 'select',
+                'default': 'rx',
+                'options': [
+                    {'value': 'rx', 'label': 'Receive (bytes/s)'},
+                    {'value': 'tx', 'label': 'Transmit (bytes/s)'}
+                ],
+                'condition': {'field': 'source', 'value': 'network', 'action': 'show'}
+            },
+            {
+                'name': 'interface',
+                'label': 'Interface',
+                'type': 'text',
+                'default': '',
+                'placeholder': 'e.g. wlan0 (blank = auto)',
+                'condition': {'field': 'source', 'value': 'network', 'action': 'show'}
+            },
+            {
+                'name': 'latitude',
+                'label': 'Latitude',
+                'type': 'number',
+                'default': GraphWidget.DEFAULT_LATITUDE,
+                'condition': {'field': 'source', 'value': 'weather', 'action': 'show'}
+            },
+            {
+                'name': 'longitude',
+                'label': 'Longitude',
+                'type': 'number',
+                'default': GraphWidget.DEFAULT_LONGITUDE,
+                'condition': {'field': 'source', 'value': 'weather', 'action': 'show'}
+            },
+            {
+                'name': 'units',
+                'label': 'Units',
+                'type': 'select',
+                'default': 'metric',
+                'options': [
+                    {'value': 'metric', 'label': 'Celsius'},
+                    {'value': 'imperial', 'label': 'Fahrenheit'}
+                ],
+                'condition': {'field': 'source', 'value': 'weather', 'action': 'show'}
+            },
+            {
+                'name': 'file_path',
+                'label': 'File Path',
+                'type': 'text',
+                'default': '',
+                'placeholder': '/home/pi/sensor.csv',
+                'description': 'Text file with one "value" or "epoch_seconds,value" per line. New lines are picked up as they are appended.',
+                'condition': {'field': 'source', 'value': 'file', 'action': 'show'}
+            },
+            {
+                'name': 'window_minutes',
+                'label': 'Time Window (minutes)',
+                'type': 'number',
+                'default': GraphWidget.DEFAULT_WINDOW_MINUTES,
+                'min': 1,
+                'max': 1440,
+                'description': 'How much history the graph spans, e.g. 1440 for 24 hours. Each column covers window / width.'
+            },
+            {
+                'name': 'graph_width',
+                'label': 'Graph Width (pixels)',
+                'type': 'number',
+                'default': GraphWidget.DEFAULT_GRAPH_WIDTH,
+                'min': 8,
+                'max': 128
+            },
+            {
+                'name': 'graph_height',
+                'label': 'Graph Height (pixels)',
+                'type': 'number',
+                'default': GraphWidget.DEFAULT_GRAPH_HEIGHT,
+                'min': 4,
+                'max': 64
+            },
+            {
+                'name': 'y_min',
+                'label': 'Y Axis Minimum',
+                'type': 'text',
+                'default': '',
+                'placeholder': 'blank = auto'
+            },
+            {
+                'name': 'y_max',
+                'label': 'Y Axis Maximum',
+                'type': 'text',
+                'default': '',
+                'placeholder': 'blank = auto'
+            },
+            {
+                'name': 'style',
+                'label': 'Style',
+                'type': 'select',
+                'default': 'line',
+                'options': [
+                    {'value': 'line', 'label': 'Line'},
+                    {'value': 'area', 'label': 'Filled area'}
+                ]
+            },
+            {
+                'name': 'show_value',
+                'label': 'Show Latest Value',
+                'type': 'checkbox',
+                'default': True
+            },
+            {
+                'name': 'font_size',
+                'label': 'Font Size',
+                'type': 'select',
+                'default': 'small',
+                'options': [
+                    {'value': 'small', 'label': 'Small (3x5)'},
+                    {'value': 'medium', 'label': 'Medium (5x7)'},
+                    {'value': 'large', 'label': 'Large (7x9)'},
+                    {'value': 'xl', 'label': 'Extra Large (9x13)'}
+                ]
+            }
+        ])
+        return options
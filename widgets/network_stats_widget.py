@@ -3,15 +3,22 @@ import re
 import sys
 from datetime import datetime, timedelta
 from .base_widget import BaseWidget
+from net_collector import net_collector, net_sampler # Subprocess-free /proc, /sys and ioctl reads on Linux
 
 class NetworkStatsWidget(BaseWidget):
-    """Displays various network statistics like SSID or IP address, based on the OS."""
+    """Displays various network statistics like SSID, IP address or live throughput, based on the OS."""
+
+    DEFAULT_SPARKLINE_WIDTH = 32
+    DEFAULT_SPARKLINE_HEIGHT = 8
+    DEFAULT_TX_COLOR = "#00A0FF"
+    RATE_TEXT_GAP = 3 # Pixels between the rx and tx rate text
 
     def __init__(self, config: dict, global_context: dict = None):
         super().__init__(config, global_context)
         self.os_override = self.config.get('os_override', 'auto')
         self.font_size = self.config.get('font_size', 'medium')
         self.stat_to_display = self.config.get('stat_to_display', 'ssid')
+        self._read_throughput_config()
         self._log("INFO", f"NetworkStatsWidget initialized with os_override: {self.os_override}, font_size: {self.font_size}, stat: {self.stat_to_display}")
 
         # Cache variables
@@ -27,6 +34,79 @@ class NetworkStatsWidget(BaseWidget):
         self._cached_uptime = None
         self._last_uptime_check_time = None
 
+    def reconfigure(self):
+        super().reconfigure()
+        self.os_override = self.config.get('os_override', 'auto')
+        self.font_size = self.config.get('font_size', 'medium')
+        self.stat_to_display = self.config.get('stat_to_display', 'ssid')
+        self._read_throughput_config()
+
+    def _read_throughput_config(self):
+        self.interface = self._config_str('interface')
+        self.sparkline_width = self._config_number('sparkline_width', self.DEFAULT_SPARKLINE_WIDTH, 1)
+        self.sparkline_height = self._config_number('sparkline_height', self.DEFAULT_SPARKLINE_HEIGHT, 1)
+        self.tx_color = self.config.get('tx_color', self.DEFAULT_TX_COLOR)
+        if self.stat_to_display == 'throughput':
+            net_sampler.start() # Shared by all throughput widgets; no-op if already running
+
+    @staticmethod
+    def _format_rate(bytes_per_second: float) -> str:
+        """Compact byte rate, e.g. 850B, 1.2K, 34K, 5.6M."""
+        value = bytes_per_second
+        for unit in ('B', 'K', 'M', 'G'):
+            if value < 1000 or unit == 'G':
+                if unit == 'B':
+                    return f"{int(value)}B"
+                return f"{value:.1f}{unit}" if value < 10 else f"{int(value)}{unit}"
+            value /= 1000.0
+
+    def _get_throughput_content(self):
+        """Renders the current rx/tx rates above a sparkline of recent samples from the shared sampler."""
+        interface = self.interface or net_sampler.default_interface()
+        if not interface:
+            return "No IF"
+        history = net_sampler.get_history(interface, self.sparkline_width)
+        rx_rate, tx_rate = history[-1] if history else (0.0, 0.0)
+        rx_text, tx_text = self._format_rate(rx_rate), self._format_rate(tx_rate)
+
+        render_mask = self.global_context.get('render_text_mask')
+        if not render_mask:
+            return f"{rx_text} {tx_text}"
+
+        font = self._get_font_name()
+        rx_rgb = self._hex_to_rgb(self.color)
+        tx_rgb = self._hex_to_rgb(self.tx_color, default=(0, 160, 255))
+        rx_w, text_h, rx_rows = render_mask(rx_text, font)
+        tx_w, _, tx_rows = render_mask(tx_text, font)
+
+        width = max(self.sparkline_width, rx_w + self.RATE_TEXT_GAP + tx_w)
+        height = text_h + 1 + self.sparkline_height
+        pixel_map = [[(0, 0, 0)] * width for _ in range(height)]
+        self._blit_mask(pixel_map, rx_rows, 0, 0, rx_rgb)
+        self._blit_mask(pixel_map, tx_rows, rx_w + self.RATE_TEXT_GAP, 0, tx_rgb)
+
+        # Sparkline: rx as bars in the widget colour, tx as a line of dots, both scaled to the window's peak
+        peak = max((max(sample) for sample in history), default=0)
+        if peak > 0:
+            baseline = height - 1
+            first_x = self.sparkline_width - len(history) # Newest sample at the right edge
+            rx_bar_rgb = tuple(c // 2 for c in rx_rgb)
+            for i, (rx, tx) in enumerate(history):
+                x = first_x + i
+                rx_h = round(rx / peak * self.sparkline_height)
+                for y in range(baseline - rx_h + 1, baseline + 1):
+                    pixel_map[y][x] = rx_bar_rgb
+                if tx > 0:
+                    tx_h = max(1, round(tx / peak * self.sparkline_height))
+                    pixel_map[baseline - tx_h + 1][x] = tx_rgb
+
+        return {
+            'type': 'pixel_map',
+            'width': width,
+            'height': height,
+            'data': pixel_map
+        }
+
     def _get_wifi_interface_macos(self) -> str | None:
         """Helper to find the active Wi-Fi interface name on macOS."""
         try:
@@ -204,8 +284,13 @@ class NetworkStatsWidget(BaseWidget):
 
     def _get_wifi_interface_linux(self) -> str | None:
         """Helper to find the active Wi-Fi interface name on Linux (e.g., wlan0)."""
+        interface_name = net_collector.get_wifi_interface()
+        if interface_name:
+            self._log("DEBUG", f"Found Linux Wi-Fi interface via /proc and /sys: {interface_name}")
+            return interface_name
+
         try:
-            # Try with `iwgetid` first as it directly gives the interface if connected
+            # Fallback: `iwgetid` prints the interface name when it is connected
             process = subprocess.run(['iwgetid'], capture_output=True, text=True, check=False, timeout=2)
             if process.returncode == 0 and process.stdout.strip():
                 interface_name = process.stdout.split(' ', 1)[0].strip()
@@ -231,7 +316,14 @@ class NetworkStatsWidget(BaseWidget):
             return None
 
     def _get_ssid_linux(self) -> str:
-        """Fetches SSID on Linux using iwgetid or nmcli."""
+        """Fetches SSID on Linux via the wireless-extensions ioctl, falling back to iwgetid or nmcli."""
+        ssid = net_collector.get_ssid()
+        if ssid:
+            return ssid
+        if ssid == "":
+            self._log("INFO", "Linux Wi-Fi interface is not associated with a network.")
+            return "Not Connected"
+
         try:
             process = subprocess.run(['iwgetid', '-r'], capture_output=True, text=True, check=True, timeout=3)
             ssid = process.stdout.strip()
@@ -249,7 +341,12 @@ class NetworkStatsWidget(BaseWidget):
             return "Err:LinuxSSID"
 
     def _get_ip_linux(self) -> str:
-        """Fetches IP address on Linux."""
+        """Fetches IP address on Linux, from the default route's source address if possible."""
+        ip_address = net_collector.get_ip()
+        if ip_address:
+            self._log("DEBUG", f"Linux IP address found via socket: {ip_address}")
+            return ip_address
+
         try:
             # hostname -I gets all IPs, space separated. We take the first one.
             process = subprocess.run(['hostname', '-I'], capture_output=True, text=True, check=True, timeout=3)
@@ -290,10 +387,28 @@ class NetworkStatsWidget(BaseWidget):
             self._log("ERROR", f"Unexpected error fetching Linux IP: {e}")
             return "Err:IPGen"
 
+    def _format_uptime_seconds(self, uptime_seconds: float) -> str:
+        days = int(uptime_seconds // (24 * 3600))
+        uptime_seconds %= (24 * 3600)
+        hours = int(uptime_seconds // 3600)
+        uptime_seconds %= 3600
+        minutes = int(uptime_seconds // 60)
+        
+        parts = []
+        if days > 0: parts.append(f"{days}d")
+        if hours > 0: parts.append(f"{hours}h")
+        if minutes > 0 or (days == 0 and hours == 0) : parts.append(f"{minutes}m") # Show minutes if uptime is < 1h
+        
+        return f"Up {', '.join(parts)}" if parts else "Up <1m"
+
     def _get_uptime_linux(self) -> str:
-        """Fetches system uptime on Linux, preferring 'uptime -p'."""
+        """Fetches system uptime on Linux from /proc/uptime, falling back to 'uptime -p'."""
+        uptime_seconds = net_collector.get_uptime_seconds()
+        if uptime_seconds is not None:
+            return self._format_uptime_seconds(uptime_seconds)
+
+        self._log("WARNING", "Reading /proc/uptime failed. Trying 'uptime -p'.")
         try:
-            # Try 'uptime -p' for pretty format first
             process = subprocess.run(['uptime', '-p'], capture_output=True, text=True, check=True, timeout=3)
             # Example output: "up 2 hours, 7 minutes"
             # Remove "up " prefix
@@ -302,27 +417,8 @@ class NetworkStatsWidget(BaseWidget):
                 uptime_str = uptime_str[3:]
             return f"Up {uptime_str}"
         except (subprocess.CalledProcessError, FileNotFoundError, subprocess.TimeoutExpired) as e_p:
-            self._log("WARNING", f"Fetching uptime with 'uptime -p' failed: {e_p}. Trying /proc/uptime.")
-            try:
-                with open('/proc/uptime', 'r') as f:
-                    uptime_seconds = float(f.readline().split()[0])
-                
-                days = int(uptime_seconds // (24 * 3600))
-                uptime_seconds %= (24 * 3600)
-                hours = int(uptime_seconds // 3600)
-                uptime_seconds %= 3600
-                minutes = int(uptime_seconds // 60)
-                
-                parts = []
-                if days > 0: parts.append(f"{days}d")
-                if hours > 0: parts.append(f"{hours}h")
-                if minutes > 0 or (days == 0 and hours == 0) : parts.append(f"{minutes}m") # Show minutes if uptime is < 1h
-                
-                return f"Up {', '.join(parts)}" if parts else "Up <1m"
-
-            except Exception as e_proc:
-                self._log("ERROR", f"Error fetching Linux uptime from /proc/uptime: {e_proc}")
-                return "Err:UptimeProc"
+            self._log("ERROR", f"Fetching uptime with 'uptime -p' failed: {e_p}")
+            return "Err:UptimeProc"
         except Exception as e:
             self._log("ERROR", f"Unexpected error fetching Linux uptime: {e}")
             return "Err:UptimeGen"
@@ -366,7 +462,12 @@ class NetworkStatsWidget(BaseWidget):
             return "Err:RSSIGen"
 
     def _get_rssi_linux(self) -> str:
-        """Fetches RSSI (signal strength) on Linux using iwgetid or iwconfig."""
+        """Fetches RSSI (signal strength) on Linux from /proc/net/wireless, falling back to iwgetid or iwconfig."""
+        rssi = net_collector.get_rssi()
+        if rssi is not None:
+            self._log("DEBUG", f"Linux RSSI found via /proc/net/wireless: {rssi}")
+            return f"{rssi} dBm"
+
         wifi_interface = self._get_wifi_interface_linux()
         if not wifi_interface:
             self._log("WARNING", "No Wi-Fi interface found for RSSI on Linux.")
@@ -422,6 +523,10 @@ class NetworkStatsWidget(BaseWidget):
         """Returns the selected network statistic based on the OS, using a cache."""
         now = datetime.now()
 
+        if self.stat_to_display == 'throughput':
+            # Live values from the shared sampler; never cached
+            return self._get_throughput_content()
+
         if self.stat_to_display == 'ssid':
             if self._cached_ssid and self._last_ssid_check_time and (now - self._last_ssid_check_time < self._cache_duration):
                 self._log("DEBUG", f"Returning cached SSID: {self._cached_ssid}")
@@ -503,10 +608,47 @@ class NetworkStatsWidget(BaseWidget):
                     {'value': 'ssid', 'label': 'SSID (Network Name)'},
                     {'value': 'ip', 'label': 'IP Address'},
                     {'value': 'uptime', 'label': 'System Uptime'},
-                    {'value': 'rssi', 'label': 'RSSI (Signal Strength)'}
+                    {'value': 'rssi', 'label': 'RSSI (Signal Strength)'},
+                    {'value': 'throughput', 'label': 'Throughput (rx/tx rate + sparkline)'}
                 ],
                 'description': 'Choose which network statistic to display.'
             },
+            {
+                'name': 'interface',
+                'label': 'Interface (Throughput)',
+                'type': 'text',
+                'default': '',
+                'placeholder': 'e.g. wlan0 (blank = auto)',
+                'description': 'Network interface to monitor. Blank uses the Wi-Fi interface, or the busiest one. Linux only.',
+                'condition': {'field': 'stat_to_display', 'value': 'throughput', 'action': 'show'}
+            },
+            {
+                'name': 'sparkline_width',
+                'label': 'Sparkline Width (samples)',
+                'type': 'number',
+                'default': NetworkStatsWidget.DEFAULT_SPARKLINE_WIDTH,
+                'min': 8,
+                'max': 64,
+                'description': 'One column per second of history.',
+                'condition': {'field': 'stat_to_display', 'value': 'throughput', 'action': 'show'}
+            },
+            {
+                'name': 'sparkline_height',
+                'label': 'Sparkline Height (pixels)',
+                'type': 'number',
+                'default': NetworkStatsWidget.DEFAULT_SPARKLINE_HEIGHT,
+                'min': 2,
+                'max': 32,
+                'condition': {'field': 'stat_to_display', 'value': 'throughput', 'action': 'show'}
+            },
+            {
+                'name': 'tx_color',
+                'label': 'Transmit Color',
+                'type': 'color',
+                'default': NetworkStatsWidget.DEFAULT_TX_COLOR,
+                'description': 'Colour of the tx rate and its sparkline dots; rx uses the widget colour.',
+                'condition': {'field': 'stat_to_display', 'value': 'throughput', 'action': 'show'}
+            },
             {
                 'name': 'os_override',
                 'label': 'Operating System',
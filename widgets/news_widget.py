@@ -1,17 +1,21 @@
-import datetime
 import time
-import feedparser # For RSS parsing
 from .base_widget import BaseWidget
-import requests # feedparser might use it or have its own http client
-import threading # Added for background fetching
+import threading
+from feed_ingest import parse_feed_spec, single_feed, DEFAULT_TOTAL_TIMEOUT_S, DEFAULT_MAX_BYTES # Bounded streaming RSS ingestion
+from providers import provider_registry # Headlines are fetched and cached by a shared NewsProvider
 
 class NewsWidget(BaseWidget):
-    """Displays scrolling news headlines fetched from an RSS feed."""
+    """
+    Displays scrolling news headlines fetched from one or more RSS feeds.
+    The headlines come from a NewsProvider subscription; this widget only lays out and scrolls them.
+    """
 
     DEFAULT_RSS_URL = "http://feeds.bbci.co.uk/news/rss.xml"  # BBC News top stories
     DEFAULT_UPDATE_INTERVAL_MINS = 5
     DEFAULT_NUM_HEADLINES = 5
     DEFAULT_SCROLL_INTERVAL_MS = 40 # Reduced from 50ms for smoother animation (25px/sec)
+    DEFAULT_FETCH_TIMEOUT_SECONDS = DEFAULT_TOTAL_TIMEOUT_S
+    DEFAULT_MAX_FEED_KB = DEFAULT_MAX_BYTES // 1024
     HEADLINE_SEPARATOR = "  •••  " 
     SCROLL_PADDING = "     " 
     INITIAL_LOADING_MESSAGE = "Loading news..."
@@ -20,14 +24,21 @@ class NewsWidget(BaseWidget):
         super().__init__(config, global_context)
         
         self.rss_url = self.config.get('rss_url', self.DEFAULT_RSS_URL)
+        self.feeds_spec = self.config.get('feeds', '')
         self.update_interval_minutes = self.config.get('update_interval_minutes', self.DEFAULT_UPDATE_INTERVAL_MINS)
         self.num_headlines = self.config.get('num_headlines', self.DEFAULT_NUM_HEADLINES)
         self.font_size = self.config.get('font_size', "medium")
         self.scroll_interval_ms = self.config.get('scroll_interval_ms', self.DEFAULT_SCROLL_INTERVAL_MS)
         self.scroll_interval_seconds = self.scroll_interval_ms / 1000.0
+        self.fetch_timeout_seconds = self.config.get('fetch_timeout_seconds', self.DEFAULT_FETCH_TIMEOUT_SECONDS)
+        self.max_feed_kb = self.config.get('max_feed_kb', self.DEFAULT_MAX_FEED_KB)
+
+        self.feeds = self._get_feed_list()
 
         self.headlines_cache = []
-        self.last_fetch_time = 0
+        self.headlines_version = 0 # Bumped whenever headlines_cache changes
+        self._built_state = None # (headlines_version, font, window width) the scroll tape was last built for
+        self.last_fetch_stats = None # Per-feed bytes read, parse time and truncation of the most recent fetch
         self.current_scroll_text = self.INITIAL_LOADING_MESSAGE # Initial state
         self.current_pixel_offset = 0
         self.fractional_pixel_offset = 0.0  # Use floating point for sub-pixel accuracy
@@ -35,18 +46,16 @@ class NewsWidget(BaseWidget):
         self.text_is_scrollable = False
         self.looping_point_pixels = 0 
         self.time_of_last_pixel_shift = time.monotonic()
-        self.char_widths_cache = {} # For caching individual character widths
+        self.tape_rows = None # Pre-rendered 1-bit rows of the scroll tape, see _build_and_measure_scroll_text
+        self.tape_width = 0
+        self.tape_height = 0
 
-        # Threading attributes
-        self.data_lock = threading.Lock()
-        self.is_fetching = False
-        self.fetch_thread = None
-        
-        self._prev_rss_url = self.rss_url
-        self._prev_num_headlines = self.num_headlines
+        # Re-entrant: reconfigure() holds the lock while it resubscribes and rebuilds the text
+        self.data_lock = threading.RLock()
+        self.subscription = None
+        self._subscription_state = None # (feeds, num_headlines, interval) the subscription was made for
 
-        # Initial fetch and build
-        self._trigger_fetch_if_needed(force_fetch=True) # Start initial fetch
+        self._subscribe() # Picks up headlines the provider already has, otherwise it fetches now
         self._build_and_measure_scroll_text() # Build with loading/empty message initially
         
         # Debug info for smooth scrolling setup
@@ -57,19 +66,24 @@ class NewsWidget(BaseWidget):
         
         with self.data_lock: # Protect config reads and state changes
             old_rss_url = self.rss_url 
+            old_feeds_spec = self.feeds_spec
             old_num_headlines = self.num_headlines
             old_font_size = self.font_size
             old_scroll_interval_ms = self.scroll_interval_ms
 
             self.rss_url = self.config.get('rss_url', self.DEFAULT_RSS_URL)
+            self.feeds_spec = self.config.get('feeds', '')
             self.update_interval_minutes = self.config.get('update_interval_minutes', self.DEFAULT_UPDATE_INTERVAL_MINS)
             self.num_headlines = self.config.get('num_headlines', self.DEFAULT_NUM_HEADLINES)
             self.font_size = self.config.get('font_size', "medium")
             self.scroll_interval_ms = self.config.get('scroll_interval_ms', self.DEFAULT_SCROLL_INTERVAL_MS)
             self.scroll_interval_seconds = self.scroll_interval_ms / 1000.0
             self.pixels_per_second = 1000.0 / self.scroll_interval_ms  # Update pixels per second for smooth scrolling
+            self.fetch_timeout_seconds = self.config.get('fetch_timeout_seconds', self.DEFAULT_FETCH_TIMEOUT_SECONDS)
+            self.max_feed_kb = self.config.get('max_feed_kb', self.DEFAULT_MAX_FEED_KB)
 
-            config_affecting_fetch_changed = (old_rss_url != self.rss_url or old_num_headlines != self.num_headlines)
+            config_affecting_fetch_changed = (old_rss_url != self.rss_url or old_feeds_spec != self.feeds_spec or
+                                              old_num_headlines != self.num_headlines)
             font_size_changed = old_font_size != self.font_size
             scroll_speed_changed = old_scroll_interval_ms != self.scroll_interval_ms
 
@@ -77,16 +91,18 @@ class NewsWidget(BaseWidget):
 
             if config_affecting_fetch_changed:
                 self._log("INFO", "News widget fetch-related configuration changed.")
-                self._trigger_fetch_if_needed(force_fetch=True)
+                self.feeds = self._get_feed_list()
                 rebuild_text_and_reset_scroll = True 
+            # Resubscribe with the current feeds; a no-op unless the feeds, refresh interval or fetch limits changed
+            self._subscribe()
             
             if font_size_changed: # If only font size changed, or also if fetch config changed
                 self._log("INFO", "Font size changed for news widget.")
                 rebuild_text_and_reset_scroll = True
 
             if rebuild_text_and_reset_scroll:
-                # Always rebuild. If fetching, it will use current cache (or loading message).
-                # When fetch completes, update_scroll_state will rebuild again if data changed.
+                # Always rebuild. If the provider is fetching, it will use current cache (or loading message).
+                # When the fetch completes, update_scroll_state will rebuild again if data changed.
                 self._build_and_measure_scroll_text() 
                 self.current_pixel_offset = 0
                 self.fractional_pixel_offset = 0.0
@@ -94,136 +110,125 @@ class NewsWidget(BaseWidget):
             elif scroll_speed_changed:
                 self._log("DEBUG", f"Scroll speed changed from {old_scroll_interval_ms}ms to {self.scroll_interval_ms}ms")
                 self.time_of_last_pixel_shift = time.monotonic()
-            
-            self._prev_rss_url = self.rss_url
-            self._prev_num_headlines = self.num_headlines
 
 
-    def _fetch_news_background(self):
-        """Fetches news data in a background thread and updates cache."""
-        local_rss_url = self.rss_url # Use consistent value for this fetch run
-        local_num_headlines = self.num_headlines
+    def _get_feed_list(self) -> list:
+        """Returns the configured feeds, falling back to the single rss_url if no multi-feed spec is set."""
+        feeds = parse_feed_spec(self.feeds_spec, self.num_headlines)
+        if not feeds:
+            feeds = single_feed(self.rss_url, self.num_headlines) # A plain URL, which may contain ',' or '|'
+        return feeds
 
-        self._log("DEBUG", f"Background news fetch started for {local_rss_url}")
-        
-        new_headlines = []
-        fetch_error = None
-        try:
-            # It's important that feedparser's underlying socket operations have timeouts.
-            # feedparser.parse itself doesn't take a direct timeout argument.
-            # Default timeouts in urllib (often used by feedparser) can be long.
-            # Consider adding a requests wrapper with explicit timeout if feedparser is too slow.
-            feed = feedparser.parse(local_rss_url) 
-            if feed.bozo:
-                fetch_error = f"Error parsing RSS: {str(feed.bozo_exception)}"
-            else:
-                new_headlines = [e.title.strip() for e in feed.entries[:local_num_headlines] if hasattr(e, 'title')]
-        except Exception as e:
-            fetch_error = f"RSS fetch exception: {e}"
-        
+    def _subscribe(self):
+        """(Re)subscribes to the NewsProvider for the configured feeds, headline count and interval."""
+        with self.data_lock:
+            feeds_key = tuple((f['url'], f['weight'], f['limit']) for f in self.feeds)
+            state = (feeds_key, self.num_headlines, self.update_interval_minutes)
+            if self.subscription is None or state != self._subscription_state:
+                if self.subscription is not None:
+                    self.subscription.unsubscribe()
+                params = {'feeds': self.feeds, 'num_headlines': self.num_headlines}
+                refresh_interval = max(1, self.update_interval_minutes) * 60
+                try:
+                    self.subscription = provider_registry.subscribe('news', params, self._on_news_update, refresh_interval)
+                except Exception as e:
+                    self._log("ERROR", f"Could not subscribe to news provider: {e}")
+                    self.subscription = None
+                    return
+                self._subscription_state = state
+                self._log("INFO", f"Subscribed to news provider for {len(self.feeds)} feed(s)")
+                snapshot = self.subscription.snapshot()
+                # The provider may already hold headlines for these feeds (e.g. from another screen)
+                self.headlines_cache = []
+                self.headlines_version += 1
+                if snapshot:
+                    self._on_news_update(snapshot)
+            self.subscription.provider.set_limits(self.fetch_timeout_seconds, int(self.max_feed_kb * 1024))
+
+    def _on_news_update(self, snapshot: dict):
+        """Provider callback, runs on a fetch thread. The next frame rebuilds the tape if the headlines changed."""
+        data = snapshot['data']
         with self.data_lock:
-            if fetch_error:
-                self._log("ERROR", fetch_error)
-                # Potentially set a status like "Fetch Error" if headlines_cache is empty
-                if not self.headlines_cache:
-                    self.headlines_cache = ["Error fetching news."] 
-            elif self.headlines_cache != new_headlines:
+            self.last_fetch_stats = data['stats']
+            new_headlines = data['headlines'] or ["No news headlines found."]
+            if self.headlines_cache != new_headlines:
                 self.headlines_cache = new_headlines
-                if not self.headlines_cache: # If fetch was successful but returned no headlines
-                    self.headlines_cache = ["No news headlines found."]
+                self.headlines_version += 1
                 self._log("INFO", f"News cache updated with {len(self.headlines_cache)} headlines.")
-                # Data changed, so next get_content will trigger a rebuild of scroll text
             else:
-                self._log("DEBUG", "Background news fetch complete, no changes to headlines.")
-
-            self.last_fetch_time = time.monotonic()
-            self.is_fetching = False
-            # After fetch, text might need rebuilding, this will be handled by update_scroll_state
-            # calling _build_and_measure_scroll_text if news_updated_flag is set by _trigger_fetch_if_needed
-
-
-    def _trigger_fetch_if_needed(self, force_fetch=False) -> bool:
-        """
-        Checks if a news fetch is required based on time or force_fetch.
-        If so, and not already fetching, starts a background fetch.
-        Returns True if new data was fetched or fetch was initiated, False otherwise.
-        This version doesn't directly return if data *changed*, but if a fetch *process* occurred.
-        The actual data change is handled by _fetch_news_background updating headlines_cache.
-        """
-        current_time = time.monotonic()
-        news_fetch_initiated_or_needed = False
-
+                self._log("DEBUG", "News provider update, no changes to headlines.")
+
+    def _provider_status(self):
+        """'fetching', 'error' or 'idle' for the subscribed provider, used for the placeholder text."""
+        provider = self.subscription.provider if self.subscription is not None else None
+        if provider is None:
+            return 'idle'
+        if provider.is_fetching or provider.last_attempt_time == 0:
+            return 'fetching'
+        return 'error' if provider.last_error else 'idle'
+
+    def close(self):
         with self.data_lock:
-            time_to_fetch = (self.last_fetch_time == 0) or \
-                            ((current_time - self.last_fetch_time) / 60 >= self.update_interval_minutes)
-
-            if (force_fetch or time_to_fetch) and not self.is_fetching:
-                self.is_fetching = True
-                news_fetch_initiated_or_needed = True
-                self._log("INFO", f"Starting background news fetch for {self.widget_id} (URL: {self.rss_url}). Force: {force_fetch}")
-                
-                # Ensure previous thread is not left hanging if any, though unlikely
-                if self.fetch_thread and self.fetch_thread.is_alive():
-                    self._log("WARNING", "Previous fetch thread still alive. This shouldn't normally happen.")
-                
-                self.fetch_thread = threading.Thread(target=self._fetch_news_background)
-                self.fetch_thread.daemon = True
-                self.fetch_thread.start()
-            elif self.is_fetching:
-                self._log("DEBUG", "News fetch already in progress.")
-            
-        return news_fetch_initiated_or_needed
+            if self.subscription is not None:
+                self.subscription.unsubscribe()
+                self.subscription = None
 
+    def _scroll_text_state(self):
+        """Identifies what the scroll tape depends on; it only needs rebuilding when this changes."""
+        status = self._provider_status() if not self.headlines_cache else None # Placeholder text depends on it
+        return (self.headlines_version, status, self._get_font_name(), self._get_window_width())
 
-    def _get_font_name(self):
-        if self.font_size == 'small': return '3x5'
-        if self.font_size == 'medium': return '5x7'
-        if self.font_size == 'large': return '7x9'
-        if self.font_size == 'xl': return 'xl'
-        return None
+    def _get_window_width(self) -> int:
+        """Visible width in pixels: from the widget's x position to the right edge of the matrix."""
+        return max(0, self.global_context.get('matrix_width', 64) - self.x)
 
     def _build_and_measure_scroll_text(self):
         with self.data_lock: # Protect access to headlines_cache
+            self._built_state = self._scroll_text_state()
             if not self.headlines_cache:
-                self.current_scroll_text = self.INITIAL_LOADING_MESSAGE if self.is_fetching or self.last_fetch_time == 0 else "No news available."
+                status = self._provider_status()
+                if status == 'fetching':
+                    self.current_scroll_text = self.INITIAL_LOADING_MESSAGE
+                elif status == 'error':
+                    self.current_scroll_text = "Error fetching news."
+                else:
+                    self.current_scroll_text = "No news available."
             else:
                 self.current_scroll_text = self.HEADLINE_SEPARATOR.join(self.headlines_cache)
         
-        get_dims = self.global_context.get('get_text_dimensions')
-        matrix_w = self.global_context.get('matrix_width', 64)
+        render_mask = self.global_context.get('render_text_mask')
+        window_w = self._get_window_width()
         font = self._get_font_name()
-        self.char_widths_cache = {} # Clear old cache
+        self.tape_rows = None
 
-        if not get_dims or not font: 
+        if not render_mask or not font: 
             self.text_is_scrollable = False; self.looping_point_pixels = 0; return
 
-        # Populate char_widths_cache for all unique chars in the current scroll text + padding
-        unique_chars = set(self.current_scroll_text + self.SCROLL_PADDING)
-        for char_code in unique_chars:
-            char = str(char_code) # Ensure it is a string
-            if char not in self.char_widths_cache:
-                char_w, _ = get_dims(char, font)
-                self.char_widths_cache[char] = char_w
-
-        base_w = sum(self.char_widths_cache.get(c, 0) for c in self.current_scroll_text)
+        # Rasterize the whole tape once; each frame then only copies a window_w slice of it
+        text_w, text_h, text_rows = render_mask(self.current_scroll_text, font)
+        self.tape_height = text_h
         
-        if base_w > matrix_w: 
+        if text_w > window_w: 
             self.text_is_scrollable = True
-            text_with_padding_width = sum(self.char_widths_cache.get(c, 0) for c in (self.current_scroll_text + self.SCROLL_PADDING))
-            self.looping_point_pixels = text_with_padding_width
+            tape_w, _, tape_rows = render_mask(self.current_scroll_text + self.SCROLL_PADDING, font)
+            # +1 for the character gap before the text repeats
+            self.looping_point_pixels = tape_w + 1
+            # Append the gap and the first window of text so any offset below the looping point has a full window
+            self.tape_rows = [row + bytearray(1) + text_row[:window_w] for row, text_row in zip(tape_rows, text_rows)]
+            self.tape_width = len(self.tape_rows[0]) if self.tape_rows else 0
         else: 
             self.text_is_scrollable = False
-            self.looping_point_pixels = base_w # Not scrolling, its own width is its boundary
+            self.looping_point_pixels = text_w # Not scrolling, its own width is its boundary
+            self.tape_rows = text_rows
+            self.tape_width = text_w
 
     def update_scroll_state(self):
         # Store current text to see if it changes after potential fetch and rebuild
         prev_scroll_text = self.current_scroll_text
         
-        # Try to fetch new data if interval has passed
-        self._trigger_fetch_if_needed() 
-
-        # Always rebuild text, as headlines_cache might have been updated by the background thread.
-        self._build_and_measure_scroll_text()
+        # Rebuild only when the merged headline set (or font/width) changed since the last build
+        if self._scroll_text_state() != self._built_state:
+            self._build_and_measure_scroll_text()
 
         if prev_scroll_text != self.current_scroll_text:
             self._log("DEBUG", "News scroll text changed, resetting scroll position.")
@@ -259,61 +264,43 @@ class NewsWidget(BaseWidget):
             self.current_pixel_offset = 0
             self.fractional_pixel_offset = 0.0
 
-    def get_visible_text_segment(self) -> str:
-        if not self.current_scroll_text or self.current_scroll_text == self.INITIAL_LOADING_MESSAGE or not self.text_is_scrollable:
-            return self.current_scroll_text 
-
-        matrix_w = self.global_context.get('matrix_width', 64)
-        if not self.char_widths_cache: 
-            self._log("ERROR", "Character width cache is empty. Cannot determine visible segment.")
-            return "CacheErr"
-
-        tape = self.current_scroll_text + self.SCROLL_PADDING + self.current_scroll_text
-        visible_segment = ""
-        current_segment_width = 0
-        start_char_index_on_tape = 0
-        pixel_offset_tracker = 0
-
-        for i, char_code in enumerate(tape):
-            char = str(char_code)
-            char_w = self.char_widths_cache.get(char, 0)
-            if pixel_offset_tracker + char_w > self.current_pixel_offset:
-                start_char_index_on_tape = i
-                break
-            pixel_offset_tracker += char_w
-        else: 
-            start_char_index_on_tape = 0 
-
-        for i in range(start_char_index_on_tape, len(tape)):
-            char_to_add = tape[i]
-            char_w = self.char_widths_cache.get(char_to_add, 0)
-            if current_segment_width + char_w <= matrix_w:
-                visible_segment += char_to_add
-                current_segment_width += char_w
-            else:
-                break 
-        
-        if not visible_segment and len(tape) > start_char_index_on_tape:
-             first_visible_char = tape[start_char_index_on_tape]
-             if self.char_widths_cache.get(first_visible_char, 0) > 0 : 
-                  return first_visible_char 
+    def get_visible_window(self):
+        """
+        Returns the visible slice of the pre-rendered tape as a 'bitmap_window' content dict.
+        Falls back to the plain text if the display's mask renderer isn't available.
+        """
+        if self.tape_rows is None:
+            return self.current_scroll_text
 
-        return visible_segment
+        return {
+            'type': 'bitmap_window',
+            'rows': self.tape_rows,
+            'offset': self.current_pixel_offset,
+            'width': min(self._get_window_width(), self.tape_width),
+            'height': self.tape_height
+        }
 
     # BaseWidget compliance
-    def get_content(self) -> str:
+    def get_content(self):
         self.update_scroll_state() # Ensure state is updated
-        return self.get_visible_text_segment()
+        return self.get_visible_window()
 
     @staticmethod
     def get_config_options() -> list:
         options = BaseWidget.get_config_options()
         options.extend([
             { 'name': 'rss_url', 'label': 'RSS Feed URL', 'type': 'text', 'default': NewsWidget.DEFAULT_RSS_URL },
+            { 'name': 'feeds', 'label': 'Multiple Feeds (optional)', 'type': 'text', 'default': '',
+              'placeholder': 'url|weight|limit, url|weight|limit',
+              'description': 'Combine several feeds into one ticker. Comma-separated entries of url|weight|limit (weight and limit optional). Weight sets each feed\'s share of the headlines; near-duplicate headlines are merged and the ticker is ordered newest first. Overrides RSS Feed URL when set.' },
             { 'name': 'update_interval_minutes', 'label': 'Update Interval (minutes)', 'type': 'number', 'default': NewsWidget.DEFAULT_UPDATE_INTERVAL_MINS, 'min': 1 },
-            { 'name': 'num_headlines', 'label': 'Number of Headlines', 'type': 'number', 'default': NewsWidget.DEFAULT_NUM_HEADLINES, 'min': 1, 'max': 20 },
+            { 'name': 'num_headlines', 'label': 'Number of Headlines (total)', 'type': 'number', 'default': NewsWidget.DEFAULT_NUM_HEADLINES, 'min': 1, 'max': 20 },
             { 'name': 'scroll_interval_ms', 'label': 'Scroll Speed (ms per pixel)', 'type': 'number', 'default': NewsWidget.DEFAULT_SCROLL_INTERVAL_MS, 'min': 10, 'max': 500,
               'description': 'Milliseconds between each pixel movement. Lower values = faster, smoother scrolling. Uses fractional positioning for sub-pixel accuracy.' },
+            { 'name': 'fetch_timeout_seconds', 'label': 'Feed Fetch Timeout (sec)', 'type': 'number', 'default': NewsWidget.DEFAULT_FETCH_TIMEOUT_SECONDS, 'min': 1, 'max': 60,
+              'description': 'Hard wall-clock limit for downloading and parsing the feed.' },
+            { 'name': 'max_feed_kb', 'label': 'Max Feed Size (KB)', 'type': 'number', 'default': NewsWidget.DEFAULT_MAX_FEED_KB, 'min': 16, 'max': 4096,
+              'description': 'Stop reading the feed after this many kilobytes.' },
             { 'name': 'font_size', 'label': 'Font Size', 'type': 'select', 'default': 'medium', 'options': [
                 {'value': 'small', 'label': 'Small (3x5)'}, {'value': 'medium', 'label': 'Medium (5x7)'},
                 {'value': 'large', 'label': 'Large (7x9)'}, {'value': 'xl', 'label': 'Extra Large (9x13)'}
@@ -0,0 +1,198 @@
+from .base_widget import BaseWidget
+import primitives
+from system_sampler import system_sampler, METRICS # Shared background CPU/memory/temperature/frequency sampler
+
+class SystemMetricsWidget(BaseWidget):
+    """
+    Shows system metrics (CPU, memory, temperature, frequency) as one row each: the current value,
+    then a bar or a sparkline of recent samples. Values come from the shared system sampler's
+    ring buffers, so rendering never waits for a measurement.
+    """
+
+    DEFAULT_METRICS = "cpu,memory,temperature"
+    DEFAULT_GRAPH_WIDTH = 24
+    DEFAULT_ROW_HEIGHT = 5
+    DEFAULT_TEMP_MAX_C = 85.0 # Raspberry Pi firmware starts throttling at 85 deg C
+    LABEL_GAP = 2 # Pixels between the value text and its graph
+    LOW_RGB = (0, 200, 0)
+    HIGH_RGB = (255, 0, 0)
+
+    def __init__(self, config: dict, global_context: dict = None):
+        super().__init__(config, global_context)
+        self._rendered_key = None # (sampler tick, config) the cached frame was rendered for
+        self._rendered_content = None
+        self._read_config()
+
+    def reconfigure(self):
+        super().reconfigure()
+        self._read_config()
+
+    def _read_config(self):
+        metrics = [m.strip().lower() for m in str(self.config.get('metrics', self.DEFAULT_METRICS)).split(',')]
+        self.metrics = [m for m in metrics if m in METRICS] or ['cpu']
+        self.style = self.config.get('style', 'bars')
+        self.graph_width = self._config_number('graph_width', self.DEFAULT_GRAPH_WIDTH, 4)
+        self.row_height = self._config_number('row_height', self.DEFAULT_ROW_HEIGHT, 2)
+        self.temp_max_c = self._config_number('temp_max_c', self.DEFAULT_TEMP_MAX_C, cast=float)
+        self.color_by_level = self.config.get('color_by_level', True)
+        self.font_size = self.config.get('font_size', 'small')
+        system_sampler.start() # Shared with /api/system_stats; no-op if already running
+
+    def _scale(self, metric: str, value: float, history: list) -> float:
+        """Maps a sample to 0..1 for drawing. Frequency is scaled to the highest frequency seen."""
+        if metric == 'temperature':
+            fraction = value / self.temp_max_c if self.temp_max_c > 0 else 0.0
+        elif metric == 'frequency':
+            peak = max((v for v in history if v is not None), default=0)
+            fraction = value / peak if peak > 0 else 0.0
+        else:
+            fraction = value / 100.0
+        return min(1.0, max(0.0, fraction))
+
+    def _level_rgb(self, fraction: float, base_rgb: tuple) -> tuple:
+        if not self.color_by_level:
+            return base_rgb
+        return tuple(int(lo + (hi - lo) * fraction + 0.5) for lo, hi in zip(self.LOW_RGB, self.HIGH_RGB))
+
+    @staticmethod
+    def _format_value(metric: str, value) -> str:
+        if value is None:
+            return "--"
+        if metric == 'temperature':
+            return f"{value:.0f}C"
+        if metric == 'frequency':
+            return f"{value / 1000:.1f}G" if value >= 1000 else f"{value:.0f}M"
+        return f"{value:.0f}%"
+
+    def get_content(self):
+        # The sampler adds a sample once a second; between samples the previous frame is reused
+        render_key = (system_sampler.tick_count, tuple(self.metrics), self.style, self.graph_width, self.row_height,
+                      self.temp_max_c, self.color_by_level, self.font_size, self.color)
+        if render_key != self._rendered_key:
+            self._rendered_content = self._render()
+            self._rendered_key = render_key
+        return self._rendered_content
+
+    def _render(self):
+        latest = system_sampler.get_latest()
+        render_mask = self.global_context.get('render_text_mask')
+        font = self._get_font_name()
+        if not render_mask or not font:
+            return " ".join(self._format_value(m, latest[m]) for m in self.metrics)
+
+        text_rgb = self._hex_to_rgb(self.color)
+        rows = []
+        for metric in self.metrics:
+            text_w, text_h, text_rows = render_mask(self._format_value(metric, latest[metric]), font)
+            rows.append((metric, text_w, text_h, text_rows))
+        label_w = max(text_w for _, text_w, _, _ in rows)
+        row_h = max(self.row_height, max(text_h for _, _, text_h, _ in rows))
+        width = label_w + self.LABEL_GAP + self.graph_width
+        height = row_h * len(rows) + (len(rows) - 1) # 1px between rows
+        pixel_map = [[(0, 0, 0)] * width for _ in range(height)]
+        graph_x = label_w + self.LABEL_GAP
+
+        for index, (metric, text_w, text_h, text_rows) in enumerate(rows):
+            top = index * (row_h + 1)
+            self._blit_mask(pixel_map, text_rows, label_w - text_w, top + (row_h - text_h) // 2, text_rgb)
+            history = system_sampler.get_history(metric, self.graph_width)
+            graph_top = top + (row_h - self.row_height) // 2
+            if self.style == 'sparkline':
+                self._draw_sparkline(pixel_map, metric, history, graph_x, graph_top, text_rgb)
+            else:
+                self._draw_bar(pixel_map, metric, latest[metric], history, graph_x, graph_top, text_rgb)
+
+        return {
+            'type': 'pixel_map',
+            'width': width,
+            'height': height,
+            'data': pixel_map
+        }
+
+    def _draw_bar(self, pixel_map, metric, value, history, x, y, base_rgb):
+        dim_rgb = tuple(c // 5 for c in base_rgb)
+        primitives.fill_rect(pixel_map, x, y, self.graph_width, self.row_height, dim_rgb) # Bar background
+        if value is None:
+            return
+        fraction = self._scale(metric, value, history)
+        primitives.fill_rect(pixel_map, x, y, round(fraction * self.graph_width), self.row_height,
+                             self._level_rgb(fraction, base_rgb))
+
+    def _draw_sparkline(self, pixel_map, metric, history, x, y, base_rgb):
+        baseline = y + self.row_height
+        first_x = x + self.graph_width - len(history) # Newest sample at the right edge
+        for i, value in enumerate(history):
+            if value is None:
+                continue
+            fraction = self._scale(metric, value, history)
+            column_h = max(1, round(fraction * self.row_height))
+            primitives.fill_rect(pixel_map, first_x + i, baseline - column_h, 1, column_h,
+                                 self._level_rgb(fraction, base_rgb))
+
+    @staticmethod
+    def get_config_options() -> list:
+        options = BaseWidget.get_config_options()
+        options.extend([
+            {
+                'name': 'metrics',
+                'label': 'Metrics',
+                'type': 'text',
+                'default': SystemMetricsWidget.DEFAULT_METRICS,
+                'placeholder': 'cpu,memory,temperature,frequency',
+                'description': 'Comma-separated list, one row each. Any of: cpu, memory, temperature, frequency.'
+            },
+            {
+                'name': 'style',
+                'label': 'Graph Style',
+                'type': 'select',
+                'default': 'bars',
+                'options': [
+                    {'value': 'bars', 'label': 'Bars (current value)'},
+                    {'value': 'sparkline', 'label': 'Sparklines (one column per second)'}
+                ]
+            },
+            {
+                'name': 'graph_width',
+                'label': 'Graph Width (pixels)',
+                'type': 'number',
+                'default': SystemMetricsWidget.DEFAULT_GRAPH_WIDTH,
+                'min': 4,
+                'max': 64
+            },
+            {
+                'name': 'row_height',
+                'label': 'Graph Height per Row (pixels)',
+                'type': 'number',
+                'default': SystemMetricsWidget.DEFAULT_ROW_HEIGHT,
+                'min': 2,
+                'max': 16
+            },
+            {
+                'name': 'temp_max_c',
+                'label': 'Temperature Full Scale (°C)',
+                'type': 'number',
+                'default': SystemMetricsWidget.DEFAULT_TEMP_MAX_C,
+                'min': 40,
+                'max': 120
+            },
+            {
+                'name': 'color_by_level',
+                'label': 'Colour Graphs by Level (green to red)',
+                'type': 'checkbox',
+                'default': True,
+                'description': 'When off, graphs use the widget colour.'
+            },
+            {
+                'name': 'font_size',
+                'label': 'Font Size',
+                'type': 'select',
+                'default': 'small',
+                'options': [
+                    {'value': 'small', 'label': 'Small (3x5)'},
+                    {'value': 'medium', 'label': 'Medium (5x7)'},
+                    {'value': 'large', 'label': 'Large (7x9)'},
+                    {'value': 'xl', 'label': 'Extra Large (9x13)'}
+                ]
+            }
+        ])
+        return options
@@ -1,9 +1,8 @@
 import datetime
-import requests
 from .base_widget import BaseWidget
-import time # Added for caching
 import re # For parsing display_format
-import threading # Added for background fetching
+import threading
+from providers import provider_registry # Weather is fetched and cached by a shared WeatherProvider
 
 # WMO Weather interpretation codes (simplified)
 # Source: Open-Meteo documentation
@@ -23,10 +22,10 @@ WMO_WEATHER_CODES = {
 }
 
 class WeatherWidget(BaseWidget):
-    """Displays weather information from Open-Meteo using a user-defined format string."""
-
-    # Open-Meteo API endpoint
-    API_BASE_URL = "https://api.open-meteo.com/v1/forecast" 
+    """
+    Displays weather information from Open-Meteo using a user-defined format string.
+    The data comes from a WeatherProvider subscription; widgets showing the same location share one fetch.
+    """
 
     # Hardcoded coordinates for Billingham, UK for this version
     # A future improvement would be to use geocoding for the location string
@@ -48,15 +47,12 @@ class WeatherWidget(BaseWidget):
         self.display_format = self.config.get('display_format', 'Temp: {temp}{unit_symbol}')
         self.font_size = self.config.get('font_size', "medium") # Add font_size
         
-        # Caching attributes
         self.update_interval_minutes = self.config.get('update_interval_minutes', self.DEFAULT_UPDATE_INTERVAL_MINUTES)
-        self.last_weather_data = None
-        self.last_fetch_time = 0 # Use 0 to ensure first fetch always happens
-        self.is_fetching = False # Flag to indicate if a fetch is in progress
-        self.fetch_thread = None # Holds the reference to the fetch thread
+        self.last_weather_data = None # Latest API response pushed by the provider
         self.data_lock = threading.Lock() # Lock for accessing shared data like last_weather_data
-        # Ensure super().__init__ is called if not already, for enable_logging
-        # It's called at the top of __init__ in this class, so self.enable_logging and self._log are available
+        self.subscription = None
+        self._subscription_state = None # (lat, lon, units, interval) the subscription was made for
+        self._subscribe()
 
     def reconfigure(self):
         super().reconfigure() # Call base class reconfigure
@@ -70,8 +66,46 @@ class WeatherWidget(BaseWidget):
             self.display_format = self.config.get('display_format', 'Temp: {temp}{unit_symbol}')
             self.font_size = self.config.get('font_size', "medium")
             self.update_interval_minutes = self.config.get('update_interval_minutes', self.DEFAULT_UPDATE_INTERVAL_MINUTES)
-            # Don't reset cache on reconfigure, let get_content handle it.
-            # If location or units change, next fetch will get new data.
+        # Cheap when nothing changed; a new location/units/interval moves us to another provider
+        self._subscribe()
+
+    def _subscribe(self):
+        """(Re)subscribes to the WeatherProvider for the configured location, units and interval."""
+        state = (self.latitude, self.longitude, self.units, self.update_interval_minutes)
+        if self.subscription is None or state != self._subscription_state:
+            if self.subscription is not None:
+                self.subscription.unsubscribe()
+            params = {'latitude': self.latitude, 'longitude': self.longitude, 'units': self.units}
+            # An interval of 0 means fetch once and keep that data
+            refresh_interval = self.update_interval_minutes * 60 if self.update_interval_minutes > 0 else None
+            try:
+                self.subscription = provider_registry.subscribe('weather', params, self._on_weather_update, refresh_interval)
+            except Exception as e:
+                self._log("ERROR", f"Could not subscribe to weather provider: {e}")
+                self.subscription = None
+                return
+            self._subscription_state = state
+            snapshot = self.subscription.snapshot()
+            with self.data_lock:
+                # The provider may already hold data for this location (e.g. from another widget or screen)
+                self.last_weather_data = snapshot['data'] if snapshot else None
+        self.subscription.provider.require_forecast_days(self._forecast_days_needed())
+
+    def _forecast_days_needed(self) -> int:
+        """Number of forecast days the display_format refers to ({temp_max_2} needs 3)."""
+        matches = re.findall(r'\{(?:temp_max|temp_min|weather_desc|dow)_(\d+)\}', self.display_format or '')
+        return max((int(m) for m in matches), default=0) + 1
+
+    def _on_weather_update(self, snapshot: dict):
+        """Provider callback, runs on a fetch thread."""
+        with self.data_lock:
+            self.last_weather_data = snapshot['data']
+        self._log("INFO", "Weather data updated from provider.")
+
+    def close(self):
+        if self.subscription is not None:
+            self.subscription.unsubscribe()
+            self.subscription = None
 
     def _parse_weather_data(self, weather_data_json: dict) -> dict:
         """Helper to parse the JSON response from Open-Meteo into a flat dictionary."""
@@ -158,79 +192,10 @@ class WeatherWidget(BaseWidget):
         
         return available_data
 
-    def _fetch_data_background(self):
-        """Fetches weather data in a background thread."""
-        temp_unit_param = 'celsius' if self.units == 'metric' else 'fahrenheit'
-        wind_speed_unit_param = 'kmh' if self.units == 'metric' else 'mph'
-        max_days_needed = 0
-        if self.display_format:
-            matches = re.findall(r'\{(?:temp_max|temp_min|weather_desc|dow)_(\d+)\}', self.display_format)
-            if matches:
-                max_days_needed = max(int(m) for m in matches)
-        api_forecast_days = max_days_needed + 1
-        params = {
-            'latitude': self.latitude,
-            'longitude': self.longitude,
-            'current_weather': 'true',
-            'daily': 'sunrise,sunset,temperature_2m_max,temperature_2m_min,weathercode',
-            'temperature_unit': temp_unit_param,
-            'windspeed_unit': wind_speed_unit_param,
-            'timezone': 'auto',
-            'forecast_days': api_forecast_days
-        }
-
-        new_data = None
-        fetch_error = None
-        try:
-            self._log("INFO", f"Background fetching weather for lat={self.latitude}, lon={self.longitude}")
-            response = requests.get(self.API_BASE_URL, params=params, timeout=10)
-            response.raise_for_status()
-            new_data = response.json()
-        except requests.exceptions.HTTPError as e:
-            fetch_error = f"HTTP Error: {e} - Resp: {e.response.text if e.response else 'No response'}"
-        except requests.exceptions.RequestException as e:
-            fetch_error = f"RequestException: {e}"
-        except Exception as e:
-            fetch_error = f"Unexpected error during fetch: {e}"
-        finally:
-            with self.data_lock:
-                if new_data:
-                    self.last_weather_data = new_data
-                    self.last_fetch_time = time.monotonic()
-                    self._log("INFO", "Background fetch successful, cache updated.")
-                elif fetch_error:
-                    self._log("ERROR", fetch_error)
-                self.is_fetching = False # Reset fetching flag
-
     def get_content(self) -> str:
-        """Fetches weather data (or uses cache) and formats it."""
-        current_monotonic_time = time.monotonic()
-        
-        # Critical config items read directly, assume reconfigure handles updates if necessary
-        # These are used to decide IF we need to fetch, not necessarily for the fetch itself,
-        # which is now in background and will use the instance's current lat/lon/units.
-        update_interval_min = self.config.get('update_interval_minutes', self.DEFAULT_UPDATE_INTERVAL_MINUTES)
+        """Formats the latest weather data from the provider. Never blocks on the network."""
         current_display_format = self.config.get('display_format', 'Temp: {temp}{unit_symbol}')
 
-        effective_interval_seconds = update_interval_min * 60 if update_interval_min > 0 else 0
-        
-        needs_fetch = False
-        with self.data_lock: # Protect access to last_fetch_time and is_fetching
-            if self.last_fetch_time == 0: # First ever call or data explicitly cleared
-                 needs_fetch = True
-            elif effective_interval_seconds > 0 and \
-                 (current_monotonic_time - self.last_fetch_time) >= effective_interval_seconds:
-                 needs_fetch = True
-            
-            if needs_fetch and not self.is_fetching:
-                self.is_fetching = True
-                self._log("INFO", f"Cache stale or missing. Starting background fetch for {self.widget_id}.")
-                # Use current instance attributes for the fetch
-                self.fetch_thread = threading.Thread(target=self._fetch_data_background)
-                self.fetch_thread.daemon = True 
-                self.fetch_thread.start()
-
-        # Always try to return content, even if stale or fetching
         with self.data_lock: # Protect access to self.last_weather_data
             if self.last_weather_data:
                 parsed_data = self._parse_weather_data(self.last_weather_data) # Uses instance units/time_format
@@ -242,10 +207,9 @@ class WeatherWidget(BaseWidget):
                 except Exception as e: 
                     self._log("ERROR", f"Formatting data: {e}")
                     return "Render Err"
-            elif self.is_fetching:
-                return "Updating..." 
-            else: # No data and not fetching (e.g. first load failed and interval not passed)
-                return "No Data"
+        if self.subscription is not None and (self.subscription.provider.is_fetching or self.subscription.provider.last_attempt_time == 0):
+            return "Updating..." 
+        return "No Data" # No data and not fetching (e.g. first load failed and the retry isn't due yet)
 
     @staticmethod
     def get_config_options() -> list: